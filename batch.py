@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
+
+from engine import COUNTER_SCOPES, RenameOptions
+from validation import validate_inputs
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from log_utils import SessionLogger
+
+# Manifest rows (CSV with a header row, or JSON lines) name one folder and
+# its rename flags (see the batch command in the README).
+
+MANIFEST_FIELDS = ("folder", "pattern", "date", "time", "ext", "recursive", "counter")
+
+# Folders per pool task, at most (small folders share one round-trip).
+_SHARD_FOLDERS = 16
+
+_TRUE = frozenset({"1", "true", "yes", "y", "on"})
+_FALSE = frozenset({"", "0", "false", "no", "n", "off"})
+
+
+class ManifestError(Exception):
+    """
+    A manifest that cannot run; messages holds one user-facing error per
+    problem (prefixed with the manifest line).
+    """
+
+    def __init__(self, messages: list[str]) -> None:
+        super().__init__("; ".join(messages))
+        self.messages = messages
+
+
+@dataclass
+class BatchEntry:
+    line: int                  # manifest line (for messages)
+    folder: str                # absolute path
+    options: RenameOptions
+    recursive: bool = False
+    counter: str = "directory"
+
+
+@dataclass
+class FolderResult:
+    folder: str
+    planned: int = 0
+    renamed: int = 0
+    skipped: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+    mappings_path: Optional[str] = None    # worker's temporary mappings file
+
+    def to_dict(self) -> dict:
+        return {
+            "folder": self.folder,
+            "planned": self.planned,
+            "renamed": self.renamed,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 6),
+        }
+
+
+@dataclass
+class BatchSummary:
+    folders: int = 0
+    failed: int = 0            # folders with errors
+    planned: int = 0
+    renamed: int = 0
+    skipped: int = 0
+    errors: int = 0
+
+    def add(self, result: FolderResult) -> None:
+        self.folders += 1
+        self.failed += bool(result.errors)
+        self.planned += result.planned
+        self.renamed += result.renamed
+        self.skipped += len(result.skipped)
+        self.errors += len(result.errors)
+
+
+def _flag(value: object, name: str) -> bool:
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"{name} must be a yes/no value, got {value!r}")
+
+
+def _entry(line: int, row: object) -> BatchEntry:
+    if not isinstance(row, dict):
+        raise ValueError("row must be an object")
+    unknown = sorted(key for key in row if key not in MANIFEST_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(map(str, unknown))}")
+    folder = row.get("folder")
+    pattern = row.get("pattern")
+    if not isinstance(folder, str) or not folder.strip():
+        raise ValueError("missing folder")
+    if not isinstance(pattern, str):
+        raise ValueError("missing pattern")
+    ext = row.get("ext") or None
+    if ext is not None and not isinstance(ext, str):
+        raise ValueError("ext must be a string")
+    counter = row.get("counter") or "directory"
+    if counter not in COUNTER_SCOPES:
+        raise ValueError(f"counter must be one of: {', '.join(COUNTER_SCOPES)}")
+    options = RenameOptions(
+        pattern=pattern,
+        include_date=_flag(row.get("date"), "date"),
+        include_time=_flag(row.get("time"), "time"),
+        change_extension=ext is not None,
+        new_extension=ext,
+    )
+    return BatchEntry(line, os.path.abspath(folder), options, _flag(row.get("recursive"), "recursive"), counter)
+
+
+def _read_rows(path: str) -> Iterator[tuple[int, object]]:
+    """
+    (line, row) pairs; a row that does not parse is yielded as its error.
+    """
+    if path.lower().endswith(".csv"):
+        import csv
+
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                if not any((value or "").strip() for value in row.values() if isinstance(value, str)):
+                    continue
+                if None in row:
+                    yield reader.line_num, ValueError("more values than header columns")
+                else:
+                    yield reader.line_num, {key.strip(): (value or "").strip() for key, value in row.items()}
+        return
+
+    import json
+
+    with open(path, encoding="utf-8") as f:
+        for line, text in enumerate(f, start=1):
+            text = text.strip()
+            if not text or text.startswith("#"):
+                continue
+            try:
+                yield line, json.loads(text)
+            except ValueError as e:
+                yield line, ValueError(f"invalid JSON ({e})")
+
+
+def load_manifest(path: str) -> list[BatchEntry]:
+    """
+    Reads and validates a whole manifest (CSV for "*.csv", JSON lines
+    otherwise). Raises ManifestError listing every problem found: rows
+    that do not parse, invalid options or folders, and folders listed
+    twice or inside a recursive entry's folder (they would be renamed by
+    two workers at once).
+    """
+    messages: list[str] = []
+    entries: list[BatchEntry] = []
+    for line, row in _read_rows(path):
+        try:
+            if isinstance(row, ValueError):
+                raise row
+            entry = _entry(line, row)
+        except ValueError as e:
+            messages.append(f"line {line}: {e}")
+            continue
+        messages.extend(f"line {line} ({entry.folder}): {error}" for error in validate_inputs(entry.folder, entry.options))
+        entries.append(entry)
+
+    seen: dict[str, int] = {}
+    for entry in entries:
+        if entry.folder in seen:
+            messages.append(f"line {entry.line}: {entry.folder} is already listed on line {seen[entry.folder]}")
+        else:
+            seen[entry.folder] = entry.line
+    for entry in entries:
+        if not entry.recursive:
+            continue
+        prefix = os.path.join(entry.folder, "")
+        for other in entries:
+            if other.folder.startswith(prefix):
+                messages.append(f"line {other.line}: {other.folder} is inside recursive line {entry.line}")
+
+    if not entries and not messages:
+        messages.append("the manifest lists no folders")
+    if messages:
+        raise ManifestError(messages)
+    return entries
+
+
+def run_folder(entry: BatchEntry, *, dry_run: bool = False, mappings_path: Optional[str] = None) -> FolderResult:
+    """
+    Plans and applies one manifest entry, as `relabeler_cli rename` would
+    (reordered, compact). Undo mappings are written to mappings_path (a v2
+    file) when given. Never raises for the folder's own failures: they are
+    returned as errors.
+    """
+    from engine import RenamePlan, iter_plan_for_entries, iter_tree_plans
+    from filesystem import apply_rename_plan, apply_rename_tree
+    from mappings_io import MappingsWriter
+    from scanner import scan_directory
+
+    start = time.perf_counter()
+    folder_result = FolderResult(entry.folder)
+    writer = MappingsWriter(mappings_path, entry.folder) if mappings_path and not dry_run else None
+    try:
+        if entry.recursive:
+            walk_errors: list[str] = []
+            plans = iter_tree_plans(
+                entry.folder,
+                entry.options,
+                counter=entry.counter,
+                on_error=lambda path, e: walk_errors.append(f"Cannot list {path}: {e}"),
+            )
+            result = apply_rename_tree(entry.folder, plans, dry_run=dry_run, mappings_writer=writer)
+            result.errors.extend(walk_errors)
+        else:
+            # One listing serves the plan and apply's name index
+            snapshot = scan_directory(entry.folder, with_stat=entry.options.include_date)
+            plan = RenamePlan.from_operations(entry.folder, iter_plan_for_entries(snapshot.entries, entry.options))
+            result = apply_rename_plan(
+                entry.folder, plan, dry_run=dry_run, compact=True, snapshot=snapshot, mappings_writer=writer
+            )
+        folder_result.planned = result.attempted
+        folder_result.renamed = len(result.renamed)
+        folder_result.skipped = list(result.skipped)
+        folder_result.errors = list(result.errors)
+    except Exception as e:
+        folder_result.errors.append(f"Failed: {e}")
+    finally:
+        if writer is not None:
+            writer.close()
+            folder_result.mappings_path = mappings_path
+    folder_result.seconds = time.perf_counter() - start
+    return folder_result
+
+
+def _run_shard(shard: list[tuple[BatchEntry, Optional[str]]], dry_run: bool) -> list[FolderResult]:
+    return [run_folder(entry, dry_run=dry_run, mappings_path=path) for entry, path in shard]
+
+
+def _shards(
+    entries: list[BatchEntry],
+    spill_dir: Optional[str],
+    jobs: int,
+) -> list[list[tuple[BatchEntry, Optional[str]]]]:
+    size = max(1, min(_SHARD_FOLDERS, len(entries) // (jobs * 4)))
+    tasks = [
+        (entry, os.path.join(spill_dir, f"{index}.ndjson") if spill_dir else None)
+        for index, entry in enumerate(entries)
+    ]
+    return [tasks[i:i + size] for i in range(0, len(tasks), size)]
+
+
+def _results(shards, dry_run: bool, jobs: int) -> Iterator[FolderResult]:
+    """
+    Folder results as shards finish (in manifest order when jobs == 1).
+    """
+    if jobs <= 1:
+        for shard in shards:
+            yield from _run_shard(shard, dry_run)
+        return
+
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        remaining = iter(shards)
+        pending: dict[Future[list[FolderResult]], list] = {}
+
+        def submit(shard: list[tuple[BatchEntry, Optional[str]]]) -> None:
+            pending[pool.submit(_run_shard, shard, dry_run)] = shard
+
+        for shard in remaining:
+            submit(shard)
+            if len(pending) >= 2 * jobs:
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                shard = pending.pop(future)
+                following = next(remaining, None)
+                if following is not None:
+                    submit(following)
+                try:
+                    yield from future.result()
+                except Exception as e:
+                    # e.g. a worker process killed: its folders are reported, the batch goes on
+                    for entry, path in shard:
+                        failed = FolderResult(entry.folder, errors=[f"Worker failed: {e!r}"])
+                        if path is not None and os.path.exists(path):
+                            failed.mappings_path = path
+                        yield failed
+
+
+def _log_folder(logger: Optional[SessionLogger], result: FolderResult) -> None:
+    if logger is None:
+        return
+    logger.log(f"Folder: {result.folder}")
+    logger.log(
+        f"Planned: {result.planned}, Renamed: {result.renamed}, "
+        f"Skipped: {len(result.skipped)}, Errors: {len(result.errors)} ({result.seconds:.2f}s)"
+    )
+    for name in result.skipped:
+        logger.log(f"Skipped (already exists): {name}")
+    for error in result.errors:
+        logger.log(f"Error: {error}")
+
+
+def run_batch(
+    entries: list[BatchEntry],
+    *,
+    jobs: int = 1,
+    dry_run: bool = False,
+    mappings_out: Optional[str] = None,
+    results_out: Optional[str] = None,
+    logger: Optional[SessionLogger] = None,
+    on_folder: Optional[Callable[[int, int, FolderResult], None]] = None,
+) -> BatchSummary:
+    """
+    Renames every entry's folder, sharding folders across jobs processes
+    (in this process when jobs == 1).
+
+    - mappings_out receives the undo mappings of every folder (full
+      paths, so one `undo` reverts the whole batch); a ".json" path is
+      written as v1 once all folders are done.
+    - results_out gets one JSON line per folder (FolderResult.to_dict),
+      written as folders finish; logger gets a per-folder summary.
+    - on_folder(done, total, result) runs in this process after each folder.
+    """
+    import json
+    import tempfile
+
+    from mappings_io import MappingsFile, MappingsWriter, default_version, save_mappings
+
+    summary = BatchSummary()
+    collect_mappings = bool(mappings_out) and not dry_run
+    writer = None
+    v1_mappings: list[tuple[str, str]] = []
+    results_file = open(results_out, "w", encoding="utf-8") if results_out else None
+    try:
+        with tempfile.TemporaryDirectory(prefix="relabeler-batch-") as spill_dir:
+            if collect_mappings and default_version(mappings_out) == 2:
+                writer = MappingsWriter(mappings_out, "")
+            shards = _shards(entries, spill_dir if collect_mappings else None, jobs)
+            if logger is not None:
+                logger.log("=== Batch session started ===")
+                logger.log(f"Folders: {len(entries)}")
+                logger.log(f"Jobs: {jobs}")
+                logger.log(f"Dry run: {dry_run}")
+            for result in _results(shards, dry_run, jobs):
+                summary.add(result)
+                if result.mappings_path is not None:
+                    rows = MappingsFile(result.mappings_path)
+                    if writer is not None:
+                        for pair in rows:
+                            writer.append(pair)
+                    else:
+                        v1_mappings.extend(rows)
+                    os.remove(result.mappings_path)
+                if results_file is not None:
+                    results_file.write(json.dumps(result.to_dict(), ensure_ascii=False) + "\n")
+                    results_file.flush()
+                _log_folder(logger, result)
+                if on_folder is not None:
+                    on_folder(summary.folders, len(entries), result)
+            if collect_mappings and writer is None:
+                save_mappings(mappings_out, v1_mappings)
+    finally:
+        if writer is not None:
+            writer.close()
+        if results_file is not None:
+            results_file.close()
+    if logger is not None:
+        logger.log("=== Batch session finished ===")
+        logger.log(f"Folders: {summary.folders} ({summary.failed} with errors)")
+        logger.log(f"Renamed: {summary.renamed}")
+        logger.log(f"Skipped: {summary.skipped}")
+        logger.log(f"Errors: {summary.errors}")
+    return summary
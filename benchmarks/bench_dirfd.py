@@ -0,0 +1,62 @@
+"""
+Compares path-based and directory-fd based renames on a deep directory.
+
+Each mode renames every file forward and back with apply_rename_plan:
+
+    python benchmarks/bench_dirfd.py --files 20000 --depth 40
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from engine import RenameOperation  # noqa: E402
+from filesystem import apply_rename_plan, dir_fd_supported  # noqa: E402
+
+
+def _time_mode(folder: str, names: list[str], use_dir_fd: bool) -> float:
+    forward = [RenameOperation(n, f"renamed_{n}") for n in names]
+    backward = [RenameOperation(f"renamed_{n}", n) for n in names]
+
+    start = time.perf_counter()
+    for ops in (forward, backward):
+        result = apply_rename_plan(folder, ops, reorder=False, use_dir_fd=use_dir_fd)
+        assert not result.errors and not result.skipped
+    return time.perf_counter() - start
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--files", type=int, default=10000)
+    p.add_argument("--depth", type=int, default=40, help="Directory levels above the files.")
+    p.add_argument("--rounds", type=int, default=3)
+    args = p.parse_args(argv)
+
+    if not dir_fd_supported():
+        print("dir_fd renames are not supported on this platform.")
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp, *[f"level_{i:02d}_directory" for i in range(args.depth)])
+        folder.mkdir(parents=True)
+        names = [f"file_{i:07d}.dat" for i in range(args.files)]
+        for name in names:
+            (folder / name).touch()
+
+        print(f"files={args.files} depth={args.depth} path_len={len(str(folder))}")
+        renames = 2 * args.files
+        for label, use_dir_fd in (("path", False), ("dir_fd", True)):
+            best = min(_time_mode(str(folder), names, use_dir_fd) for _ in range(args.rounds))
+            print(f"{label:<7} {best:.3f}s  {renames / best:,.0f} renames/s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,65 @@
+"""
+Compares per-file memory of list[RenameOperation] + ApplyResult lists with
+RenamePlan + ApplyResult.compact, measured with tracemalloc:
+
+    python benchmarks/bench_memory.py --files 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from engine import RenameOperation, RenamePlan  # noqa: E402
+from filesystem import ApplyResult  # noqa: E402
+
+
+def _measure(build) -> int:
+    tracemalloc.start()
+    try:
+        keep = build()  # noqa: F841 - must stay alive while measuring
+        current, _peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--files", type=int, default=200000)
+    args = p.parse_args(argv)
+
+    folder = "/srv/ingest/2026/camera_uploads/batch_0001"
+    n = args.files
+
+    def legacy():
+        ops = [RenameOperation(f"IMG_{i:07d}.JPG", f"Photo_{i + 1:07d}.jpg") for i in range(n)]
+        result = ApplyResult()
+        for op in ops:
+            result.renamed.append((op.old_name, op.new_name))
+            result.mappings.append((os.path.join(folder, op.new_name), os.path.join(folder, op.old_name)))
+        return ops, result
+
+    def compact():
+        plan = RenamePlan(folder)
+        for i in range(n):
+            plan.append(f"IMG_{i:07d}.JPG", f"Photo_{i + 1:07d}.jpg")
+        result = ApplyResult.compact(folder, plan)
+        for i, op in enumerate(plan):
+            result._add_renamed(i, op)
+            result._add_mapping(folder, op.new_name, op.old_name, i)
+        return plan, result
+
+    sizes = {"legacy": _measure(legacy), "compact": _measure(compact)}
+    for label, size in sizes.items():
+        print(f"{label:<8} {size / 2**20:8.1f} MiB  {size / n:6.1f} bytes/file")
+    print(f"ratio    {sizes['legacy'] / sizes['compact']:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
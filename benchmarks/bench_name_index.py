@@ -0,0 +1,63 @@
+"""
+Counts stat calls and time of apply_rename_plan with and without the
+in-memory name index:
+
+    python benchmarks/bench_name_index.py --files 100000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from engine import RenameOperation  # noqa: E402
+from filesystem import apply_rename_plan  # noqa: E402
+
+
+def _run(folder: str, ops: list[RenameOperation], name_index: bool) -> tuple[int, float]:
+    calls = 0
+    real_stat = os.stat
+
+    def counting_stat(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        return real_stat(*args, **kwargs)
+
+    os.stat = counting_stat  # os.path.exists and dir_fd checks both land here
+    try:
+        start = time.perf_counter()
+        result = apply_rename_plan(folder, ops, name_index=name_index)
+        elapsed = time.perf_counter() - start
+    finally:
+        os.stat = real_stat
+    assert not result.errors and not result.skipped
+    return calls, elapsed
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--files", type=int, default=20000)
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        names = [f"file_{i:07d}.dat" for i in range(args.files)]
+        for name in names:
+            Path(tmp, name).touch()
+        forward = [RenameOperation(n, f"x_{n}") for n in names]
+        backward = [RenameOperation(f"x_{n}", n) for n in names]
+
+        print(f"files={args.files}")
+        for label, name_index, ops in (("stat", False, forward), ("index", True, backward)):
+            calls, elapsed = _run(tmp, ops, name_index)
+            print(f"{label:<6} stat_calls={calls:<8} time={elapsed:.3f}s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
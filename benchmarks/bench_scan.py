@@ -0,0 +1,119 @@
+"""
+Compares the legacy listdir/isfile/stat listing with the scandir scanner.
+
+Counts the filesystem calls that hit the kernel per file and the wall time.
+Run from the project root:
+
+    python benchmarks/bench_scan.py --files 20000 --date
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scanner import scan_directory  # noqa: E402
+
+
+class _Counter:
+    def __init__(self) -> None:
+        self.calls = 0
+
+
+@contextmanager
+def _count_syscalls() -> Iterator[_Counter]:
+    """
+    Wraps the os entry points used by both scanners and counts the ones that
+    issue a syscall. DirEntry.is_file()/inode() come from the directory read
+    (d_type/d_ino) on Linux/macOS, so only DirEntry.stat() is counted there.
+    """
+    counter = _Counter()
+    real_stat, real_listdir, real_scandir = os.stat, os.listdir, os.scandir
+
+    def stat(*args, **kwargs):
+        counter.calls += 1
+        return real_stat(*args, **kwargs)
+
+    def listdir(*args, **kwargs):
+        counter.calls += 1
+        return real_listdir(*args, **kwargs)
+
+    class _Entry:
+        __slots__ = ("_e",)
+
+        def __init__(self, e) -> None:
+            self._e = e
+
+        name = property(lambda self: self._e.name)
+        path = property(lambda self: self._e.path)
+
+        def is_file(self, **kw):
+            return self._e.is_file(**kw)
+
+        def inode(self):
+            return self._e.inode()
+
+        def stat(self, **kw):
+            counter.calls += 1
+            return self._e.stat(**kw)
+
+    @contextmanager
+    def scandir(path):
+        counter.calls += 1
+        with real_scandir(path) as it:
+            yield (_Entry(e) for e in it)
+
+    os.stat, os.listdir, os.scandir = stat, listdir, scandir
+    try:
+        yield counter
+    finally:
+        os.stat, os.listdir, os.scandir = real_stat, real_listdir, real_scandir
+
+
+def _legacy_listing(folder: str, include_date: bool) -> int:
+    files = [f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))]
+    if include_date:
+        for f in files:
+            os.stat(os.path.join(folder, f)).st_ctime
+    return len(files)
+
+
+def _scandir_listing(folder: str, include_date: bool) -> int:
+    return len(scan_directory(folder, with_stat=include_date).files())
+
+
+def _run(label: str, fn, folder: str, include_date: bool, n: int) -> None:
+    with _count_syscalls() as counter:
+        start = time.perf_counter()
+        found = fn(folder, include_date)
+        elapsed = time.perf_counter() - start
+    assert found == n
+    print(f"{label:<10} calls={counter.calls:<8} per_file={counter.calls / n:.2f}  time={elapsed:.3f}s")
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--files", type=int, default=10000)
+    p.add_argument("--date", action="store_true", help="Include the ctime stat (like --date).")
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.files):
+            Path(tmp, f"file_{i:07d}.txt").touch()
+
+        print(f"files={args.files} include_date={args.date}")
+        _run("legacy", _legacy_listing, tmp, args.date, args.files)
+        _run("scandir", _scandir_listing, tmp, args.date, args.files)
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+"""
+Measures CLI startup (imports) with python -X importtime.
+
+Runs each command in a fresh interpreter and reports what it imports on top
+of a bare interpreter:
+
+    python benchmarks/bench_startup.py --rounds 5
+    python benchmarks/bench_startup.py --check    # exit 1 over the ceilings below
+"""
+from __future__ import annotations
+
+import argparse
+import compileall
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Modules of this repository (their self time is what we control).
+LOCAL_MODULES = frozenset(p.stem for p in ROOT.glob("*.py"))
+
+# Ceilings for --check: modules imported beyond a bare interpreter, per
+# command, and self time of this repository's modules. They depend on the
+# Python build and machine, so the test suite only checks which modules load.
+MODULE_BUDGETS = {"cli preview": 75, "cli rename --dry-run": 85, "zip_service": 100}
+LOCAL_IMPORT_BUDGET_US = 60_000
+
+
+def import_profile(args: list[str], cwd: str | None = None) -> dict[str, tuple[int, int]]:
+    """
+    Runs `python -X importtime *args` and returns {module: (self_us, cumulative_us)}.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=cwd or str(ROOT),
+        capture_output=True,
+        text=True,
+    )
+    profile: dict[str, tuple[int, int]] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def startup_report(args: list[str], cwd: str | None = None) -> dict[str, object]:
+    """
+    Modules imported beyond a bare interpreter, and the self time (us) of
+    this repository's modules (byte-compiled first, so source compilation
+    is not counted).
+    """
+    compileall.compile_dir(str(ROOT), maxlevels=0, quiet=1)
+    baseline = import_profile(["-c", "pass"], cwd)
+    profile = import_profile(args, cwd)
+    added = {name: times for name, times in profile.items() if name not in baseline}
+    return {
+        "modules": sorted(added),
+        "total_us": sum(self_us for self_us, _ in added.values()),
+        "local_us": sum(added[name][0] for name in added if name in LOCAL_MODULES),
+    }
+
+
+def commands(work: Path) -> dict[str, list[str]]:
+    folder = work / "folder"
+    folder.mkdir(exist_ok=True)
+    zip_in = work / "in.zip"
+    with zipfile.ZipFile(zip_in, "w") as z:
+        z.writestr("a.txt", "a")
+    return {
+        "cli preview": [str(ROOT / "relabeler_cli.py"), "preview", str(folder), "--pattern", "File_##"],
+        "cli rename --dry-run": [
+            str(ROOT / "relabeler_cli.py"), "rename", str(folder), "--pattern", "File_##", "--dry-run",
+        ],
+        "zip_service": [
+            str(ROOT / "zip_service.py"), str(zip_in), str(work / "out.zip"), "--pattern", "File_##",
+        ],
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--rounds", type=int, default=3)
+    p.add_argument("--check", action="store_true", help="Exit 1 when a command goes over its ceilings.")
+    args = p.parse_args(argv)
+
+    over = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, command in commands(Path(tmp)).items():
+            report = startup_report(command, tmp)
+            walls = []
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, *command], cwd=tmp, capture_output=True)
+                walls.append(time.perf_counter() - start)
+            print(
+                f"{label:<22} {min(walls) * 1000:7.1f} ms wall  "
+                f"{report['total_us'] / 1000:6.1f} ms imports  "
+                f"{len(report['modules'])} modules"
+            )
+            if len(report["modules"]) > MODULE_BUDGETS[label] or report["local_us"] > LOCAL_IMPORT_BUDGET_US:
+                over = True
+                print(
+                    f"{label:<22} over budget: {len(report['modules'])}/{MODULE_BUDGETS[label]} modules, "
+                    f"{report['local_us']}/{LOCAL_IMPORT_BUDGET_US} us in local modules"
+                )
+
+    return 1 if args.check and over else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
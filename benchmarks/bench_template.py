@@ -0,0 +1,85 @@
+"""
+Compares per-file name generation with the compiled RenameTemplate.
+
+Runs on synthetic in-memory entries so only Python overhead is measured:
+
+    python benchmarks/bench_template.py --files 1000000 --date --time
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from engine import RenameOptions, RenameTemplate, _apply_counter_pattern  # noqa: E402
+from scanner import FileEntry  # noqa: E402
+
+
+def _legacy(entries: list[FileEntry], options: RenameOptions) -> list[str]:
+    # Mirrors the pre-template loop in build_rename_plan
+    names = []
+    for index, entry in enumerate(entries):
+        base, ext = os.path.splitext(entry.name)
+        new_base = _apply_counter_pattern(options.pattern, index + 1)
+        if options.change_extension and options.new_extension:
+            ext = options.new_extension
+            if not ext.startswith("."):
+                ext = "." + ext
+        if options.include_date:
+            created = datetime.datetime.fromtimestamp(entry.ctime)
+            date_str = created.strftime("%Y%m%d")
+            time_str = created.strftime("%H%M%S")
+            if options.include_time:
+                names.append(f"{new_base}_{date_str}_{time_str}{ext}")
+            else:
+                names.append(f"{new_base}_{date_str}{ext}")
+        else:
+            names.append(new_base + ext)
+    return names
+
+
+def _compiled(entries: list[FileEntry], options: RenameOptions) -> list[str]:
+    return RenameTemplate(options).render(range(1, len(entries) + 1), entries)
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--files", type=int, default=200000)
+    p.add_argument("--date", action="store_true")
+    p.add_argument("--time", action="store_true")
+    p.add_argument("--ext", default=None)
+    args = p.parse_args(argv)
+
+    options = RenameOptions(
+        pattern="File_######",
+        include_date=args.date,
+        include_time=args.time,
+        change_extension=args.ext is not None,
+        new_extension=args.ext,
+    )
+    # ~1000 files per distinct second, like a burst of camera imports
+    base_ts = datetime.datetime(2026, 1, 5).timestamp()
+    entries = [
+        FileEntry(f"img_{i:07d}.jpg", True, 0, base_ts, base_ts + i / 1000, 0)
+        for i in range(args.files)
+    ]
+
+    timings = {}
+    for label, fn in (("legacy", _legacy), ("compiled", _compiled)):
+        start = time.perf_counter()
+        names = fn(entries, options)
+        timings[label] = time.perf_counter() - start
+        print(f"{label:<9} {timings[label]:.3f}s  {args.files / timings[label]:,.0f} names/s")
+
+    assert _legacy(entries[:1000], options) == _compiled(entries[:1000], options)
+    print(f"speedup   {timings['legacy'] / timings['compiled']:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
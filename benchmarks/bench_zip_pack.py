@@ -0,0 +1,63 @@
+"""
+Compares serial and process-pool compression in zip_service.create_zip.
+
+Packs one synthetic folder with each --jobs value and reports MB/s:
+
+    python benchmarks/bench_zip_pack.py --files 2000 --size 262144 --jobs 1 4 8
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from zip_service import create_zip  # noqa: E402
+
+
+def _make_folder(folder: Path, files: int, size: int) -> int:
+    # Compressible but not trivially so: words drawn from a small vocabulary
+    rng = random.Random(0)
+    words = [os.urandom(rng.randint(2, 8)).hex().encode() for _ in range(512)]
+    total = 0
+    for i in range(files):
+        data = b" ".join(rng.choices(words, k=size // 8))[:size]
+        (folder / f"file_{i:07d}.txt").write_bytes(data)
+        total += len(data)
+    return total
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--files", type=int, default=500)
+    p.add_argument("--size", type=int, default=256 * 1024, help="Bytes per file.")
+    p.add_argument("--jobs", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    p.add_argument("--rounds", type=int, default=3)
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp, "src")
+        folder.mkdir()
+        total_mb = _make_folder(folder, args.files, args.size) / 1e6
+        zip_out = Path(tmp, "out.zip")
+
+        print(f"files={args.files} input={total_mb:.1f} MB")
+        for jobs in args.jobs:
+            timings = []
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                create_zip(folder, zip_out, jobs=jobs)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            print(f"jobs={jobs:<3} {best:.3f}s  {total_mb / best:,.1f} MB/s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
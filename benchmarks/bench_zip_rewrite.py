@@ -0,0 +1,63 @@
+"""
+Compares the extract/recompress and raw-rewrite ZIP rename paths.
+
+Both modes rename every member of a synthetic archive via zip_service.main:
+
+    python benchmarks/bench_zip_rewrite.py --files 2000 --size 262144
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from zip_service import main as zip_main  # noqa: E402
+
+
+def _make_archive(path: Path, files: int, size: int) -> None:
+    # Half random (incompressible, like photos), half repetitive text
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        for i in range(files):
+            data = os.urandom(size) if i % 2 else (b"relabeler " * (size // 10 + 1))[:size]
+            z.writestr(f"member_{i:07d}.dat", data)
+
+
+def _time_mode(zip_in: Path, zip_out: Path, extra: list[str]) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        code = zip_main([str(zip_in), str(zip_out), "--pattern", "File_######", *extra])
+    assert code == 0
+    return time.perf_counter() - start
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--files", type=int, default=1000)
+    p.add_argument("--size", type=int, default=256 * 1024, help="Uncompressed bytes per member.")
+    p.add_argument("--rounds", type=int, default=3)
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        zip_in = Path(tmp, "input.zip")
+        zip_out = Path(tmp, "output.zip")
+        _make_archive(zip_in, args.files, args.size)
+        archive_mb = zip_in.stat().st_size / 1e6
+
+        print(f"files={args.files} archive={archive_mb:.1f} MB")
+        for label, extra in (("extract", ["--extract"]), ("rewrite", [])):
+            best = min(_time_mode(zip_in, zip_out, extra) for _ in range(args.rounds))
+            print(f"{label:<8} {best:.3f}s  {archive_mb / best:,.1f} MB/s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
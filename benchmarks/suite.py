@@ -0,0 +1,276 @@
+"""
+Benchmark suite: plan, apply (dry-run and real), undo and zip round-trip.
+
+Generates a synthetic folder and archive per size, runs every phase in a
+fresh child process (so peak RSS is per phase) and writes JSON results:
+
+    python benchmarks/suite.py --sizes 1000 10000 100000 --json results.json
+    python benchmarks/suite.py --sizes 1000000 --date --time --json big.json
+    python benchmarks/suite.py --compare baseline.json results.json
+
+Per phase: seconds, files/sec, peak RSS, read/write syscalls (/proc/self/io),
+os-level audit events (renames, scandirs, opens, ...) and, when strace is
+installed and --strace is given, the child's total syscall count.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+PHASES = ("plan", "apply_dry_run", "apply", "undo", "zip_roundtrip")
+
+# Audit events counted during the timed region (see sys.addaudithook).
+_AUDITED_EVENTS = frozenset({"open", "os.rename", "os.scandir", "os.listdir", "os.remove", "os.mkdir", "os.chmod"})
+
+# Bytes per synthetic archive member.
+_MEMBER_SIZE = 64
+
+
+def _proc_io() -> dict[str, int]:
+    try:
+        with open("/proc/self/io") as f:
+            return {key: int(value) for key, value in (line.split(": ") for line in f)}
+    except OSError:
+        return {}
+
+
+def _peak_rss_kb() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS, KiB elsewhere
+
+
+# --- child side -------------------------------------------------------------
+
+def _options(args: argparse.Namespace):
+    from engine import RenameOptions
+
+    return RenameOptions(
+        pattern="Bench_######",
+        include_date=args.date,
+        include_time=args.time,
+        change_extension=False,
+        new_extension=None,
+    )
+
+
+def _run_phase(args: argparse.Namespace) -> dict:
+    """
+    Runs one phase; everything before the timed region (imports, planning
+    for the apply phases) is excluded from seconds and os_events.
+    """
+    from engine import build_rename_plan
+
+    folder = str(Path(args.work, "folder"))
+    mappings_path = str(Path(args.work, "mappings.ndjson"))
+    options = _options(args)
+
+    # Untimed setup
+    if args.child == "plan":
+        timed = lambda: build_rename_plan(folder, options)  # noqa: E731
+    elif args.child in ("apply_dry_run", "apply"):
+        from filesystem import apply_rename_plan
+        ops = build_rename_plan(folder, options)
+        dry_run = args.child == "apply_dry_run"
+        timed = lambda: apply_rename_plan(folder, ops, dry_run=dry_run, compact=True)  # noqa: E731
+    elif args.child == "undo":
+        from filesystem import undo_rename_mappings
+        from mappings_io import open_mappings
+        mappings = open_mappings(mappings_path)   # v2: streamed backwards
+        timed = lambda: undo_rename_mappings(mappings)  # noqa: E731
+    else:
+        from zip_service import ZipJob, run_zip_job
+        job = ZipJob(
+            zip_in=str(Path(args.work, "input.zip")),
+            zip_out=str(Path(args.work, "output.zip")),
+            options=options,
+        )
+        timed = lambda: run_zip_job(job)  # noqa: E731
+
+    events: dict[str, int] = {}
+
+    def count(event: str, _args) -> None:
+        if counting and event in _AUDITED_EVENTS:
+            events[event] = events.get(event, 0) + 1
+
+    counting = False
+    sys.addaudithook(count)
+    from filesystem import native_rename_count   # renames audit hooks do not see
+
+    io_before = _proc_io()
+    native_before = native_rename_count()
+    counting = True
+    start = time.perf_counter()
+    outcome = timed()
+    seconds = time.perf_counter() - start
+    counting = False
+    io_after = _proc_io()
+    native = native_rename_count() - native_before
+    if native:
+        events["os.rename"] = events.get("os.rename", 0) + native
+
+    if args.child == "apply":
+        from mappings_io import save_mappings
+        save_mappings(mappings_path, outcome.mappings)
+        assert not outcome.errors, outcome.errors[:5]
+    elif args.child == "undo":
+        assert not outcome, outcome[:5]
+
+    return {
+        "seconds": seconds,
+        "peak_rss_kb": _peak_rss_kb(),
+        "read_syscalls": io_after.get("syscr", 0) - io_before.get("syscr", 0) if io_before else None,
+        "write_syscalls": io_after.get("syscw", 0) - io_before.get("syscw", 0) if io_before else None,
+        "os_events": events,
+    }
+
+
+# --- parent side ------------------------------------------------------------
+
+def _generate(work: Path, files: int) -> None:
+    folder = work / "folder"
+    folder.mkdir()
+    for i in range(files):
+        # Unsorted, mixed-case names so planning has real sorting to do
+        (folder / f"IMG_{(i * 7919) % files:07d}.{'JPG' if i % 3 else 'jpg'}").touch()
+
+    payload = b"x" * _MEMBER_SIZE
+    with zipfile.ZipFile(work / "input.zip", "w", compression=zipfile.ZIP_DEFLATED) as z:
+        for i in range(files):
+            z.writestr(f"IMG_{i:07d}.jpg", payload)
+
+
+def _strace_total(path: str) -> int | None:
+    # Last line of `strace -c`: "100.00  <secs>  <usecs/call>  <calls>  <errors> total"
+    try:
+        with open(path) as f:
+            lines = [line.split() for line in f if line.strip().endswith("total")]
+    except OSError:
+        return None
+    return int(lines[-1][-3]) if lines else None
+
+
+def _run_child(phase: str, work: Path, files: int, args: argparse.Namespace) -> dict:
+    command = [sys.executable, __file__, "--child", phase, "--work", str(work)]
+    if args.date:
+        command.append("--date")
+    if args.time:
+        command.append("--time")
+
+    strace_out = None
+    if args.strace and shutil.which("strace"):
+        strace_out = str(work / f"strace-{phase}.txt")
+        command = ["strace", "-f", "-c", "-o", strace_out, *command]
+
+    proc = subprocess.run(command, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{phase} failed for {files} files:\n{proc.stderr}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["syscalls"] = _strace_total(strace_out) if strace_out else None
+    result.update(phase=phase, files=files, files_per_sec=files / result["seconds"] if result["seconds"] else None)
+    return result
+
+
+def run_suite(args: argparse.Namespace) -> dict:
+    results = []
+    for files in args.sizes:
+        with tempfile.TemporaryDirectory(prefix="relabeler-bench-", dir=args.tmp) as tmp:
+            work = Path(tmp)
+            start = time.perf_counter()
+            _generate(work, files)
+            print(f"files={files}: generated in {time.perf_counter() - start:.1f}s", flush=True)
+            for phase in [phase for phase in PHASES if phase in args.phases]:
+                result = _run_child(phase, work, files, args)
+                results.append(result)
+                print(
+                    f"  {phase:<14} {result['seconds']:9.3f}s  {result['files_per_sec'] or 0:>12,.0f} files/s  "
+                    f"rss {result['peak_rss_kb'] or 0:>9,} KiB",
+                    flush=True,
+                )
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "date": args.date,
+            "time": args.time,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline_path: str, current_path: str, tolerance: float) -> int:
+    """
+    Prints files/sec ratios per (phase, files); returns 1 when any phase is
+    slower than baseline by more than tolerance (0.2 = 20%).
+    """
+    with open(baseline_path) as f:
+        baseline = {(r["phase"], r["files"]): r for r in json.load(f)["results"]}
+    with open(current_path) as f:
+        current = json.load(f)["results"]
+
+    regressed = False
+    for result in current:
+        base = baseline.get((result["phase"], result["files"]))
+        if base is None or not base["files_per_sec"] or not result["files_per_sec"]:
+            continue
+        ratio = result["files_per_sec"] / base["files_per_sec"]
+        flag = ""
+        if ratio < 1 - tolerance:
+            regressed = True
+            flag = "  REGRESSION"
+        print(f"{result['phase']:<14} {result['files']:>9}  {ratio:6.2f}x{flag}")
+    return 1 if regressed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="File counts (e.g. 1000 10000 100000 1000000).")
+    p.add_argument("--phases", nargs="+", choices=PHASES, default=list(PHASES))
+    p.add_argument("--date", action="store_true", help="Plan with the date suffix (stats every file).")
+    p.add_argument("--time", action="store_true", help="Plan with the time suffix too (implies --date).")
+    p.add_argument("--json", default=None, help="Write results to this JSON file.")
+    p.add_argument("--tmp", default=None, help="Directory for synthetic data (default: system temp dir).")
+    p.add_argument("--strace", action="store_true", help="Count all syscalls with strace -c (if installed).")
+    p.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="Compare two result files.")
+    p.add_argument("--tolerance", type=float, default=0.2, help="Allowed files/sec drop for --compare.")
+    p.add_argument("--child", choices=PHASES, help=argparse.SUPPRESS)
+    p.add_argument("--work", help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+    args.date = args.date or args.time
+
+    if args.child:
+        print(json.dumps(_run_phase(args)))
+        return 0
+    if args.compare:
+        return compare(*args.compare, args.tolerance)
+
+    if "undo" in args.phases and "apply" not in args.phases:
+        p.error("the undo phase needs the apply phase (it undoes its mappings)")
+
+    report = run_suite(args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
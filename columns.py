@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import os
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Iterator, Sequence
+
+
+# Offsets start as 32-bit and widen to 64-bit once the buffer passes 4 GiB.
+_MAX_32BIT = 0xFFFFFFFF
+
+
+def _encode(name: str) -> bytes:
+    # surrogateescape round-trips undecodable POSIX file names
+    return name.encode("utf-8", "surrogateescape")
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode("utf-8", "surrogateescape")
+
+
+class NameColumn(Sequence[str]):
+    """
+    Append-only list of strings packed into one UTF-8 buffer plus an offsets
+    array: about len(name) + 4 bytes per name instead of a str object each.
+    """
+
+    __slots__ = ("_buffer", "_offsets")
+
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        self._buffer = bytearray()
+        self._offsets = array("I", [0])
+        for name in names:
+            self.append(name)
+
+    def append(self, name: str) -> None:
+        self._buffer += _encode(name)
+        end = len(self._buffer)
+        if end > _MAX_32BIT and self._offsets.typecode == "I":
+            self._offsets = array("Q", self._offsets)
+        self._offsets.append(end)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("NameColumn index out of range")
+        return _decode(self._buffer[self._offsets[index]:self._offsets[index + 1]])
+
+    def __iter__(self) -> Iterator[str]:
+        buffer, offsets = self._buffer, self._offsets
+        for i in range(len(offsets) - 1):
+            yield _decode(buffer[offsets[i]:offsets[i + 1]])
+
+    def nbytes(self) -> int:
+        return len(self._buffer) + self._offsets.itemsize * len(self._offsets)
+
+    def search(self, text: str, *, ignore_case: bool = True) -> Iterator[int]:
+        """
+        Indices of the names containing text, in order, found by scanning the
+        packed buffer (names are never decoded). ignore_case folds ASCII
+        letters only.
+        """
+        needle = _encode(text)
+        if not needle:
+            yield from range(len(self))
+            return
+        buffer = self._buffer
+        if ignore_case:
+            buffer, needle = buffer.lower(), needle.lower()
+        offsets = self._offsets
+        pos = buffer.find(needle)
+        while pos >= 0:
+            index = bisect_right(offsets, pos) - 1
+            end = offsets[index + 1]
+            if pos + len(needle) <= end:
+                yield index
+                pos = buffer.find(needle, end)
+            else:
+                pos = buffer.find(needle, pos + 1)  # spans two names
+
+
+class _PairSequence(Sequence[tuple[str, str]]):
+    """
+    Read API shared by the pair columns: compares equal to any sequence
+    holding the same pairs (e.g. a list) and copies out as a list.
+    """
+
+    __slots__ = ()
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (_PairSequence, list, tuple)):
+            return len(self) == len(other) and all(a == tuple(b) for a, b in zip(self, other))
+        return NotImplemented
+
+    def copy(self) -> list[tuple[str, str]]:
+        return list(self)
+
+
+class PairColumn(_PairSequence):
+    """
+    Append-only list of (first, second) string pairs stored as two NameColumns.
+    """
+
+    __slots__ = ("_first", "_second")
+
+    def __init__(self, pairs: Iterable[tuple[str, str]] = ()) -> None:
+        self._first = NameColumn()
+        self._second = NameColumn()
+        for pair in pairs:
+            self.append(pair)
+
+    def append(self, pair: tuple[str, str]) -> None:
+        first, second = pair
+        self._first.append(first)
+        self._second.append(second)
+
+    def __len__(self) -> int:
+        return len(self._first)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return (self._first[index], self._second[index])
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        return zip(self._first, self._second)
+
+    def nbytes(self) -> int:
+        return self._first.nbytes() + self._second.nbytes()
+
+
+class FolderPairColumn(PairColumn):
+    """
+    PairColumn of absolute paths that all live directly in one folder.
+    Only the file names are stored; the folder prefix is shared.
+    """
+
+    __slots__ = ("folder_path", "_prefix")
+
+    def __init__(self, folder_path: str, pairs: Iterable[tuple[str, str]] = ()) -> None:
+        self.folder_path = folder_path
+        self._prefix = os.path.join(folder_path, "")
+        super().__init__(pairs)
+
+    def _relative(self, path: str) -> str:
+        if not path.startswith(self._prefix):
+            raise ValueError(f"Path is not inside {self.folder_path}: {path}")
+        return path[len(self._prefix):]
+
+    def append(self, pair: tuple[str, str]) -> None:
+        first, second = pair
+        super().append((self._relative(first), self._relative(second)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        first, second = super().__getitem__(index)
+        return (self._prefix + first, self._prefix + second)
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        prefix = self._prefix
+        for first, second in super().__iter__():
+            yield (prefix + first, prefix + second)
+
+
+class RowRefColumn(_PairSequence):
+    """
+    (first[i], second[i]) pairs that reference rows of two existing parallel
+    NameColumns (e.g. a RenamePlan's) by index: 4 bytes per pair. Pairs that
+    are not plan rows can be added with append_pair (stored separately).
+    An optional prefix (a folder path ending in a separator) is prepended
+    on read.
+    """
+
+    __slots__ = ("_first", "_second", "_prefix", "_rows", "_extra")
+
+    # Row values with this bit set point into _extra instead of the columns.
+    _EXTRA_BIT = 0x80000000
+
+    def __init__(self, first: NameColumn, second: NameColumn, prefix: str = "") -> None:
+        self._first = first
+        self._second = second
+        self._prefix = prefix
+        self._rows = array("I")
+        self._extra = PairColumn()
+
+    def append_row(self, index: int) -> None:
+        self._rows.append(index)
+
+    def append_pair(self, first: str, second: str) -> None:
+        self._rows.append(self._EXTRA_BIT | len(self._extra))
+        self._extra.append((first, second))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        row = self._rows[index]
+        if row & self._EXTRA_BIT:
+            first, second = self._extra[row & ~self._EXTRA_BIT]
+        else:
+            first, second = self._first[row], self._second[row]
+        return (self._prefix + first, self._prefix + second)
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        for i in range(len(self._rows)):
+            yield self[i]
+
+    def nbytes(self) -> int:
+        return self._rows.itemsize * len(self._rows) + self._extra.nbytes()
@@ -1,12 +1,30 @@
 import os
 import datetime
+import itertools
+import math
 import re
 from dataclasses import dataclass
-from typing import List
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, NamedTuple, Optional
+
+from columns import NameColumn
+from external_sort import sorted_stream
+from scanner import DEFAULT_WALK_WORKERS, FileEntry, ScanSnapshot, iter_scan, walk_tree
+
+if TYPE_CHECKING:
+    from metrics import Metrics
 
 
 _HASH_RUN_RE = re.compile(r"(#+)")
 
+# Listing entries sorted in memory before iter_rename_plan spills to disk.
+DEFAULT_MEMORY_BUDGET = 1_000_000
+
+# Names rendered per RenameTemplate.render call when streaming a plan.
+_RENDER_BATCH = 4096
+
+# Recursive numbering: restart in every directory, or count across the tree.
+COUNTER_SCOPES = ("directory", "global")
+
 
 @dataclass
 class RenameOptions:
@@ -23,6 +41,79 @@ class RenameOperation:
     new_name: str
 
 
+class PlanRow:
+    """
+    Lightweight row view of a RenamePlan (duck-types RenameOperation).
+    """
+
+    __slots__ = ("old_name", "new_name")
+
+    def __init__(self, old_name: str, new_name: str) -> None:
+        self.old_name = old_name
+        self.new_name = new_name
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (PlanRow, RenameOperation)):
+            return self.old_name == other.old_name and self.new_name == other.new_name
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"PlanRow(old_name={self.old_name!r}, new_name={self.new_name!r})"
+
+
+class RenamePlan:
+    """
+    Compact, columnar rename plan for one folder.
+
+    Old and new names are packed into NameColumns and the folder is stored
+    once. Iterating yields PlanRow views, so a RenamePlan can be passed
+    anywhere a list of RenameOperation is accepted.
+    """
+
+    __slots__ = ("folder_path", "old_names", "new_names")
+
+    def __init__(self, folder_path: str) -> None:
+        self.folder_path = folder_path
+        self.old_names = NameColumn()
+        self.new_names = NameColumn()
+
+    @classmethod
+    def from_operations(cls, folder_path: str, operations: Iterable[RenameOperation]) -> "RenamePlan":
+        plan = cls(folder_path)
+        for op in operations:
+            plan.append(op.old_name, op.new_name)
+        return plan
+
+    def append(self, old_name: str, new_name: str) -> None:
+        self.old_names.append(old_name)
+        self.new_names.append(new_name)
+
+    def __len__(self) -> int:
+        return len(self.old_names)
+
+    def __getitem__(self, index: int) -> PlanRow:
+        return PlanRow(self.old_names[index], self.new_names[index])
+
+    def __iter__(self) -> Iterator[PlanRow]:
+        for old_name, new_name in zip(self.old_names, self.new_names):
+            yield PlanRow(old_name, new_name)
+
+    def nbytes(self) -> int:
+        return self.old_names.nbytes() + self.new_names.nbytes()
+
+
+def _split_pattern(pattern: str) -> tuple[str, int, str]:
+    """
+    Split a pattern around its first run of # into (prefix, width, suffix).
+    """
+    match = _HASH_RUN_RE.search(pattern)
+    if not match:
+        raise ValueError("Pattern must contain at least one '#' group (e.g., Vacation_###).")
+
+    start, end = match.span(1)
+    return pattern[:start], end - start, pattern[end:]
+
+
 def _apply_counter_pattern(pattern: str, counter: int) -> str:
     """
     Replace the first run of # with a zero-padded counter.
@@ -31,60 +122,209 @@ def _apply_counter_pattern(pattern: str, counter: int) -> str:
       "Vacation_###"   + 1 -> "Vacation_001"
       "Vacation_####"  + 1 -> "Vacation_0001"
     """
-    match = _HASH_RUN_RE.search(pattern)
-    if not match:
-        raise ValueError("Pattern must contain at least one '#' group (e.g., Vacation_###).")
+    prefix, width, suffix = _split_pattern(pattern)
+    return f"{prefix}{counter:0{width}d}{suffix}"
 
-    run = match.group(1)
-    width = len(run)
-    number = f"{counter:0{width}d}"
-
-    start, end = match.span(1)
-    return pattern[:start] + number + pattern[end:]
 
+def _extension(name: str) -> str:
+    """
+    Same result as os.path.splitext(name)[1] for a bare file name, without
+    the generic path handling (hot path when rendering large plans).
+    """
+    dot = name.rfind(".")
+    if dot <= 0:
+        return ""
+    if name[0] == "." and not name[:dot].strip("."):
+        return ""  # leading dots belong to the base name (".bashrc")
+    return name[dot:]
 
-def build_rename_plan(
-    folder_path: str,
-    options: RenameOptions,
-) -> List[RenameOperation]:
-    files = [
-        f for f in os.listdir(folder_path)
-        if os.path.isfile(os.path.join(folder_path, f))
-    ]
 
-    files.sort(key=lambda s: s.lower())
+class RenameTemplate:
+    """
+    RenameOptions compiled once for a whole plan.
 
-    operations: List[RenameOperation] = []
+    The pattern is split into prefix / counter width / suffix, the new
+    extension is normalized up front and date (and time) suffixes are
+    memoized per distinct timestamp second.
+    """
 
-    for index, file_name in enumerate(files):
-        base, ext = os.path.splitext(file_name)
+    __slots__ = ("prefix", "width", "suffix", "extension", "include_date", "_date_format", "_date_cache")
 
-        # Counter is 1-based
-        new_base = _apply_counter_pattern(options.pattern, index + 1)
+    def __init__(self, options: RenameOptions) -> None:
+        self.prefix, self.width, self.suffix = _split_pattern(options.pattern)
 
+        self.extension: str | None = None
         if options.change_extension and options.new_extension:
             ext = options.new_extension
-            if not ext.startswith("."):
-                ext = "." + ext
+            self.extension = ext if ext.startswith(".") else "." + ext
+
+        self.include_date = options.include_date
+        self._date_format = "_%Y%m%d_%H%M%S" if options.include_time else "_%Y%m%d"
+        self._date_cache: dict[int, str] = {}
+
+    def date_suffix(self, timestamp: float) -> str:
+        second = math.floor(timestamp)
+        cached = self._date_cache.get(second)
+        if cached is None:
+            cached = datetime.datetime.fromtimestamp(second).strftime(self._date_format)
+            self._date_cache[second] = cached
+        return cached
 
-        if options.include_date:
-            stats = os.stat(os.path.join(folder_path, file_name))
-            created = datetime.datetime.fromtimestamp(stats.st_ctime)
-            date_str = created.strftime("%Y%m%d")
-            time_str = created.strftime("%H%M%S")
+    def render(self, counters: Iterable[int], stats: Iterable[FileEntry]) -> list[str]:
+        """
+        Render one new name per (counter, entry) pair in a single pass.
+        entries need .name, and .ctime when the date suffix is enabled.
+        """
+        head, tail = self.prefix, self.suffix
+        number_format = f"0{self.width}d"
+        fixed_ext = self.extension
+        include_date = self.include_date
+        date_suffix = self.date_suffix
+        extension = _extension
 
-            if options.include_time:
-                final_name = f"{new_base}_{date_str}_{time_str}{ext}"
+        names: list[str] = []
+        append = names.append
+        for counter, entry in zip(counters, stats):
+            ext = fixed_ext if fixed_ext is not None else extension(entry.name)
+            if include_date:
+                append(f"{head}{counter:{number_format}}{tail}{date_suffix(entry.ctime)}{ext}")
             else:
-                final_name = f"{new_base}_{date_str}{ext}"
+                append(f"{head}{counter:{number_format}}{tail}{ext}")
+        return names
+
+
+def iter_rename_plan(
+    folder_path: str,
+    options: RenameOptions,
+    *,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    spill_dir: Optional[str] = None,
+    metrics: Optional["Metrics"] = None,
+) -> Iterator[RenameOperation]:
+    """
+    Yields the rename plan lazily, in the same order as build_rename_plan.
+
+    - memory_budget is the number of listing entries kept in memory while
+      sorting; larger folders spill sorted runs to disk (spill_dir or the
+      system temp dir) and are merged back in case-insensitive order.
+    - The folder is fully listed before the first operation is yielded,
+      so renaming while consuming the stream does not disturb the listing.
+    - metrics (a metrics.Metrics) gets "list"/"stat" time from the scan and
+      "plan" time for sorting and rendering names.
+    """
+    # One scandir pass; files are only stat'ed when the date suffix needs ctime.
+    entries = iter_scan(folder_path, with_stat=options.include_date, metrics=metrics)
+    return iter_plan_for_entries(
+        entries, options, memory_budget=memory_budget, spill_dir=spill_dir, metrics=metrics
+    )
+
+
+def iter_plan_for_entries(
+    entries: Iterable[FileEntry],
+    options: RenameOptions,
+    *,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    spill_dir: Optional[str] = None,
+    metrics: Optional["Metrics"] = None,
+    start: int = 1,
+) -> Iterator[RenameOperation]:
+    """
+    Plans renames for already-listed entries (e.g. a ScanSnapshot's).
+    Non-files are ignored; entries need ctime when the date suffix is on.
+    metrics gets the "plan" time (sorting and rendering, not listing).
+    start is the first counter value (see iter_tree_plans).
+    """
+    template = RenameTemplate(options)
+
+    files = (e for e in entries if e.is_file)
+    ordered = sorted_stream(files, key=lambda e: e.name.lower(), memory_budget=memory_budget, spill_dir=spill_dir)
+
+    # Counter is 1-based
+    counter = start
+    while True:
+        if metrics is None:
+            batch = list(itertools.islice(ordered, _RENDER_BATCH))
+            new_names = template.render(range(counter, counter + len(batch)), batch)
         else:
-            final_name = new_base + ext
+            with metrics.phase("plan"):
+                batch = list(itertools.islice(ordered, _RENDER_BATCH))
+                new_names = template.render(range(counter, counter + len(batch)), batch)
+        if not batch:
+            return
+        counter += len(batch)
+        for entry, new_name in zip(batch, new_names):
+            yield RenameOperation(old_name=entry.name, new_name=new_name)
+
+
+class DirectoryPlan(NamedTuple):
+    plan: RenamePlan          # one directory's renames (plan.folder_path is the directory)
+    snapshot: ScanSnapshot    # the listing it was planned from
+
+
+def iter_tree_plans(
+    root: str,
+    options: RenameOptions,
+    *,
+    counter: str = "directory",
+    ordered: bool = False,
+    workers: int = DEFAULT_WALK_WORKERS,
+    on_error: Optional[Callable[[str, OSError], None]] = None,
+    metrics: Optional["Metrics"] = None,
+) -> Iterator[DirectoryPlan]:
+    """
+    Plans root and every directory below it (scanner.walk_tree), yielding
+    each directory's plan as soon as that directory is listed, so renaming
+    can start before the walk is over.
+
+    - counter="directory" numbers every directory from 1; "global" keeps
+      counting across directories, taken in walk_tree's fixed pre-order
+      so the numbering is the same on every run.
+    - ordered=True also fixes the order with per-directory counters (e.g.
+      for a preview); otherwise directories come as they finish listing.
+    - Directories without files are skipped; on_error and metrics are
+      passed to walk_tree (metrics also gets "plan" time).
+    """
+    if counter not in COUNTER_SCOPES:
+        raise ValueError(f"counter must be one of: {', '.join(COUNTER_SCOPES)}")
+    snapshots = walk_tree(
+        root,
+        with_stat=options.include_date,
+        workers=workers,
+        ordered=ordered or counter == "global",
+        on_error=on_error,
+        metrics=metrics,
+    )
+    start = 1
+    for snapshot in snapshots:
+        operations = iter_plan_for_entries(snapshot.entries, options, metrics=metrics, start=start)
+        plan = RenamePlan.from_operations(snapshot.folder_path, operations)
+        if not len(plan):
+            continue
+        if counter == "global":
+            start += len(plan)
+        yield DirectoryPlan(plan, snapshot)
 
-        operations.append(
-            RenameOperation(
-                old_name=file_name,
-                new_name=final_name
-            )
-        )
 
-    return operations
+def build_rename_plan(
+    folder_path: str,
+    options: RenameOptions,
+    *,
+    metrics: Optional["Metrics"] = None,
+) -> List[RenameOperation]:
+    return list(iter_rename_plan(folder_path, options, metrics=metrics))
+
+
+def build_compact_plan(
+    folder_path: str,
+    options: RenameOptions,
+    *,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+) -> RenamePlan:
+    """
+    Same plan as build_rename_plan, stored as a RenamePlan (a few dozen
+    bytes per file instead of a RenameOperation instance and two strs).
+    """
+    return RenamePlan.from_operations(
+        folder_path,
+        iter_rename_plan(folder_path, options, memory_budget=memory_budget),
+    )
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import heapq
+import os
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Optional, TypeVar
+
+if TYPE_CHECKING:
+    import tempfile
+
+
+T = TypeVar("T")
+
+# Records per pickle frame in a spilled run (amortizes pickle overhead).
+_FRAME_SIZE = 4096
+
+# Runs open at once while merging; more runs are merged in passes first,
+# so a huge sort never runs out of file descriptors.
+_MERGE_FANIN = 64
+
+
+def _write_run(directory: str, records: Iterable[tuple[Any, int, T]]) -> str:
+    # Imported on first spill: most folders sort in memory
+    import itertools
+    import pickle
+    import tempfile
+
+    fd, path = tempfile.mkstemp(prefix="run_", suffix=".bin", dir=directory)
+    records = iter(records)
+    with os.fdopen(fd, "wb") as f:
+        while True:
+            frame = list(itertools.islice(records, _FRAME_SIZE))
+            if not frame:
+                break
+            pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(path: str) -> Iterator[tuple[Any, int, T]]:
+    import pickle
+
+    with open(path, "rb") as f:
+        while True:
+            try:
+                frame = pickle.load(f)
+            except EOFError:
+                return
+            yield from frame
+
+
+def sorted_stream(
+    items: Iterable[T],
+    key: Callable[[T], Any],
+    *,
+    memory_budget: int,
+    spill_dir: Optional[str] = None,
+) -> Iterator[T]:
+    """
+    Yields items in the same order as sorted(items, key=key) (stable).
+
+    At most memory_budget items are held in memory at once while reading;
+    beyond that, sorted runs are spilled to a temp directory and merged
+    lazily (at most _MERGE_FANIN runs open at once). Temp files are removed
+    when the generator finishes or is closed.
+    """
+    if memory_budget < 1:
+        raise ValueError("memory_budget must be at least 1.")
+
+    buffer: list[tuple[Any, int, T]] = []
+    tmpdir: Optional[tempfile.TemporaryDirectory] = None
+    runs: list[str] = []
+
+    try:
+        # seq keeps ties in input order across runs, so the merge stays stable
+        for seq, item in enumerate(items):
+            buffer.append((key(item), seq, item))
+            if len(buffer) >= memory_budget:
+                if tmpdir is None:
+                    import tempfile
+
+                    tmpdir = tempfile.TemporaryDirectory(prefix="relabeler_sort_", dir=spill_dir)
+                buffer.sort()
+                runs.append(_write_run(tmpdir.name, buffer))
+                buffer = []
+
+        buffer.sort()
+        if not runs:
+            for record in buffer:
+                yield record[2]
+            return
+
+        # Fewer than _MERGE_FANIN runs (plus the buffer) for the last merge
+        while len(runs) >= _MERGE_FANIN:
+            group, runs = runs[:_MERGE_FANIN], runs[_MERGE_FANIN:]
+            runs.append(_write_run(tmpdir.name, heapq.merge(*(_read_run(path) for path in group))))
+            for path in group:
+                os.remove(path)
+
+        streams = [_read_run(path) for path in runs]
+        streams.append(iter(buffer))
+        for record in heapq.merge(*streams):
+            yield record[2]
+    finally:
+        if tmpdir is not None:
+            tmpdir.cleanup()
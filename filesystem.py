@@ -1,127 +1,1636 @@
 from __future__ import annotations
 
-import datetime
+import errno
 import os
+import threading
+import time
 from dataclasses import dataclass, field
-from typing import Callable, Optional
+from typing import TYPE_CHECKING, Callable, Iterable, NamedTuple, Optional, Sequence, Sized
 
-from engine import RenameOperation
+from columns import FolderPairColumn, PairColumn, RowRefColumn
+from engine import RenameOperation, RenamePlan
+from log_utils import SessionLogger
+from metrics import Metrics
+from scanner import ScanSnapshot, scan_directory
+from scheduler import RenameStep, direct_steps, schedule_renames
+
+if TYPE_CHECKING:
+    from engine import DirectoryPlan
+    from journal import FsyncPolicy, JournalState, RenameJournal
 
 
 ProgressCallback = Callable[[int, int, RenameOperation], None]
 
 
+class ProgressEvent(NamedTuple):
+    done: int                # items processed so far
+    total: int               # items expected so far (0 if unknown, e.g. a streamed plan)
+    batch: int               # items since the previous event
+    bytes_done: int          # bytes processed so far (0 for jobs that move no data)
+    elapsed: float           # seconds since the job started
+    files_per_sec: float     # done / elapsed
+    eta: Optional[float]     # seconds left at that rate; None while unknown
+    name: str                # the last item processed
+
+
+class Progress:
+    """
+    Rate-controlled progress for long jobs. apply_rename_plan,
+    apply_rename_tree, undo_renames and zip_service.run_zip_job take one
+    as progress= and count every item into it, but on_event only gets a
+    ProgressEvent every interval seconds, or every `every` items when
+    every is set, and once more when the last expected item is done.
+
+    - Counting happens on the job's calling thread (never on workers);
+      on_event runs there too, and an exception it raises is ignored.
+    - One Progress can span several calls (e.g. one per folder): each call
+      adds its items to total, and flush() reports whatever is pending.
+    """
+
+    def __init__(
+        self,
+        on_event: Callable[[ProgressEvent], None],
+        *,
+        interval: float = 0.1,
+        every: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if interval < 0 or every < 0:
+            raise ValueError("interval and every must not be negative")
+        self.on_event = on_event
+        self.interval = interval
+        self.every = every
+        self.total = 0
+        self.done = 0
+        self.bytes_done = 0
+        self.name = ""
+        self._clock = clock
+        self._start: Optional[float] = None
+        self._reported = 0
+        self._next_time = 0.0
+        self._next_count = every
+
+    def expect(self, items: int) -> None:
+        """
+        Adds items to the total (0 keeps it unknown) and starts the clock.
+        """
+        if self._start is None:
+            self._start = self._clock()
+            self._next_time = self._start + self.interval
+        self.total += items
+
+    def advance(self, items: int = 1, name: str = "", nbytes: int = 0) -> None:
+        self.done += items
+        self.bytes_done += nbytes
+        self.name = name
+        if self.every:
+            due = self.done >= self._next_count
+        else:
+            due = self._clock() >= self._next_time
+        if due or self.done == self.total:
+            self._emit()
+
+    def flush(self) -> None:
+        if self.done != self._reported:
+            self._emit()
+
+    def _emit(self) -> None:
+        now = self._clock()
+        if self._start is None:
+            self._start = now
+        elapsed = now - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate and self.total >= self.done else None
+        event = ProgressEvent(
+            self.done, self.total, self.done - self._reported, self.bytes_done, elapsed, rate, eta, self.name
+        )
+        self._reported = self.done
+        self._next_time = now + self.interval
+        self._next_count = self.done + self.every
+        try:
+            self.on_event(event)
+        except Exception:
+            pass
+
+
+def _feed_progress(progress: Progress, on_progress: Optional[Callable]) -> Callable:
+    """
+    An on_progress hook that counts each item (an operation or a name) into
+    progress, then calls on_progress.
+    """
+    advance = progress.advance
+
+    def feed(current: int, total: int, item) -> None:
+        advance(1, getattr(item, "old_name", item))
+        if on_progress is not None:
+            on_progress(current, total, item)
+
+    return feed
+
+
 @dataclass
 class ApplyResult:
     renamed: list[tuple[str, str]] = field(default_factory=list)    # (old_name, new_name)
     skipped: list[str] = field(default_factory=list)               # new_name values skipped due to collision
     errors: list[str] = field(default_factory=list)                # error messages
     mappings: list[tuple[str, str]] = field(default_factory=list)  # (new_path, old_path) for undo
+    attempted: int = 0                                             # operations processed
+    metrics: Metrics = field(default_factory=Metrics)              # phase timings and counters
+    cancelled: bool = False                                        # stopped early by cancel
+
+    @classmethod
+    def compact(cls, folder_path: str, plan: Optional[RenamePlan] = None) -> "ApplyResult":
+        """
+        ApplyResult whose renamed/mappings are packed columns (same read API).
+
+        With the RenamePlan being applied, rows are stored as 4-byte indices
+        into the plan's name columns; otherwise names are packed and the
+        folder is stored once for all mappings.
+        """
+        if plan is not None:
+            prefix = os.path.join(folder_path, "")
+            return cls(
+                renamed=RowRefColumn(plan.old_names, plan.new_names),
+                mappings=RowRefColumn(plan.new_names, plan.old_names, prefix),
+            )
+        return cls(renamed=PairColumn(), mappings=FolderPairColumn(folder_path))
+
+    def _add_renamed(self, index: int, op: RenameOperation) -> None:
+        if isinstance(self.renamed, RowRefColumn):
+            self.renamed.append_row(index)
+        else:
+            self.renamed.append((op.old_name, op.new_name))
+
+    def _add_mapping(self, folder_path: str, new_name: str, old_name: str, index: Optional[int] = None) -> None:
+        """
+        index is the plan row when (old_name -> new_name) is exactly that
+        operation (not a temporary-name step).
+        """
+        if isinstance(self.mappings, RowRefColumn):
+            if index is None:
+                self.mappings.append_pair(new_name, old_name)
+            else:
+                self.mappings.append_row(index)
+        else:
+            self.mappings.append((os.path.join(folder_path, new_name), os.path.join(folder_path, old_name)))
+
+
+def _log_line(logger: Optional[SessionLogger], message: str) -> None:
+    if logger is not None:
+        logger.log(message)
+
+
+class _Outcome(NamedTuple):
+    status: str       # "renamed" | "dry_run" | "skipped" | "missing" | "error"
+    detail: str = ""  # exception text for "error", extra note otherwise
+
+
+_DONE = ("renamed", "dry_run")
+
+
+# Kernel calls that rename without replacing an existing target, resolved
+# on the first real rename (ctypes stays out of startup): a callable, or
+# False when the platform has none.
+_native_noreplace = None
+
+# Renames made through that call. It raises no "os.rename" audit event, so
+# audit-hook counters add this (see native_rename_count).
+_native_renames = 0
+_native_renames_lock = threading.Lock()
+
+
+def native_rename_count() -> int:
+    """
+    Renames made so far in this process through the kernel's no-replace
+    call instead of os.rename (which audit hooks do not see).
+    """
+    return _native_renames
 
 
-def _log_line(log_file_path: Optional[str], message: str) -> None:
-    if not log_file_path:
+def _load_native_noreplace():
+    import ctypes
+    import sys
+
+    if sys.platform.startswith("linux"):
+        name, flag, cwd_fd = "renameat2", 1, -100       # RENAME_NOREPLACE, AT_FDCWD
+    elif sys.platform == "darwin":
+        name, flag, cwd_fd = "renameatx_np", 4, -2      # RENAME_EXCL, AT_FDCWD
+    else:
+        return False
+    try:
+        call = getattr(ctypes.CDLL(None, use_errno=True), name)  # glibc >= 2.28
+    except (OSError, AttributeError):
+        return False
+    call.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    call.restype = ctypes.c_int
+
+    def rename(src: str, dst: str, dir_fd: Optional[int]) -> None:
+        fd = cwd_fd if dir_fd is None else dir_fd
+        if call(fd, os.fsencode(src), fd, os.fsencode(dst), flag) != 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), src, None, dst)
+
+    return rename
+
+
+def _rename_noreplace(src: str, dst: str, dir_fd: Optional[int] = None) -> None:
+    """
+    os.rename that raises FileExistsError instead of replacing dst (POSIX
+    rename replaces silently; Windows already refuses).
+    """
+    global _native_noreplace, _native_renames
+    if os.name == "nt":
+        os.rename(src, dst)
         return
-    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(log_file_path, "a", encoding="utf-8") as f:
-        f.write(f"[{ts}] {message}\n")
+    if _native_noreplace is None:
+        _native_noreplace = _load_native_noreplace()
+    if _native_noreplace:
+        try:
+            _native_noreplace(src, dst, dir_fd)
+            with _native_renames_lock:
+                _native_renames += 1
+            return
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.ENOTSUP):
+                raise
+            # This filesystem does not support the flag: check, then rename
+    try:
+        os.lstat(dst, dir_fd=dir_fd)
+    except FileNotFoundError:
+        pass
+    else:
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), dst)
+    os.rename(src, dst, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+
+
+class _DiskNamespace:
+    """
+    File names in one folder, checked and renamed by joined path.
+    """
+
+    dry_run = False
+
+    def __init__(self, folder_path: str) -> None:
+        self.folder_path = folder_path
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self.folder_path, name))
+
+    def rename(self, src: str, dst: str) -> None:
+        _rename_noreplace(os.path.join(self.folder_path, src), os.path.join(self.folder_path, dst))
+
+    def close(self) -> None:
+        pass
+
+
+def dir_fd_supported() -> bool:
+    """
+    True when this platform can stat/rename relative to a directory fd.
+    """
+    return os.rename in os.supports_dir_fd and os.stat in os.supports_dir_fd and hasattr(os, "O_DIRECTORY")
+
+
+class _DirFdNamespace(_DiskNamespace):
+    """
+    File names in one folder, addressed relative to a directory fd opened
+    once: the kernel does not re-walk folder_path for every call, and renames
+    keep targeting the same directory even if it is moved mid-run.
+    """
+
+    def __init__(self, folder_path: str) -> None:
+        super().__init__(folder_path)
+        self.fd: Optional[int] = os.open(folder_path, os.O_RDONLY | os.O_DIRECTORY)
+
+    def exists(self, name: str) -> bool:
+        try:
+            os.stat(name, dir_fd=self.fd)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def rename(self, src: str, dst: str) -> None:
+        _rename_noreplace(src, dst, self.fd)
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class _DryRunNamespace:
+    """
+    Simulates renames on top of a real namespace, so dry runs see the same
+    collisions (and reordering) as a real run.
+    """
+
+    dry_run = True
+
+    def __init__(self, inner: _DiskNamespace) -> None:
+        self.inner = inner
+        self.folder_path = inner.folder_path
+        self._added: set[str] = set()
+        self._removed: set[str] = set()
+
+    def exists(self, name: str) -> bool:
+        if name in self._added:
+            return True
+        if name in self._removed:
+            return False
+        return self.inner.exists(name)
+
+    def rename(self, src: str, dst: str) -> None:
+        self._added.discard(src)
+        self._removed.add(src)
+        self._removed.discard(dst)
+        self._added.add(dst)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class _IndexedNamespace:
+    """
+    Answers exists() from an in-memory set of the folder's names (seeded from
+    a scan snapshot and updated on every rename) instead of a stat per call.
+    The rename stays authoritative: it never replaces a target (see
+    _rename_noreplace), so a vanished source or a target created since the
+    scan surfaces as FileNotFoundError / FileExistsError and the index is
+    corrected.
+    """
+
+    def __init__(self, inner: _DiskNamespace, names: Iterable[str]) -> None:
+        self.inner = inner
+        self.folder_path = inner.folder_path
+        self.dry_run = inner.dry_run
+        names = set(names)
+        self._fold = _is_case_insensitive(inner, names)
+        self._names = {n.casefold() for n in names} if self._fold else names
+
+    def _key(self, name: str) -> str:
+        return name.casefold() if self._fold else name
+
+    def exists(self, name: str) -> bool:
+        return self._key(name) in self._names
+
+    def rename(self, src: str, dst: str) -> None:
+        try:
+            self.inner.rename(src, dst)
+        except FileNotFoundError:
+            self._names.discard(self._key(src))
+            raise
+        except FileExistsError:
+            self._names.add(self._key(dst))
+            raise
+        self._names.discard(self._key(src))
+        self._names.add(self._key(dst))
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class _CountingNamespace:
+    """
+    Counts the stat ("stat") and rename ("rename") calls reaching the
+    filesystem; only used when the caller asked for detailed metrics.
+    """
+
+    def __init__(self, inner: _DiskNamespace, metrics: Metrics) -> None:
+        self.inner = inner
+        self.folder_path = inner.folder_path
+        self.dry_run = inner.dry_run
+        self.metrics = metrics
+
+    def exists(self, name: str) -> bool:
+        self.metrics.count("stat")
+        return self.inner.exists(name)
+
+    def rename(self, src: str, dst: str) -> None:
+        self.metrics.count("rename")
+        self.inner.rename(src, dst)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class _TimedLogger:
+    """
+    SessionLogger wrapper adding the time spent logging to metrics ("log").
+    """
+
+    def __init__(self, inner: SessionLogger, metrics: Metrics) -> None:
+        self.inner = inner
+        self.metrics = metrics
+
+    def log(self, message: str) -> None:
+        start = time.perf_counter()
+        self.inner.log(message)
+        self.metrics.add_time("log", time.perf_counter() - start)
+
+    def flush(self) -> None:
+        with self.metrics.phase("log"):
+            self.inner.flush()
+
+    def close(self) -> None:
+        with self.metrics.phase("log"):
+            self.inner.close()
+
+
+def _is_case_insensitive(ns: _DiskNamespace, names: set[str]) -> bool:
+    """
+    Probes one name with swapped case (a single stat).
+    """
+    for name in names:
+        swapped = name.swapcase()
+        if swapped != name and swapped not in names:
+            return ns.exists(swapped)
+    return False
+
+
+def _open_namespace(
+    folder_path: str,
+    *,
+    dry_run: bool,
+    use_dir_fd: Optional[bool],
+    existing_names: Optional[Iterable[str]] = None,
+    metrics: Optional[Metrics] = None,
+):
+    if use_dir_fd is None:
+        use_dir_fd = dir_fd_supported()
+    ns = _DiskNamespace(folder_path)
+    if use_dir_fd:
+        try:
+            ns = _DirFdNamespace(folder_path)
+        except OSError:
+            pass  # e.g. missing folder: per-file errors are reported as before
+    if metrics is not None:
+        ns = _CountingNamespace(ns, metrics)
+    if existing_names is not None:
+        ns = _IndexedNamespace(ns, existing_names)
+    return _DryRunNamespace(ns) if dry_run else ns
+
+
+def _rename_one(ns: _DiskNamespace, src: str, dst: str) -> _Outcome:
+    """
+    Attempts one rename. Never raises; safe to call from worker threads.
+    """
+    try:
+        if not ns.exists(src):
+            return _Outcome("missing")
+        if ns.exists(dst):
+            return _Outcome("skipped")
+        ns.rename(src, dst)
+        return _Outcome("dry_run" if ns.dry_run else "renamed")
+    except FileNotFoundError:
+        return _Outcome("missing")
+    except FileExistsError:
+        return _Outcome("skipped")
+    except Exception as e:
+        return _Outcome("error", str(e))
+
+
+class _StepRunner:
+    """
+    Executes scheduled RenameSteps and tracks per-operation outcomes.
+
+    Steps touching the same names must run in schedule order on one thread;
+    steps of different independent groups may run concurrently.
+    """
+
+    def __init__(
+        self,
+        ns: _DiskNamespace,
+        operations,
+        steps: list[RenameStep],
+        on_moved: Optional[Callable[[str, str], None]] = None,
+    ) -> None:
+        self.ns = ns
+        self.operations = operations
+        self.steps = steps
+        self.step_outcomes: list[Optional[_Outcome]] = [None] * len(steps)
+        self.op_outcomes: list[Optional[_Outcome]] = [None] * len(operations)
+        self.restored: set[int] = set()  # unstage steps whose file went back to its old name
+        self.staged = 0                  # operations parked at a temporary name
+        self.on_moved = on_moved         # (new_name, old_name) right after each rename, e.g. to stream mappings
+        self._lock = threading.Lock()    # guards staged and on_moved when workers share the runner
+
+    def can_stop(self, cancel: Optional[threading.Event]) -> bool:
+        """
+        True when cancel is set and no file sits at a temporary name, so
+        stopping leaves every operation either done or untouched.
+        """
+        return cancel is not None and not self.staged and cancel.is_set()
+
+    def _rename(self, s: int, src: str, dst: str) -> _Outcome:
+        outcome = _rename_one(self.ns, src, dst)
+        if s >= 0:
+            self.step_outcomes[s] = outcome
+        if self.on_moved is not None and outcome.status == "renamed":
+            with self._lock:
+                self.on_moved(dst, src)
+        return outcome
+
+    def run(self, s: int) -> Optional[int]:
+        """
+        Runs step s; returns the op index when that operation is complete.
+        """
+        step = self.steps[s]
+        if step.kind == "direct":
+            outcome = self._rename(s, step.src, step.dst)
+            self.op_outcomes[step.op_index] = outcome
+            return step.op_index
+
+        if step.kind == "stage":
+            outcome = self._rename(s, step.src, step.dst)
+            if outcome.status in _DONE:
+                with self._lock:
+                    self.staged += 1
+                return None
+            if outcome.status == "skipped":
+                outcome = _Outcome("error", f"temporary name {step.dst} already exists")
+            self.op_outcomes[step.op_index] = outcome
+            return step.op_index
+
+        # unstage: only if the stage step succeeded
+        if self.op_outcomes[step.op_index] is not None:
+            return None
+        with self._lock:
+            self.staged -= 1
+        outcome = self._rename(s, step.src, step.dst)
+        if outcome.status not in _DONE:
+            old_name = self.operations[step.op_index].old_name
+            back = self._rename(-1, step.src, old_name)
+            if back.status in _DONE:
+                self.restored.add(s)
+            else:
+                outcome = _Outcome("error", f"file left at temporary name {step.src}")
+        self.op_outcomes[step.op_index] = outcome
+        return step.op_index
+
+    def merge_into(self, result: ApplyResult, folder_path: str) -> None:
+        """
+        Records mappings in schedule order (unless on_moved streamed them)
+        and outcomes in plan order.
+        """
+        for s, step in enumerate(self.steps if self.on_moved is None else ()):
+            outcome = self.step_outcomes[s]
+            if outcome is not None and outcome.status == "renamed":
+                row = step.op_index if step.kind == "direct" else None
+                result._add_mapping(folder_path, step.dst, step.src, row)
+            if s in self.restored:
+                old_name = self.operations[step.op_index].old_name
+                result._add_mapping(folder_path, old_name, step.src)
+
+        for index, (op, outcome) in enumerate(zip(self.operations, self.op_outcomes)):
+            if outcome is not None:  # None: not reached before a cancel
+                _record_outcome(result, index, op, outcome)
+
+
+def _record_outcome(result: ApplyResult, index: int, op: RenameOperation, outcome: _Outcome) -> None:
+    status = outcome.status
+    if status in _DONE:
+        result._add_renamed(index, op)
+    elif status == "skipped":
+        result.skipped.append(op.new_name)
+    elif status == "missing":
+        result.errors.append(f"Missing source file: {op.old_name}")
+    else:
+        result.errors.append(f"Error renaming {op.old_name} -> {op.new_name}: {outcome.detail}")
+
+
+def _log_outcome(logger: Optional[SessionLogger], op: RenameOperation, outcome: _Outcome) -> None:
+    status = outcome.status
+    if status == "renamed":
+        _log_line(logger, f"Renamed: {op.old_name} -> {op.new_name}")
+    elif status == "dry_run":
+        _log_line(logger, f"Dry-run: {op.old_name} -> {op.new_name}")
+    elif status == "skipped":
+        _log_line(logger, f"Skipped (already exists): {op.new_name}")
+    elif status == "missing":
+        _log_line(logger, f"Error: Missing source file: {op.old_name}")
+    else:
+        _log_line(logger, f"Error renaming {op.old_name} -> {op.new_name}: {outcome.detail}")
+
+
+def _report_progress(on_progress: Optional[ProgressCallback], current: int, total: int, op: RenameOperation) -> None:
+    if on_progress:
+        try:
+            on_progress(current, total, op)
+        except Exception:
+            pass
+
+
+def _independent_groups(steps: list[RenameStep]) -> list[list[int]]:
+    """
+    Partitions step indices into groups that share no file name.
+
+    Two steps land in the same group when any of their src/dst names match
+    (a chain like a->b, b->c, or two steps targeting the same name), so
+    running groups concurrently, each in schedule order, gives the same
+    result as the serial loop.
+    """
+    parent: dict[str, str] = {}
+
+    def find(name: str) -> str:
+        root = parent.setdefault(name, name)
+        while root != parent[root]:
+            root = parent[root]
+        while parent[name] != root:  # path compression
+            parent[name], name = root, parent[name]
+        return root
+
+    for step in steps:
+        a, b = find(step.src), find(step.dst)
+        if a != b:
+            parent[b] = a
+
+    groups: dict[str, list[int]] = {}
+    for index, step in enumerate(steps):
+        groups.setdefault(find(step.src), []).append(index)
+    return list(groups.values())
+
+
+def _run_parallel(
+    runner: _StepRunner,
+    logger: Optional[SessionLogger],
+    result: ApplyResult,
+    *,
+    on_progress: Optional[ProgressCallback],
+    total: int,
+    workers: int,
+    cancel: Optional[threading.Event] = None,
+) -> None:
+    import queue
+    from concurrent.futures import ThreadPoolExecutor  # only needed with workers > 1
+
+    operations = runner.operations
+    finished: queue.Queue[Optional[int]] = queue.Queue()   # op indices; None ends a task
+
+    def run_groups(groups: list[list[int]]) -> None:
+        try:
+            for indices in groups:
+                # A group runs whole (its cycles never stay staged); cancel between groups
+                if cancel is not None and cancel.is_set():
+                    return
+                for s in indices:
+                    op_index = runner.run(s)
+                    if op_index is not None:
+                        finished.put(op_index)
+        finally:
+            finished.put(None)
+
+    # Pack small groups into tasks so a million singleton groups are not a million futures
+    task_size = max(1, min(256, len(runner.steps) // (workers * 4)))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="relabeler-rename") as pool:
+        tasks = 0
+        task: list[list[int]] = []
+        task_steps = 0
+        for indices in _independent_groups(runner.steps):
+            task.append(indices)
+            task_steps += len(indices)
+            if task_steps >= task_size:
+                pool.submit(run_groups, task)
+                tasks += 1
+                task, task_steps = [], 0
+        if task:
+            pool.submit(run_groups, task)
+            tasks += 1
+
+        # Logging and progress stay on the calling thread, in completion order
+        current = 0
+        while tasks:
+            op_index = finished.get()
+            if op_index is None:
+                tasks -= 1
+                continue
+            current += 1
+            result.attempted = current
+            op = operations[op_index]
+            _log_outcome(logger, op, runner.op_outcomes[op_index])
+            _report_progress(on_progress, current, total, op)
+    result.cancelled = cancel is not None and cancel.is_set() and current < len(operations)
+
+
+def _run_scheduled(
+    ns: _DiskNamespace,
+    operations: Sequence[RenameOperation],
+    result: ApplyResult,
+    logger: Optional[SessionLogger],
+    *,
+    folder_path: str,
+    reorder: bool,
+    workers: int,
+    on_progress: Optional[ProgressCallback],
+    total: int,
+    journal: Optional[RenameJournal] = None,
+    snapshot: Optional[ScanSnapshot] = None,
+    cancel: Optional[threading.Event] = None,
+    stream_mappings: bool = False,
+) -> None:
+    with result.metrics.phase("schedule"):
+        steps = schedule_renames(operations) if reorder else direct_steps(operations)
+    staged = sum(1 for step in steps if step.kind == "stage")
+    if staged:
+        _log_line(logger, f"Cycles staged through temporary names: {staged}")
+    if journal is not None:
+        with result.metrics.phase("journal"):
+            journal.begin(steps, _step_inodes(folder_path, steps, snapshot))
+
+    on_moved = None
+    if stream_mappings:
+        # Each rename reaches the mappings file as it happens, so a crash keeps it
+        on_moved = lambda new_name, old_name: result._add_mapping(folder_path, new_name, old_name)  # noqa: E731
+    runner = _StepRunner(ns, operations, steps, on_moved)
+    with result.metrics.phase("rename"):
+        if workers > 1:
+            _log_line(logger, f"Workers: {workers}")
+            _run_parallel(
+                runner, logger, result, on_progress=on_progress, total=total, workers=workers, cancel=cancel
+            )
+        else:
+            _run_serial(
+                runner,
+                range(len(steps)),
+                logger,
+                result,
+                on_progress=on_progress,
+                total=total,
+                journal=journal,
+                cancel=cancel,
+            )
+    with result.metrics.phase("results"):
+        runner.merge_into(result, folder_path)
+    if result.cancelled:
+        _log_line(logger, "Cancelled")
+    elif journal is not None:
+        journal.finish()  # a cancelled run stays resumable
+
+
+def _run_serial(
+    runner: _StepRunner,
+    step_indices: Iterable[int],
+    logger: Optional[SessionLogger],
+    result: ApplyResult,
+    *,
+    on_progress: Optional[ProgressCallback],
+    total: int,
+    journal: Optional[RenameJournal] = None,
+    cancel: Optional[threading.Event] = None,
+) -> None:
+    operations = runner.operations
+    current = result.attempted
+    for s in step_indices:
+        if runner.can_stop(cancel):
+            result.cancelled = True
+            return
+        op_index = runner.run(s)
+        if journal is not None:
+            _journal_step(journal, runner, s)
+        if op_index is None:
+            continue
+        current += 1
+        result.attempted = current
+        op = operations[op_index]
+        _log_outcome(logger, op, runner.op_outcomes[op_index])
+        _report_progress(on_progress, current, total, op)
+
+
+def _journal_step(journal: RenameJournal, runner: _StepRunner, s: int) -> None:
+    outcome = runner.step_outcomes[s]
+    journal.step(s, outcome is not None and outcome.status == "renamed")
+    if s in runner.restored:
+        step = runner.steps[s]
+        journal.moved(step.src, runner.operations[step.op_index].old_name)
+
+
+def _log_summary(logger: Optional[SessionLogger], result: ApplyResult) -> None:
+    for name, n in (
+        ("renamed", len(result.renamed)),
+        ("skipped", len(result.skipped)),
+        ("errors", len(result.errors)),
+    ):
+        result.metrics.count(name, n)
+    _log_line(logger, "=== Rename session finished ===")
+    _log_line(logger, f"Processed: {result.attempted}")
+    _log_line(logger, f"Renamed: {len(result.renamed)}")
+    _log_line(logger, f"Skipped: {len(result.skipped)}")
+    _log_line(logger, f"Errors: {len(result.errors)}")
 
 
 def apply_rename_plan(
     folder_path: str,
-    operations: list[RenameOperation],
+    operations: Iterable[RenameOperation],
     log_file_path: Optional[str] = None,
     *,
     dry_run: bool = False,
     on_progress: Optional[ProgressCallback] = None,
+    total: Optional[int] = None,
+    compact: bool = False,
+    workers: int = 1,
+    logger: Optional[SessionLogger] = None,
+    reorder: bool = True,
+    use_dir_fd: Optional[bool] = None,
+    name_index: bool = True,
+    snapshot: Optional[ScanSnapshot] = None,
+    metrics: Optional[Metrics] = None,
+    mappings_writer=None,
+    journal: Optional[RenameJournal] = None,
+    cancel: Optional[threading.Event] = None,
+    progress: Optional[Progress] = None,
 ) -> ApplyResult:
     """
     Applies a rename plan to the filesystem.
 
-    - Skips any operation where the target already exists.
-    - Returns mappings suitable for undo: (new_path, old_path).
-    - Does NOT raise on per-file errors (collects them instead).
-    - dry_run=True performs all checks and logging but does not rename.
-    - on_progress is called after each operation attempt: (current, total, operation).
+    - Skips operations whose target exists; per-file errors are collected,
+      not raised. Returns mappings for undo: (new_path, old_path), in
+      rename order.
+    - dry_run=True checks and logs but does not rename (renames are simulated).
+    - on_progress(current, total, operation) runs after each attempt;
+      progress (a Progress) counts the same in batches. total defaults
+      to len(operations), or 0 for a lazy plan.
+    - reorder=True runs chains and cycles so they complete (see
+      scheduler.schedule_renames); reorder=False keeps plan order and
+      streams a lazy plan.
+    - compact=True returns ApplyResult.compact (rows as plan indices when
+      operations is a RenamePlan).
+    - workers > 1 renames independent operations on a thread pool;
+      logging and progress stay on the calling thread.
+    - logger (a SessionLogger, flushed not closed) or log_file_path
+      (opened for the call) receive the session log.
+    - use_dir_fd renames relative to one directory fd (default: where
+      supported); name_index=True checks names against one listing
+      (snapshot, if given) instead of two stats per operation.
+    - metrics (a Metrics) receives phase times and counters; result.metrics
+      always has the phase times.
+    - mappings_writer (a MappingsWriter for folder_path, closed by the
+      caller) replaces result.mappings and gets each rename as it happens.
+    - journal (a RenameJournal) records every step for resume/rollback;
+      needs workers=1.
+    - cancel (a threading.Event) stops between operations, never while a
+      file sits at a temporary name; result.cancelled is then True.
+    """
+    if journal is not None and workers > 1:
+        raise ValueError("A rename journal needs workers=1")
+    if compact:
+        plan = operations if isinstance(operations, RenamePlan) else None
+        result = ApplyResult.compact(folder_path, plan)
+    else:
+        result = ApplyResult()
+    if metrics is not None:
+        result.metrics = metrics
+    if mappings_writer is not None:
+        result.mappings = mappings_writer
+
+    streamed = not reorder and workers <= 1 and journal is None
+    if not streamed and not isinstance(operations, (Sequence, RenamePlan)):
+        operations = list(operations)
+    if total is None:
+        total = len(operations) if isinstance(operations, Sized) else 0
+    if progress is not None:
+        progress.expect(total)
+        on_progress = _feed_progress(progress, on_progress)
+
+    existing_names: Optional[Iterable[str]] = None
+    with result.metrics.phase("index"):
+        if snapshot is None and name_index:
+            try:
+                snapshot = scan_directory(folder_path, with_stat=False, metrics=metrics)
+            except OSError:
+                pass  # e.g. missing folder: per-file errors as before
+        if snapshot is not None:
+            existing_names = snapshot.names()
+
+    ns = _open_namespace(
+        folder_path,
+        dry_run=dry_run,
+        use_dir_fd=use_dir_fd,
+        existing_names=existing_names,
+        metrics=metrics,
+    )
+
+    owns_logger = logger is None and bool(log_file_path)
+    if owns_logger:
+        logger = SessionLogger(log_file_path)
+    if metrics is not None and logger is not None:
+        logger = _TimedLogger(logger, metrics)
+
+    try:
+        _log_line(logger, "=== Rename session started ===")
+        _log_line(logger, f"Folder: {folder_path}")
+        _log_line(logger, f"Operations: {total or 'streamed'}")
+        _log_line(logger, f"Dry run: {dry_run}")
+
+        if streamed:
+            with result.metrics.phase("rename"):
+                for idx, op in enumerate(operations, start=1):
+                    if cancel is not None and cancel.is_set():
+                        result.cancelled = True
+                        break
+                    result.attempted = idx
+                    outcome = _rename_one(ns, op.old_name, op.new_name)
+                    if outcome.status == "renamed":
+                        result._add_mapping(folder_path, op.new_name, op.old_name, idx - 1)
+                    _record_outcome(result, idx - 1, op, outcome)
+                    _log_outcome(logger, op, outcome)
+                    _report_progress(on_progress, idx, total, op)
+        else:
+            _run_scheduled(
+                ns,
+                operations,
+                result,
+                logger,
+                folder_path=folder_path,
+                reorder=reorder,
+                workers=workers,
+                on_progress=on_progress,
+                total=total,
+                journal=journal,
+                snapshot=snapshot,
+                cancel=cancel,
+                stream_mappings=mappings_writer is not None,
+            )
+
+        _log_summary(logger, result)
+    finally:
+        ns.close()
+        if progress is not None:
+            progress.flush()
+        # Also runs when an exception escapes, so buffered lines are not lost
+        if owns_logger:
+            logger.close()
+        elif logger is not None:
+            logger.flush()
+
+    return result
+
+
+def apply_rename_tree(
+    root: str,
+    plans: Iterable[DirectoryPlan],
+    *,
+    dry_run: bool = False,
+    workers: int = 1,
+    logger: Optional[SessionLogger] = None,
+    reorder: bool = True,
+    use_dir_fd: Optional[bool] = None,
+    metrics: Optional[Metrics] = None,
+    mappings_writer=None,
+    on_directory: Optional[Callable[[str, ApplyResult], None]] = None,
+    cancel: Optional[threading.Event] = None,
+    progress: Optional[Progress] = None,
+) -> ApplyResult:
+    """
+    Applies per-directory plans (engine.iter_tree_plans) as they arrive,
+    each with apply_rename_plan seeded from the listing it was planned
+    from (no directory is listed twice).
+
+    - result.renamed and result.skipped hold paths relative to root
+      ("2023/a.jpg"); errors from subdirectories start with the
+      subdirectory ("2023: Missing source file: a.jpg").
+    - result.mappings are full paths, or go to mappings_writer (a
+      mappings_io.MappingsWriter for root) as each directory is applied.
+    - result.metrics adds up every directory (recorded into metrics when
+      given).
+    - on_directory(folder_path, directory_result) runs after each directory.
+    - cancel stops the walk between directories as well as inside one (see
+      apply_rename_plan).
+    - progress counts the files of every directory; total grows as
+      directories are listed.
+    """
+    result = ApplyResult(renamed=PairColumn(), mappings=FolderPairColumn(root))
+    if metrics is not None:
+        result.metrics = metrics
+    if mappings_writer is not None:
+        result.mappings = mappings_writer
+
+    for plan, snapshot in plans:
+        if cancel is not None and cancel.is_set():
+            result.cancelled = True
+            break
+        folder_path = plan.folder_path
+        part = apply_rename_plan(
+            folder_path,
+            plan,
+            dry_run=dry_run,
+            compact=True,
+            workers=workers,
+            logger=logger,
+            reorder=reorder,
+            use_dir_fd=use_dir_fd,
+            snapshot=snapshot,
+            metrics=metrics,
+            mappings_writer=mappings_writer,
+            cancel=cancel,
+            progress=progress,
+        )
+        if metrics is None:
+            result.metrics.merge(part.metrics)
+        result.cancelled = part.cancelled
+
+        relative = os.path.relpath(folder_path, root)
+        if relative == os.curdir:
+            relative = ""
+        result.attempted += part.attempted
+        for old_name, new_name in part.renamed:
+            result.renamed.append((os.path.join(relative, old_name), os.path.join(relative, new_name)))
+        result.skipped.extend(os.path.join(relative, name) for name in part.skipped)
+        result.errors.extend(f"{relative}: {error}" if relative else error for error in part.errors)
+        if mappings_writer is None:
+            for pair in part.mappings:
+                result.mappings.append(pair)
+        if on_directory is not None:
+            on_directory(folder_path, part)
+    return result
+
+
+class _MemoryNamespace:
+    """
+    A set of names standing in for a folder (e.g. an archive's members).
+    """
+
+    dry_run = False
+    folder_path = ""
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self.names = set(names)
+
+    def exists(self, name: str) -> bool:
+        return name in self.names
+
+    def rename(self, src: str, dst: str) -> None:
+        self.names.discard(src)
+        self.names.add(dst)
+
+    def close(self) -> None:
+        pass
+
+
+def apply_rename_plan_to_names(
+    names: Iterable[str],
+    operations: Sequence[RenameOperation],
+    *,
+    source: str = "",
+    logger: Optional[SessionLogger] = None,
+    dry_run: bool = False,
+    on_progress: Optional[ProgressCallback] = None,
+    metrics: Optional[Metrics] = None,
+) -> ApplyResult:
+    """
+    Runs a rename plan against an in-memory set of names instead of a folder,
+    with the same scheduling, collision and logging rules as
+    apply_rename_plan (reorder=True).
+
+    - names are all names taken in the namespace (not only the plan's);
+    - result.renamed gives each applied operation's (old_name, new_name);
+      mappings are (new_name, old_name) pairs without a folder prefix;
+    - source is only used in the log header (e.g. an archive path);
+    - metrics is recorded into (and returned as result.metrics), with the
+      time spent logging as "log".
     """
     result = ApplyResult()
-    total = len(operations)
+    if metrics is not None:
+        result.metrics = metrics
+        if logger is not None:
+            logger = _TimedLogger(logger, metrics)
+    ns = _MemoryNamespace(names)
+    if dry_run:
+        ns = _DryRunNamespace(ns)
 
-    _log_line(log_file_path, "=== Rename session started ===")
-    _log_line(log_file_path, f"Folder: {folder_path}")
-    _log_line(log_file_path, f"Operations: {total}")
-    _log_line(log_file_path, f"Dry run: {dry_run}")
+    _log_line(logger, "=== Rename session started ===")
+    _log_line(logger, f"Folder: {source}")
+    _log_line(logger, f"Operations: {len(operations)}")
+    _log_line(logger, f"Dry run: {dry_run}")
+    _run_scheduled(
+        ns,
+        operations,
+        result,
+        logger,
+        folder_path="",
+        reorder=True,
+        workers=1,
+        on_progress=on_progress,
+        total=len(operations),
+    )
+    _log_summary(logger, result)
+    if logger is not None:
+        logger.flush()
+    return result
 
-    for idx, op in enumerate(operations, start=1):
-        old_path = os.path.join(folder_path, op.old_name)
-        new_path = os.path.join(folder_path, op.new_name)
 
-        try:
-            if not os.path.exists(old_path):
-                msg = f"Missing source file: {op.old_name}"
-                result.errors.append(msg)
-                _log_line(log_file_path, f"Error: {msg}")
+class UndoItem(NamedTuple):
+    new_path: str      # where the renamed file is now
+    old_path: str      # the name it was to get back
+    status: str        # "missing" | "skipped" (old_path is taken) | "error" | "cancelled"
+    detail: str = ""   # exception text for "error"
+
+
+@dataclass
+class UndoResult:
+    restored: int = 0                                         # files moved back to their original names
+    failed: list[UndoItem] = field(default_factory=list)      # reversals that did not happen
+    attempted: int = 0                                        # reversals processed
+    metrics: Metrics = field(default_factory=Metrics)         # phase timings and counters
+    cancelled: bool = False                                   # stopped early (see undo_renames' cancel)
+
+    @property
+    def remaining(self) -> list[tuple[str, str]]:
+        """
+        The reversals cancel left undone, as mappings undo_renames can
+        finish later: the renames that led from the original names to the
+        current ones, in an order that replays correctly (cycles through
+        one temporary name, as schedule_renames would run them).
+        """
+        mappings: list[tuple[str, str]] = []
+        by_folder: dict[str, list[RenameOperation]] = {}
+        for item in self.failed:
+            if item.status != "cancelled":
                 continue
+            folder_path, new_name = os.path.split(item.new_path)
+            original_dir, old_name = os.path.split(item.old_path)
+            if original_dir == folder_path:
+                by_folder.setdefault(folder_path, []).append(RenameOperation(old_name, new_name))
+            else:
+                mappings.append((item.new_path, item.old_path))
+        for folder_path, operations in by_folder.items():
+            mappings.extend(
+                (os.path.join(folder_path, step.dst), os.path.join(folder_path, step.src))
+                for step in schedule_renames(operations)
+            )
+        return mappings
 
-            if os.path.exists(new_path):
-                result.skipped.append(op.new_name)
-                _log_line(log_file_path, f"Skipped (already exists): {op.new_name}")
+    @property
+    def errors(self) -> list[str]:
+        """
+        failed as the error strings undo_rename_mappings returns (cancelled
+        reversals are not errors).
+        """
+        messages = []
+        for item in self.failed:
+            if item.status == "cancelled":
                 continue
+            name = os.path.basename(item.new_path)
+            if item.status == "missing":
+                messages.append(f"Missing during undo: {name}")
+            elif item.status == "skipped":
+                messages.append(f"Cannot restore {name}: {os.path.basename(item.old_path)} already exists")
+            else:
+                messages.append(f"Error undoing {name}: {item.detail}")
+        return messages
 
-            if dry_run:
-                result.renamed.append((op.old_name, op.new_name))
-                _log_line(log_file_path, f"Dry-run: {op.old_name} -> {op.new_name}")
+
+def _net_reversals(mappings: Iterable[tuple[str, str]]) -> dict[str, str]:
+    """
+    {current path: original path} for every file the mappings moved.
+
+    Replays the renames forward on paths only, so a file renamed several
+    times (e.g. through a temporary name) is restored with one rename and
+    files that ended where they started are left alone.
+    """
+    origins: dict[str, str] = {}
+    for new_path, old_path in mappings:
+        origins[new_path] = origins.pop(old_path, old_path)
+    return {current: original for current, original in origins.items() if current != original}
+
+
+def _undo_folder(
+    folder_path: str,
+    operations: list[RenameOperation],
+    result: UndoResult,
+    *,
+    workers: int,
+    use_dir_fd: Optional[bool],
+    on_progress: Optional[Callable[[int, int, str], None]],
+    total: int,
+    cancel: Optional[threading.Event],
+) -> None:
+    """
+    Runs one folder's reversals (current name -> original name) like an
+    apply: scheduled, so chains and cycles complete, from a name index.
+    """
+    metrics = result.metrics
+    with metrics.phase("index"):
+        try:
+            existing_names: Optional[Iterable[str]] = scan_directory(folder_path, with_stat=False).names()
+        except OSError:
+            existing_names = None
+    ns = _open_namespace(folder_path, dry_run=False, use_dir_fd=use_dir_fd, existing_names=existing_names)
+
+    progress: Optional[ProgressCallback] = None
+    if on_progress is not None:
+        offset = result.attempted
+        progress = lambda current, _total, op: on_progress(offset + current, total, op.old_name)  # noqa: E731
+
+    batch = ApplyResult(metrics=metrics)
+    try:
+        with metrics.phase("schedule"):
+            steps = schedule_renames(operations)
+        runner = _StepRunner(ns, operations, steps)
+        with metrics.phase("rename"):
+            if workers > 1:
+                _run_parallel(
+                    runner, None, batch, on_progress=progress, total=total, workers=workers, cancel=cancel
+                )
             else:
-                os.rename(old_path, new_path)
-                result.renamed.append((op.old_name, op.new_name))
-                result.mappings.append((new_path, old_path))
-                _log_line(log_file_path, f"Renamed: {op.old_name} -> {op.new_name}")
+                _run_serial(
+                    runner, range(len(steps)), None, batch, on_progress=progress, total=total, cancel=cancel
+                )
+    finally:
+        ns.close()
 
-        except Exception as e:
-            msg = f"Error renaming {op.old_name} -> {op.new_name}: {e}"
-            result.errors.append(msg)
-            _log_line(log_file_path, msg)
+    result.attempted += batch.attempted
+    result.cancelled = result.cancelled or batch.cancelled
+    not_run = ("cancelled", "") if batch.cancelled else ("error", "not attempted")
+    for op, outcome in zip(operations, runner.op_outcomes):
+        if outcome is not None and outcome.status == "renamed":
+            result.restored += 1
+        else:
+            status, detail = outcome if outcome is not None else not_run
+            result.failed.append(
+                UndoItem(os.path.join(folder_path, op.old_name), os.path.join(folder_path, op.new_name), status, detail)
+            )
 
-        finally:
+
+def undo_renames(
+    mappings: Iterable[tuple[str, str]],
+    *,
+    workers: int = 1,
+    on_progress: Optional[Callable[[int, int, str], None]] = None,
+    use_dir_fd: Optional[bool] = None,
+    cancel: Optional[threading.Event] = None,
+    progress: Optional[Progress] = None,
+) -> UndoResult:
+    """
+    Undo a previous rename using mappings: (new_path, old_path), in the
+    order the renames happened.
+
+    - The mappings are read once, front to back (a mappings_io.MappingsFile
+      is streamed), and reduced to one reversal per moved file.
+    - Each folder's reversals are scheduled like an apply
+      (scheduler.schedule_renames): a file whose original name is held by
+      another renamed file waits for it to move, and cycles go through
+      one temporary name each. Existence checks use one scandir per
+      folder.
+    - workers > 1 runs independent reversals on a thread pool.
+    - A file is never moved onto an existing name: that reversal is
+      reported as "skipped". Mappings across folders are reverted one by
+      one after the per-folder work.
+    - on_progress(current, total, name) is called after each reversal;
+      progress (a Progress) counts them and reports in batches.
+    - use_dir_fd works as in apply_rename_plan (one fd per folder).
+    - cancel (a threading.Event) stops between reversals, as in
+      apply_rename_plan; the ones left are reported as "cancelled" (see
+      UndoResult.remaining) and result.cancelled is True.
+    """
+    result = UndoResult()
+    metrics = result.metrics
+    with metrics.phase("mappings"):
+        reversals = _net_reversals(mappings)
+        by_folder: dict[str, list[RenameOperation]] = {}
+        moved: list[tuple[str, str]] = []
+        for current, original in reversals.items():
+            current_dir, current_name = os.path.split(current)
+            original_dir, original_name = os.path.split(original)
+            if current_dir == original_dir:
+                by_folder.setdefault(current_dir, []).append(RenameOperation(current_name, original_name))
+            else:
+                moved.append((current, original))
+    total = len(reversals)
+    if progress is not None:
+        progress.expect(total)
+        on_progress = _feed_progress(progress, on_progress)
+
+    for folder_path, operations in by_folder.items():
+        if cancel is not None and cancel.is_set():
+            result.cancelled = True
+        if result.cancelled:
+            result.failed.extend(
+                UndoItem(os.path.join(folder_path, op.old_name), os.path.join(folder_path, op.new_name), "cancelled")
+                for op in operations
+            )
+            continue
+        _undo_folder(
+            folder_path,
+            operations,
+            result,
+            workers=workers,
+            use_dir_fd=use_dir_fd,
+            on_progress=on_progress,
+            total=total,
+            cancel=cancel,
+        )
+
+    with metrics.phase("rename"):
+        for current, original in moved:
+            if result.cancelled or (cancel is not None and cancel.is_set()):
+                result.cancelled = True
+                result.failed.append(UndoItem(current, original, "cancelled"))
+                continue
+            try:
+                if not os.path.exists(current):
+                    result.failed.append(UndoItem(current, original, "missing"))
+                elif os.path.exists(original):
+                    result.failed.append(UndoItem(current, original, "skipped"))
+                else:
+                    _rename_noreplace(current, original)
+                    result.restored += 1
+            except FileExistsError:
+                result.failed.append(UndoItem(current, original, "skipped"))
+            except Exception as e:
+                result.failed.append(UndoItem(current, original, "error", str(e)))
+            result.attempted += 1
             if on_progress:
                 try:
-                    on_progress(idx, total, op)
+                    on_progress(result.attempted, total, os.path.basename(current))
                 except Exception:
                     pass
 
-    _log_line(log_file_path, "=== Rename session finished ===")
-    _log_line(log_file_path, f"Renamed: {len(result.renamed)}")
-    _log_line(log_file_path, f"Skipped: {len(result.skipped)}")
-    _log_line(log_file_path, f"Errors: {len(result.errors)}")
-
+    if progress is not None:
+        progress.flush()
+    metrics.count("restored", result.restored)
+    metrics.count("errors", len(result.errors))
     return result
 
 
 def undo_rename_mappings(
-    mappings: list[tuple[str, str]],
+    mappings: Iterable[tuple[str, str]],
     *,
+    workers: int = 1,
     on_progress: Optional[Callable[[int, int, str], None]] = None,
+    use_dir_fd: Optional[bool] = None,
+    progress: Optional[Progress] = None,
 ) -> list[str]:
     """
-    Undo a previous rename using mappings: (new_path, old_path).
-    Returns a list of error strings (empty if success).
+    undo_renames, returning a list of error strings (empty if success).
     """
-    errors: list[str] = []
-    total = len(mappings)
+    return undo_renames(
+        mappings, workers=workers, on_progress=on_progress, use_dir_fd=use_dir_fd, progress=progress
+    ).errors
+
+
+def _journal_operations(steps: Sequence[RenameStep]) -> list[RenameOperation]:
+    """
+    The plan operations behind journaled steps (a staged op's old name is
+    its stage source, its new name its unstage target).
+    """
+    names: dict[int, list[str]] = {}
+    for step in steps:
+        pair = names.setdefault(step.op_index, [step.src, step.dst])
+        if step.kind == "stage":
+            pair[0] = step.src
+        elif step.kind == "unstage":
+            pair[1] = step.dst
+    return [RenameOperation(old_name=old, new_name=new) for _, (old, new) in sorted(names.items())]
+
+
+def _inode(folder_path: str, name: str) -> int:
+    try:
+        return os.lstat(os.path.join(folder_path, name)).st_ino
+    except OSError:
+        return 0
+
+
+def _step_inodes(folder_path: str, steps: Sequence[RenameStep], snapshot: Optional[ScanSnapshot] = None) -> list[int]:
+    """
+    The inode of the file each step moves (an unstage step moves the file
+    its stage step parked), so a crash can be resolved from the folder.
+    Taken from snapshot's entries when given; otherwise one lstat per step.
+    """
+    listed = {e.name: e.inode for e in snapshot.entries} if snapshot is not None else None
+    staged: dict[int, int] = {}
+    inodes = []
+    for step in steps:
+        if step.kind == "unstage":
+            inode = staged.get(step.op_index, 0)
+        else:
+            inode = listed.get(step.src, 0) if listed is not None else _inode(folder_path, step.src)
+            if step.kind == "stage":
+                staged[step.op_index] = inode
+        inodes.append(inode)
+    return inodes
+
+
+def _resolve_lost_steps(folder_path: str, state: JournalState) -> tuple[list[tuple[int, bool]], list[int]]:
+    """
+    (step, renamed) for steps that ran after next_step but whose records
+    were lost (power loss before an fsync), and the steps among them whose
+    outcome cannot be told.
+
+    Only an intent's inode counts as evidence: a step is renamed when its
+    file is at the step's target (a stage step also when its file already
+    reached the final name). Steps up to the last renamed one in the
+    sync_window ran; of those, a step whose file is still at its source
+    failed, and one whose file is nowhere expected (or whose inode was
+    not journaled) is unresolved. Later steps are left unrecorded.
+    """
+    start = state.next_step
+    window = range(start, min(start + state.sync_window, len(state.steps)))
+    final: dict[int, str] = {
+        state.steps[s].op_index: state.steps[s].dst for s in window if state.steps[s].kind == "unstage"
+    }
+
+    def outcome(s: int) -> Optional[bool]:
+        inode = state.inodes[s] if s < len(state.inodes) else 0
+        if not inode:
+            return None
+        step = state.steps[s]
+        if _inode(folder_path, step.dst) == inode:
+            return True
+        if step.kind == "stage" and step.op_index in final and _inode(folder_path, final[step.op_index]) == inode:
+            return True
+        if _inode(folder_path, step.src) == inode:
+            return False
+        return None
+
+    outcomes = [outcome(s) for s in window]
+    last = next((j for j in range(len(outcomes) - 1, -1, -1) if outcomes[j]), None)
+    if last is None:
+        return [], []
+    resolved = [(start + j, bool(outcomes[j])) for j in range(last + 1)]
+    unresolved = [start + j for j in range(last + 1) if outcomes[j] is None]
+    return resolved, unresolved
+
+
+def _recover_journal(path: str, ns: _DiskNamespace, policy: Optional[FsyncPolicy]):
+    """
+    Reads the journal at path, records steps resolved from the folder's
+    state and returns (state, journal reopened for appending).
+    """
+    from journal import DEFAULT_FSYNC_POLICY, RenameJournal, read_journal
+
+    state = read_journal(path)
+    journal = RenameJournal.reopen(path, policy or DEFAULT_FSYNC_POLICY)
+    if state.began and not state.finished and not state.undone and not state.rolled_back:
+        resolved, state.unresolved = _resolve_lost_steps(ns.folder_path, state)
+        for s, renamed in resolved:
+            journal.step(s, renamed)
+            if renamed:
+                step = state.steps[s]
+                state.renames.append((step.src, step.dst))
+                state.rename_inodes.append(state.inodes[s])
+                state.renamed_steps.add(s)
+            state.next_step = s + 1
+        journal.sync()
+    return state, journal
+
+
+def _check_journal_folder(state: JournalState) -> None:
+    # A relative folder (older journals) would resolve against today's working directory
+    folder_path = state.folder_path
+    if not os.path.isabs(folder_path):
+        raise ValueError(f"The journal's folder {folder_path!r} is relative (an older journal); it cannot be located safely.")
+    if not os.path.isdir(folder_path):
+        raise ValueError(f"The journal's folder does not exist: {folder_path}")
+
+
+def _unresolved_errors(state: JournalState) -> list[str]:
+    messages = []
+    for s in state.unresolved:
+        step = state.steps[s]
+        messages.append(f"Unknown whether {step.src} was renamed to {step.dst} before the crash; left as is")
+    return messages
+
+
+def journal_mappings(state: JournalState) -> list[tuple[str, str]]:
+    """
+    Undo mappings (new_path, old_path) for every rename a journal recorded.
+    """
+    folder = state.folder_path
+    return [(os.path.join(folder, dst), os.path.join(folder, src)) for src, dst in state.renames]
+
+
+def resume_rename_journal(
+    journal_path: str,
+    *,
+    policy: Optional[FsyncPolicy] = None,
+    logger: Optional[SessionLogger] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    use_dir_fd: Optional[bool] = None,
+) -> tuple[JournalState, ApplyResult]:
+    """
+    Finishes a run interrupted while applying with a journal: the steps
+    without a record run in schedule order, each journaled as before.
+
+    Returns the journal state (state.renames then covers the whole run,
+    see journal_mappings) and the result of the resumed part. Raises
+    ValueError when the run has nothing left to resume or its folder is
+    missing.
+    """
+    from journal import read_journal
+
+    state = read_journal(journal_path)
+    if state.finished or state.undone or state.rolled_back:
+        raise ValueError("This run already finished or was rolled back.")
+    if not state.began:
+        raise ValueError("The run stopped before renaming anything; start it again.")
+    _check_journal_folder(state)
 
-    for idx, (new_path, old_path) in enumerate(reversed(mappings), start=1):
+    folder_path = state.folder_path
+    ns = _open_namespace(folder_path, dry_run=False, use_dir_fd=use_dir_fd)
+    try:
+        state, journal = _recover_journal(journal_path, ns, policy)
         try:
-            if os.path.exists(new_path):
-                os.rename(new_path, old_path)
-            else:
-                errors.append(f"Missing during undo: {os.path.basename(new_path)}")
-        except Exception as e:
-            errors.append(f"Error undoing {os.path.basename(new_path)}: {e}")
+            operations = _journal_operations(state.steps)
+            runner = _StepRunner(ns, operations, state.steps)
+            for s, step in enumerate(state.steps[:state.next_step]):
+                # A failed stage step must keep its unstage step from running
+                if step.kind == "stage" and s not in state.renamed_steps:
+                    runner.op_outcomes[step.op_index] = _Outcome("error", "staging failed before the interruption")
+
+            remaining = range(state.next_step, len(state.steps))
+            result = ApplyResult(errors=_unresolved_errors(state))
+            _log_line(logger, "=== Rename session resumed ===")
+            _log_line(logger, f"Folder: {folder_path}")
+            _log_line(logger, f"Steps left: {len(remaining)}")
+            with result.metrics.phase("rename"):
+                _run_serial(
+                    runner,
+                    remaining,
+                    logger,
+                    result,
+                    on_progress=on_progress,
+                    total=len(operations),
+                    journal=journal,
+                )
+            for s in remaining:
+                outcome = runner.step_outcomes[s]
+                step = state.steps[s]
+                if outcome is not None and outcome.status == "renamed":
+                    state.renames.append((step.src, step.dst))
+                    state.rename_inodes.append(state.inodes[s])
+                    result._add_mapping(folder_path, step.dst, step.src)
+                if s in runner.restored:
+                    old_name = operations[step.op_index].old_name
+                    state.renames.append((step.src, old_name))
+                    state.rename_inodes.append(state.inodes[s])
+                    result._add_mapping(folder_path, old_name, step.src)
+            for op_index in sorted({state.steps[s].op_index for s in remaining}):
+                outcome = runner.op_outcomes[op_index]
+                if outcome is not None:
+                    _record_outcome(result, op_index, operations[op_index], outcome)
+            journal.finish()
+            _log_summary(logger, result)
         finally:
-            if on_progress:
-                try:
-                    on_progress(idx, total, os.path.basename(new_path))
-                except Exception:
-                    pass
+            journal.close()
+    finally:
+        ns.close()
+        if logger is not None:
+            logger.flush()
+    state.finished = True
+    return state, result
+
+
+def rollback_rename_journal(
+    journal_path: str,
+    *,
+    policy: Optional[FsyncPolicy] = None,
+    on_progress: Optional[Callable[[int, int, str], None]] = None,
+    use_dir_fd: Optional[bool] = None,
+) -> list[str]:
+    """
+    Reverts every rename a journal recorded, newest first (a finished run
+    too, like undo). Each reverted rename is journaled, so an interrupted
+    rollback continues where it stopped; a file is never moved back onto
+    an existing name. Returns error strings (empty if success); raises
+    ValueError when the journal's folder is missing.
+    """
+    from journal import read_journal
+
+    state = read_journal(journal_path)
+    if state.rolled_back:
+        return []
+    _check_journal_folder(state)
 
+    errors: list[str] = []
+    ns = _open_namespace(state.folder_path, dry_run=False, use_dir_fd=use_dir_fd)
+    try:
+        state, journal = _recover_journal(journal_path, ns, policy)
+        errors.extend(_unresolved_errors(state))
+        try:
+            pending = state.renames[:len(state.renames) - state.undone]
+            total = len(pending)
+            for idx, (old_name, new_name) in enumerate(reversed(pending), start=1):
+                # The file the run moved, unless replaced since (0: not journaled)
+                inode = state.rename_inodes[total - idx]
+                try:
+                    if not ns.exists(new_name):
+                        errors.append(f"Missing during rollback: {new_name}")
+                    elif inode and _inode(state.folder_path, new_name) != inode:
+                        errors.append(f"Cannot roll back {new_name}: it was replaced after the run; left as is")
+                    elif ns.exists(old_name):
+                        errors.append(f"Cannot roll back {new_name}: {old_name} already exists")
+                    else:
+                        ns.rename(new_name, old_name)
+                except Exception as e:
+                    errors.append(f"Error rolling back {new_name}: {e}")
+                journal.undone()
+                if on_progress:
+                    try:
+                        on_progress(idx, total, new_name)
+                    except Exception:
+                        pass
+            journal.finish(rolled_back=True)
+        finally:
+            journal.close()
+    finally:
+        ns.close()
     return errors
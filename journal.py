@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import IO, NamedTuple, Optional, Sequence
+
+from scheduler import RenameStep
+
+# Write-ahead journal of one rename run, one NDJSON record per line: a
+# header, an "I" intent per step (src, dst, kind, op index, inode), "B" once
+# all are fsynced, then "R"/"N" per step outcome, "M" for extra moves and
+# "E" at the end ("U"/"X" while rolling back).
+
+JOURNAL_VERSION = 1
+
+_KIND_CODES = {"direct": "d", "stage": "s", "unstage": "u"}
+_CODE_KINDS = {code: kind for kind, code in _KIND_CODES.items()}
+
+# Most step records a time-window policy leaves unsynced.
+_MAX_TIME_WINDOW_OPS = 100_000
+
+# Intent lines joined per write while journaling the plan.
+_INTENT_CHUNK = 4096
+
+# Step records buffered per write() between fsyncs.
+_WRITE_BATCH = 256
+
+
+class FsyncPolicy(NamedTuple):
+    """
+    When journal records are fsynced: every every_ops step records, or
+    every every_seconds (whichever is set).
+    """
+
+    every_ops: int = 0
+    every_seconds: float = 0.0
+
+    @property
+    def sync_window(self) -> int:
+        """
+        Most step records that can be lost on power loss.
+        """
+        if self.every_ops:
+            return max(self.every_ops, _WRITE_BATCH)
+        return _MAX_TIME_WINDOW_OPS
+
+
+DEFAULT_FSYNC_POLICY = FsyncPolicy(every_seconds=1.0)
+
+
+def parse_fsync_policy(text: str) -> FsyncPolicy:
+    """
+    "op" (fsync after every rename), "N" (every N renames) or a time
+    window such as "1s" or "250ms".
+    """
+    text = text.strip().lower()
+    if text == "op":
+        return FsyncPolicy(every_ops=1)
+    try:
+        if text.endswith("ms"):
+            seconds = float(text[:-2]) / 1000
+        elif text.endswith("s"):
+            seconds = float(text[:-1])
+        else:
+            ops = int(text)
+            if ops < 1:
+                raise ValueError
+            return FsyncPolicy(every_ops=ops)
+    except ValueError:
+        raise ValueError(f'invalid fsync policy {text!r} (expected "op", a count or e.g. "1s")') from None
+    if seconds <= 0:
+        raise ValueError("fsync window must be positive")
+    return FsyncPolicy(every_seconds=seconds)
+
+
+_encode_record = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _line(record: object) -> bytes:
+    # surrogateescape round-trips undecodable POSIX file names
+    return _encode_record(record).encode("utf-8", "surrogateescape") + b"\n"
+
+
+def _fsync_dir(path: str) -> None:
+    # Makes a newly created file's directory entry durable (POSIX only)
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except (OSError, AttributeError):
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class RenameJournal:
+    """
+    Appends records to a journal file (see the format above).
+
+    Use create() for a new run and reopen() to continue one (resume or
+    rollback); apply_rename_plan(..., journal=...) writes the intents and
+    step records.
+    """
+
+    def __init__(self, path: str, policy: FsyncPolicy = DEFAULT_FSYNC_POLICY) -> None:
+        self.path = path
+        self.policy = policy
+        self._file: Optional[IO[bytes]] = open(path, "ab", buffering=0)
+        self._pending = bytearray()
+        self._pending_records = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    @classmethod
+    def create(cls, path: str, folder_path: str, policy: FsyncPolicy = DEFAULT_FSYNC_POLICY) -> "RenameJournal":
+        if os.path.exists(path):
+            raise FileExistsError(f"Journal already exists: {path}")
+        journal = cls(path, policy)
+        # Absolute, so resume/rollback from another directory find the same folder
+        header = {"journal": JOURNAL_VERSION, "folder": os.path.abspath(folder_path), "sync_window": policy.sync_window}
+        journal._file.write(_line(header))
+        return journal
+
+    @classmethod
+    def reopen(cls, path: str, policy: FsyncPolicy = DEFAULT_FSYNC_POLICY) -> "RenameJournal":
+        return cls(path, policy)
+
+    def begin(self, steps: Sequence[RenameStep], inodes: Optional[Sequence[int]] = None) -> None:
+        """
+        Journals every step's intent (with the inode of the file it moves,
+        when given) and makes it durable before the first rename runs.
+        """
+        write = self._file.write
+        for start in range(0, len(steps), _INTENT_CHUNK):
+            write(b"".join(
+                _line([
+                    "I",
+                    step.src,
+                    step.dst,
+                    _KIND_CODES[step.kind],
+                    step.op_index,
+                    inodes[start + j] if inodes is not None else 0,
+                ])
+                for j, step in enumerate(steps[start:start + _INTENT_CHUNK])
+            ))
+        write(_line(["B"]))
+        self.sync()
+        _fsync_dir(self.path)
+
+    def step(self, index: int, renamed: bool) -> None:
+        self._append(b'["R",%d]\n' % index if renamed else b'["N",%d]\n' % index)
+
+    def moved(self, src: str, dst: str) -> None:
+        self._append(_line(["M", src, dst]))
+
+    def undone(self) -> None:
+        # Written at once: a rollback re-run must not revert a rename twice
+        self._append(b'["U"]\n')
+        self._write_pending()
+
+    def finish(self, rolled_back: bool = False) -> None:
+        self._pending += _line(["X"] if rolled_back else ["E"])
+        self.sync()
+
+    def _append(self, record: bytes) -> None:
+        self._pending += record
+        self._pending_records += 1
+        if self._pending_records >= _WRITE_BATCH:
+            self._write_pending()
+        self._unsynced += 1
+        policy = self.policy
+        if policy.every_ops:
+            if self._unsynced >= policy.every_ops:
+                self.sync()
+        elif self._unsynced >= _MAX_TIME_WINDOW_OPS or time.monotonic() - self._last_sync >= policy.every_seconds:
+            self.sync()
+
+    def _write_pending(self) -> None:
+        if self._pending:
+            self._file.write(self._pending)
+            self._pending.clear()
+        self._pending_records = 0
+
+    def sync(self) -> None:
+        if self._file is not None:
+            self._write_pending()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "RenameJournal":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+@dataclass
+class JournalState:
+    """
+    What a journal file says about its run.
+
+    - renames are the renames recorded so far, in the order they happened
+      (step renames and extra moves); undone of them were rolled back;
+      rename_inodes[i] identifies the file renames[i] moved (0 if unknown);
+    - renamed_steps are the steps recorded as renamed; next_step is the
+      first step without a record; inodes[i] identifies the file step i
+      moves (0 if unknown);
+    - unresolved are steps past next_step whose outcome could not be told
+      after a crash (see filesystem._resolve_lost_steps).
+    """
+
+    folder_path: str
+    sync_window: int
+    steps: list[RenameStep] = field(default_factory=list)
+    inodes: list[int] = field(default_factory=list)
+    began: bool = False
+    renames: list[tuple[str, str]] = field(default_factory=list)
+    rename_inodes: list[int] = field(default_factory=list)
+    renamed_steps: set[int] = field(default_factory=set)
+    next_step: int = 0
+    undone: int = 0
+    finished: bool = False
+    rolled_back: bool = False
+    unresolved: list[int] = field(default_factory=list)
+
+
+def read_journal(path: str) -> JournalState:
+    """
+    Parses a journal; a last line cut off by a crash is ignored.
+    Raises ValueError for a file that is not a journal.
+    """
+    with open(path, "rb") as f:
+        try:
+            header = json.loads(f.readline().decode("utf-8", "surrogateescape"))
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get("journal") != JOURNAL_VERSION:
+            raise ValueError(f"Not a rename journal: {path}")
+        state = JournalState(folder_path=header["folder"], sync_window=int(header.get("sync_window", 1)))
+        _read_records(f, state, path)
+    return state
+
+
+def _read_records(f: IO[bytes], state: JournalState, path: str) -> None:
+    steps = state.steps
+    parked: dict[str, int] = {}   # temporary name -> inode of the file a stage step parks there
+    for raw in f:
+        if not raw.endswith(b"\n"):
+            return  # cut off by a crash
+        try:
+            record = json.loads(raw.decode("utf-8", "surrogateescape"))
+            tag = record[0]
+            if tag == "I":
+                steps.append(RenameStep(record[4], record[1], record[2], _CODE_KINDS[record[3]]))
+                state.inodes.append(record[5] if len(record) > 5 else 0)
+                if steps[-1].kind == "stage":
+                    parked[steps[-1].dst] = state.inodes[-1]
+            elif tag == "R":
+                step = steps[record[1]]
+                state.renames.append((step.src, step.dst))
+                state.rename_inodes.append(state.inodes[record[1]])
+                state.renamed_steps.add(record[1])
+                state.next_step = record[1] + 1
+            elif tag == "N":
+                state.next_step = record[1] + 1
+            elif tag == "M":
+                state.renames.append((record[1], record[2]))
+                state.rename_inodes.append(parked.get(record[1], 0))
+            elif tag == "B":
+                state.began = True
+            elif tag == "E":
+                state.finished = True
+            elif tag == "U":
+                state.undone += 1
+            elif tag == "X":
+                state.rolled_back = True
+            else:
+                raise ValueError(tag)
+        except (ValueError, TypeError, IndexError, KeyError):
+            raise ValueError(f"Corrupt journal record in {path}: {raw[:80]!r}") from None
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import atexit
 import datetime
 import os
+import threading
+import time
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, TextIO
 
 
 @dataclass(frozen=True)
@@ -11,19 +14,25 @@ class LogConfig:
     directory: str = "logs"
     prefix: str = "log_file_"
     extension: str = ".log"
+    flush_interval: float = 1.0     # seconds between buffered flushes
+    buffer_size: int = 64 * 1024    # characters buffered before a flush
 
 
 def ensure_log_dir(directory: str) -> None:
     os.makedirs(directory, exist_ok=True)
 
 
-def build_timestamped_log_path(config: LogConfig = LogConfig()) -> str:
+def build_timestamped_log_path(config: LogConfig = LogConfig(), suffix: str = "") -> str:
     """
     Creates logs/ if needed and returns a timestamped log file path.
     Example: logs/log_file_20260105_093012.log
+    A suffix (e.g. a job id) tells apart logs started in the same second:
+    logs/log_file_20260105_093012_<suffix>.log
     """
     ensure_log_dir(config.directory)
     ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    if suffix:
+        ts += f"_{suffix}"
     filename = f"{config.prefix}{ts}{config.extension}"
     return os.path.join(config.directory, filename)
 
@@ -36,3 +45,96 @@ def maybe_create_log_path(enabled: bool, config: LogConfig = LogConfig()) -> Opt
     if not enabled:
         return None
     return build_timestamped_log_path(config)
+
+
+class SessionLogger:
+    """
+    Log file kept open for a whole session, with buffered writes.
+
+    - Lines look like "[YYYY-MM-DD HH:MM:SS] message" (same as before).
+    - The timestamp prefix is formatted once per wall-clock second.
+    - Buffered lines are written when buffer_size is reached or when
+      flush_interval has passed since the last flush (checked on write),
+      and always on flush()/close(), on exiting a with-block (also when
+      an exception is raised) and at interpreter exit.
+    - Safe to share between threads.
+    """
+
+    def __init__(self, path: str, config: LogConfig = LogConfig()) -> None:
+        self.path = path
+        self._flush_interval = config.flush_interval
+        self._buffer_size = config.buffer_size
+        self._file: Optional[TextIO] = open(path, "a", encoding="utf-8")
+        self._buffer: list[str] = []
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._second = -1
+        self._prefix = ""
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    @classmethod
+    def create(cls, config: LogConfig = LogConfig(), suffix: str = "") -> "SessionLogger":
+        """
+        Opens a new timestamped log file (see build_timestamped_log_path).
+        """
+        return cls(build_timestamped_log_path(config, suffix), config)
+
+    def log(self, message: str) -> None:
+        now = time.time()
+        with self._lock:
+            second = int(now)
+            if second != self._second:
+                self._second = second
+                self._prefix = datetime.datetime.fromtimestamp(second).strftime("[%Y-%m-%d %H:%M:%S] ")
+            line = f"{self._prefix}{message}\n"
+            self._buffer.append(line)
+            self._buffered += len(line)
+            if self._buffered >= self._buffer_size or time.monotonic() - self._last_flush >= self._flush_interval:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._file is None:
+            return
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer.clear()
+            self._buffered = 0
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            self._flush_locked()
+            self._file.close()
+            self._file = None
+        atexit.unregister(self.close)
+
+    @property
+    def closed(self) -> bool:
+        return self._file is None
+
+    def __enter__(self) -> "SessionLogger":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def maybe_create_session_logger(
+    enabled: bool,
+    config: LogConfig = LogConfig(),
+    suffix: str = "",
+) -> Optional[SessionLogger]:
+    """
+    Like maybe_create_log_path, but returns an open SessionLogger.
+    """
+    if not enabled:
+        return None
+    return SessionLogger.create(config, suffix)
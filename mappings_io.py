@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import IO, Iterable, Iterator, Optional
+
+from columns import PairColumn
+
+# Undo mappings are (new_path, old_path) pairs in the order the renames happened.
+# v1 is one JSON document; v2 is NDJSON (a {"version", "folder"} header, then
+# [new, old] rows relative to the folder), streamed while renaming, and
+# gzipped for ".gz" paths. Zip-rename mappings carry "archive" and are
+# refused by open_mappings.
+
+MAPPINGS_VERSION = 2
+
+# Bytes read per block when counting or reading a v2 file backwards.
+_BLOCK = 1024 * 1024
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+_encode_row = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def default_version(path: str) -> int:
+    """
+    1 for "*.json" (the old format, for existing tooling), 2 otherwise
+    (e.g. "undo.ndjson", "undo.ndjson.gz").
+    """
+    return 1 if path.lower().endswith(".json") else MAPPINGS_VERSION
+
+
+def _is_gzip(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(2) == _GZIP_MAGIC
+
+
+def _open_binary(path: str, mode: str, compressed: bool) -> IO[bytes]:
+    if compressed:
+        import gzip
+
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _encode(text: str) -> bytes:
+    # surrogateescape round-trips undecodable POSIX file names
+    return text.encode("utf-8", "surrogateescape")
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode("utf-8", "surrogateescape")
+
+
+class MappingsWriter:
+    """
+    Appends undo mappings to a v2 file as they happen.
+
+    - append((new_path, old_path)) takes paths inside folder_path (a
+      ValueError otherwise), so it can stand in for ApplyResult.mappings
+      (see apply_rename_plan's mappings_writer); len() counts rows.
+    - Rows are buffered; close() (or leaving a with-block) writes them out.
+    - archive marks member names of that zip (see open_mappings).
+    """
+
+    def __init__(self, path: str, folder_path: str, *, archive: Optional[str] = None) -> None:
+        self.path = path
+        self.folder_path = folder_path
+        self._prefix = os.path.join(folder_path, "") if folder_path else ""
+        self._file: Optional[IO[bytes]] = _open_binary(path, "wb", path.lower().endswith(".gz"))
+        self._rows = 0
+        header = {"version": MAPPINGS_VERSION, "folder": folder_path}
+        if archive is not None:
+            header["archive"] = archive
+        self._file.write(_encode(json.dumps(header, ensure_ascii=False)) + b"\n")
+
+    def _relative(self, path: str) -> str:
+        if not path.startswith(self._prefix):
+            raise ValueError(f"Path is not inside {self.folder_path}: {path}")
+        return path[len(self._prefix):]
+
+    def append(self, pair: tuple[str, str]) -> None:
+        new_path, old_path = pair
+        self._file.write(_encode(_encode_row([self._relative(new_path), self._relative(old_path)])) + b"\n")
+        self._rows += 1
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "MappingsWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def _reverse_lines(f: IO[bytes], start: int, end: int) -> Iterator[bytes]:
+    """
+    Lines of f[start:end] from last to first (without newlines); the first
+    item is whatever follows the last newline ("" for a complete file).
+    """
+    pos = end
+    tail = b""
+    while pos > start:
+        size = min(_BLOCK, pos - start)
+        pos -= size
+        f.seek(pos)
+        lines = (f.read(size) + tail).split(b"\n")
+        tail = lines[0]
+        yield from reversed(lines[1:])
+    yield tail
+
+
+class MappingsFile:
+    """
+    A v2 mappings file read lazily, in constant memory: iter() (what
+    undo_renames uses) streams rows in order and reversed() reads the file
+    backwards block by block; len() counts rows with one scan.
+
+    A gzip file cannot be read backwards, so reversed() first packs its
+    rows into a PairColumn (packed, no per-row objects).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.compressed = _is_gzip(path)
+        with _open_binary(path, "rb", self.compressed) as f:
+            header = _parse_header(f.readline())
+            self._data_start = f.tell()
+        if header is None or header.get("version") != 2:
+            raise ValueError("Not a v2 mappings file.")
+        folder = header.get("folder")
+        if not isinstance(folder, str):
+            raise ValueError("Invalid mappings file format (folder must be a string).")
+        self.folder_path = folder
+        self.archive: Optional[str] = header.get("archive")
+        self._len: Optional[int] = None
+
+    def _row(self, line: bytes) -> tuple[str, str]:
+        try:
+            row = json.loads(_decode(line))
+        except ValueError:
+            row = None
+        if not isinstance(row, list) or len(row) != 2:
+            raise ValueError("Invalid mappings file format (bad row).")
+        new_name, old_name = row
+        if not isinstance(new_name, str) or not isinstance(old_name, str):
+            raise ValueError("Invalid mappings file format (paths must be strings).")
+        folder = self.folder_path
+        return (os.path.join(folder, new_name), os.path.join(folder, old_name))
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        with _open_binary(self.path, "rb", self.compressed) as f:
+            f.seek(self._data_start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return  # cut off by a crash
+                yield self._row(line[:-1])
+
+    def __reversed__(self) -> Iterator[tuple[str, str]]:
+        if self.compressed:
+            yield from reversed(PairColumn(iter(self)))
+            return
+        with open(self.path, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            lines = _reverse_lines(f, self._data_start, end)
+            next(lines)  # after the last newline: empty, or a row cut off by a crash
+            for line in lines:
+                yield self._row(line)
+
+    def __len__(self) -> int:
+        if self._len is None:
+            count = 0
+            with _open_binary(self.path, "rb", self.compressed) as f:
+                f.seek(self._data_start)
+                while True:
+                    block = f.read(_BLOCK)
+                    if not block:
+                        break
+                    count += block.count(b"\n")
+            self._len = count
+        return self._len
+
+
+def _parse_header(line: bytes) -> Optional[dict]:
+    try:
+        header = json.loads(_decode(line))
+    except ValueError:
+        return None  # e.g. the "{" opening a pretty-printed v1 file
+    return header if isinstance(header, dict) else None
+
+
+def save_mappings(
+    path: str,
+    mappings: Iterable[tuple[str, str]],
+    *,
+    version: Optional[int] = None,
+    archive: Optional[str] = None,
+) -> None:
+    """
+    Writes mappings in one go (version defaults to default_version(path)).
+    A v2 file stores the folder of the first mapping once, or full paths
+    when the mappings span several folders. archive marks member names of
+    that zip (see open_mappings).
+    """
+    version = default_version(path) if version is None else version
+    if version == 1:
+        payload = {
+            "version": 1,
+            "mappings": [{"new_path": n, "old_path": o} for (n, o) in mappings],
+        }
+        if archive is not None:
+            payload["archive"] = archive
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+        return
+
+    pairs = mappings if isinstance(mappings, (list, tuple)) else list(mappings)
+    folder = os.path.dirname(pairs[0][0]) if pairs else ""
+    prefix = os.path.join(folder, "") if folder else ""
+    if any(not (n.startswith(prefix) and o.startswith(prefix)) for n, o in pairs):
+        folder = ""
+    with MappingsWriter(path, folder, archive=archive) as writer:
+        for pair in pairs:
+            writer.append(pair)
+
+
+def open_mappings(path: str):
+    """
+    Mappings for undo_renames: a streaming MappingsFile for v2, the
+    loaded list for v1. Mappings of a zip rename are refused (ValueError).
+    """
+    with _open_binary(path, "rb", _is_gzip(path)) as f:
+        header = _parse_header(f.readline())
+    if header is not None and header.get("version") == 2:
+        mappings = MappingsFile(path)
+        _refuse_archive(mappings.archive)
+        return mappings
+    return _load_v1(path)
+
+
+def _refuse_archive(archive: Optional[str]) -> None:
+    if archive is not None:
+        raise ValueError(f"These mappings rename members of {archive}, not files; they cannot be undone on disk.")
+
+
+def load_mappings(path: str) -> list[tuple[str, str]]:
+    """
+    All mappings of a v1 or v2 file as a list.
+    """
+    mappings = open_mappings(path)
+    return mappings if isinstance(mappings, list) else list(mappings)
+
+
+def _load_v1(path: str) -> list[tuple[str, str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+
+    if not isinstance(payload, dict) or "mappings" not in payload:
+        raise ValueError("Invalid mappings file format.")
+    _refuse_archive(payload.get("archive"))
+
+    mappings = payload["mappings"]
+    if not isinstance(mappings, list):
+        raise ValueError("Invalid mappings file format (mappings must be a list).")
+
+    out: list[tuple[str, str]] = []
+    for item in mappings:
+        if not isinstance(item, dict):
+            raise ValueError("Invalid mappings file format (mapping item must be an object).")
+        new_path = item.get("new_path")
+        old_path = item.get("old_path")
+        if not isinstance(new_path, str) or not isinstance(old_path, str):
+            raise ValueError("Invalid mappings file format (paths must be strings).")
+        out.append((new_path, old_path))
+
+    return out
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+# hook(kind, metrics.to_dict()): kind names the job ("rename", "zip_job", ...)
+MetricsHook = Callable[[str, dict[str, Any]], None]
+
+_hooks: list[MetricsHook] = []
+
+
+class Metrics:
+    """
+    Per-job phase timers and counters.
+
+    - Phases are timed with time.perf_counter and are exclusive: time spent
+      in a phase that runs inside another (e.g. "list" while "plan" pulls
+      entries from a lazy scan) is only counted in the inner one, so the
+      phases add up to the job's wall time.
+    - Phase timers are meant for one thread; counters (count/add) are safe
+      to update from worker threads.
+    - Counters hold syscall counts (stat, rename, scandir), bytes and
+      outcome totals; which ones appear depends on the code path.
+    """
+
+    def __init__(self) -> None:
+        self.phases: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self._open: list[float] = []   # nested time of each open phase
+        self._lock = threading.Lock()
+
+    def phase(self, name: str) -> "_Phase":
+        return _Phase(self, name)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """
+        Records seconds for name (for call sites too hot for a with-block);
+        they are not counted again in the enclosing phase.
+        """
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        if self._open:
+            self._open[-1] += seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.phases.values())
+
+    def merge(self, other: "Metrics") -> None:
+        for name, seconds in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+        for name, n in other.counters.items():
+            self.count(name, n)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "seconds": round(self.seconds, 6),
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+
+    def format(self) -> str:
+        total = self.seconds
+        lines = [f"Time: {total:.3f}s"]
+        for name, seconds in sorted(self.phases.items(), key=lambda item: -item[1]):
+            share = 100.0 * seconds / total if total else 0.0
+            lines.append(f"  {name:<12} {seconds:9.3f}s {share:5.1f}%")
+        for name in sorted(self.counters):
+            lines.append(f"  {name:<12} {self.counters[name]:>10}")
+        return "\n".join(lines)
+
+
+class _Phase:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: Metrics, name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> Metrics:
+        self.metrics._open.append(0.0)
+        self.start = time.perf_counter()
+        return self.metrics
+
+    def __exit__(self, *exc_info: object) -> None:
+        elapsed = time.perf_counter() - self.start
+        nested = self.metrics._open.pop()
+        self.metrics.add_time(self.name, elapsed - nested)
+        if self.metrics._open:
+            self.metrics._open[-1] += nested
+
+
+def add_hook(hook: MetricsHook) -> None:
+    """
+    Registers hook to receive every published job's metrics (e.g. to push
+    them to a monitoring system).
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook: MetricsHook) -> None:
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def publish(kind: str, metrics: Optional[Metrics]) -> None:
+    """
+    Calls every registered hook; a failing hook never fails the job.
+    """
+    if metrics is None:
+        return
+    data = metrics.to_dict()
+    for hook in list(_hooks):
+        try:
+            hook(kind, data)
+        except Exception:
+            pass
+
+
+def load_hook(spec: str) -> MetricsHook:
+    """
+    Resolves "package.module:function" (the --metrics-hook CLI value).
+    """
+    import importlib
+
+    module_name, sep, attr = spec.partition(":")
+    if not sep or not module_name or not attr:
+        raise ValueError(f'expected "module:function", got {spec!r}')
+    hook = getattr(importlib.import_module(module_name), attr)
+    if not callable(hook):
+        raise ValueError(f"{spec} is not callable")
+    return hook
+
+
+def write_json(path: str, kind: str, metrics: Metrics) -> None:
+    """
+    Writes {"kind": ..., **metrics.to_dict()} to path ("-" for stdout).
+    """
+    import json
+    import sys
+
+    text = json.dumps({"kind": kind, **metrics.to_dict()}, indent=2)
+    if path == "-":
+        sys.stdout.write(text + "\n")
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
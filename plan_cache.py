@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import os
+import pickle
+from collections import OrderedDict
+from dataclasses import astuple, dataclass
+from typing import NamedTuple, Optional
+
+from engine import DEFAULT_MEMORY_BUDGET, RenameOptions, RenamePlan, iter_plan_for_entries
+from scanner import FileEntry, ScanSnapshot, iter_scan
+
+
+# Bump when the pickled layout of PlanCache.save() changes.
+_CACHE_FORMAT = 1
+
+
+class DirFingerprint(NamedTuple):
+    real_path: str
+    device: int
+    inode: int
+    mtime_ns: int
+
+
+def dir_fingerprint(folder_path: str) -> DirFingerprint:
+    """
+    Identity + modification stamp of a folder: changes whenever an entry is
+    added, removed or renamed in it (or the path points to another folder).
+    """
+    real_path = os.path.realpath(folder_path)
+    st = os.stat(real_path)
+    return DirFingerprint(real_path, st.st_dev, st.st_ino, st.st_mtime_ns)
+
+
+class CachedPlan(NamedTuple):
+    plan: RenamePlan
+    snapshot: ScanSnapshot
+    status: str  # "hit", "incremental" (folder changed, rescanned) or "miss"
+
+
+@dataclass
+class _FolderEntry:
+    fingerprint: DirFingerprint
+    snapshot: ScanSnapshot
+    stat_complete: bool  # every file entry has stat fields
+    plans: "OrderedDict[tuple, RenamePlan]"
+
+
+def _rescan(
+    folder_path: str,
+    previous: Optional[ScanSnapshot],
+    with_stat: bool,
+) -> ScanSnapshot:
+    """
+    Lists the folder again (no stats) and only stats files that are new
+    since the previous snapshot (by name + inode) when stat data is needed.
+    """
+    known: dict[tuple[str, int], FileEntry] = {}
+    if previous is not None:
+        known = {(e.name, e.inode): e for e in previous.entries if e.ctime is not None}
+
+    snapshot = ScanSnapshot(folder_path=folder_path)
+    for entry in iter_scan(folder_path, with_stat=False):
+        if with_stat and entry.is_file:
+            old = known.get((entry.name, entry.inode))
+            if old is not None:
+                entry = old
+            else:
+                try:
+                    st = os.stat(os.path.join(folder_path, entry.name))
+                except OSError:
+                    entry = entry._replace(is_file=False)
+                else:
+                    entry = entry._replace(size=st.st_size, mtime=st.st_mtime, ctime=st.st_ctime)
+        snapshot.entries.append(entry)
+    return snapshot
+
+
+class PlanCache:
+    """
+    Reuses scan snapshots and built plans between preview and rename.
+
+    Plans are keyed by folder (real path), the folder's device/inode/mtime
+    fingerprint and the RenameOptions:
+
+    - unchanged folder + same options: the stored plan is returned as-is;
+    - changed folder: the folder is listed again and only new files are
+      stat'ed (when the date suffix needs ctime), then the plan is rebuilt.
+
+    Only changes to the folder's entries are detected. A file whose ctime
+    changed in place (e.g. content rewritten) keeps its cached date; call
+    invalidate() to force a full rescan.
+
+    Optionally persisted with save()/load() (pickle) for CLI runs.
+    """
+
+    def __init__(self, max_folders: int = 4, max_plans_per_folder: int = 4) -> None:
+        self.max_folders = max_folders
+        self.max_plans_per_folder = max_plans_per_folder
+        self._folders: "OrderedDict[str, _FolderEntry]" = OrderedDict()
+
+    def get_plan(
+        self,
+        folder_path: str,
+        options: RenameOptions,
+        *,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ) -> CachedPlan:
+        # Fingerprint before listing: a change during the scan invalidates next time
+        fingerprint = dir_fingerprint(folder_path)
+        key = fingerprint.real_path
+        options_key = astuple(options)
+
+        entry = self._folders.get(key)
+        status = "miss"
+        if entry is not None:
+            self._folders.move_to_end(key)
+            if entry.fingerprint == fingerprint:
+                plan = entry.plans.get(options_key)
+                if plan is not None:
+                    entry.plans.move_to_end(options_key)
+                    return CachedPlan(plan, entry.snapshot, "hit")
+                if entry.stat_complete or not options.include_date:
+                    status = "hit"
+            if status == "miss":
+                entry.snapshot = _rescan(folder_path, entry.snapshot, options.include_date)
+                entry.stat_complete = options.include_date
+                entry.fingerprint = fingerprint
+                entry.plans.clear()
+                status = "incremental"
+        else:
+            snapshot = ScanSnapshot(
+                folder_path=folder_path,
+                entries=list(iter_scan(folder_path, with_stat=options.include_date)),
+            )
+            entry = _FolderEntry(fingerprint, snapshot, options.include_date, OrderedDict())
+            self._folders[key] = entry
+            while len(self._folders) > self.max_folders:
+                self._folders.popitem(last=False)
+
+        plan = RenamePlan.from_operations(
+            folder_path,
+            iter_plan_for_entries(entry.snapshot.entries, options, memory_budget=memory_budget),
+        )
+        entry.plans[options_key] = plan
+        while len(entry.plans) > self.max_plans_per_folder:
+            entry.plans.popitem(last=False)
+        return CachedPlan(plan, entry.snapshot, status)
+
+    def invalidate(self, folder_path: Optional[str] = None) -> None:
+        if folder_path is None:
+            self._folders.clear()
+        else:
+            self._folders.pop(os.path.realpath(folder_path), None)
+
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((_CACHE_FORMAT, self._folders), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "PlanCache":
+        """
+        Loads a cache written by save(); a missing, unreadable or outdated
+        file gives an empty cache. Only load cache files you wrote yourself
+        (pickle).
+        """
+        cache = cls()
+        try:
+            with open(path, "rb") as f:
+                version, folders = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError, AttributeError):
+            return cache
+        if version == _CACHE_FORMAT and isinstance(folders, OrderedDict):
+            cache._folders = folders
+        return cache
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from array import array
+from itertools import compress
+from typing import Optional
+
+from engine import PlanRow, RenamePlan
+
+
+class PlanView:
+    """
+    A filtered window onto a RenamePlan, for list widgets that draw only
+    the rows on screen (see the preview in relabeler.py).
+
+    - len() and view[i] cover the rows matching the current filter;
+      rows(start, count) returns one screenful.
+    - set_filter(text) keeps rows whose old or new name contains text
+      (ASCII case-insensitive); "" shows every row. Matches are kept as an
+      array of plan indices (4 bytes per row), the names stay in the plan.
+    """
+
+    def __init__(self, plan: Optional[RenamePlan] = None) -> None:
+        self.plan = plan if plan is not None else RenamePlan("")
+        self.filter_text = ""
+        self._matches: Optional[array] = None  # plan indices, None = every row
+
+    def set_filter(self, text: str) -> int:
+        """
+        Applies a new filter and returns the number of matching rows.
+        """
+        self.filter_text = text
+        if not text:
+            self._matches = None
+            return len(self.plan)
+        hits = bytearray(len(self.plan))
+        for column in (self.plan.old_names, self.plan.new_names):
+            for index in column.search(text):
+                hits[index] = 1
+        self._matches = array("I", compress(range(len(hits)), hits))
+        return len(self._matches)
+
+    def plan_index(self, index: int) -> int:
+        return index if self._matches is None else self._matches[index]
+
+    def __len__(self) -> int:
+        return len(self.plan) if self._matches is None else len(self._matches)
+
+    def __getitem__(self, index: int) -> PlanRow:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PlanView index out of range")
+        return self.plan[self.plan_index(index)]
+
+    def rows(self, start: int, count: int) -> list[PlanRow]:
+        start = max(0, start)
+        return [self[i] for i in range(start, min(start + count, len(self)))]
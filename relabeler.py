@@ -1,15 +1,19 @@
 import os
+import queue
+import threading
 import tkinter
 from dataclasses import dataclass, field
-from typing import List, Tuple
+from typing import Any, Callable, List, Optional, Tuple
 
 from tkinter import filedialog, messagebox, ttk
 from tkinterdnd2 import TkinterDnD, DND_FILES
 
-from engine import build_rename_plan, RenameOptions
-from filesystem import apply_rename_plan, undo_rename_mappings
+from engine import RenameOptions
+from filesystem import Progress, ProgressEvent, apply_rename_plan, undo_renames
 from validation import validate_inputs
-from log_utils import build_timestamped_log_path
+from log_utils import SessionLogger
+from plan_cache import PlanCache
+from plan_view import PlanView
 
 
 # =========================
@@ -19,6 +23,8 @@ from log_utils import build_timestamped_log_path
 class AppState:
     undo_mappings: List[Tuple[str, str]] = field(default_factory=list)  # (new_path, old_path)
     is_busy: bool = False
+    plan_cache: PlanCache = field(default_factory=PlanCache)  # shared by Preview and Rename
+    filter_job: Optional[str] = None  # pending after() id of the preview filter
 
     def clear_undo(self) -> None:
         self.undo_mappings.clear()
@@ -29,13 +35,187 @@ class AppState:
 
 app_state = AppState()
 
+# Milliseconds between UI refreshes while a task runs: however fast the
+# worker reports progress, the bar and status are redrawn at most this often.
+_REFRESH_MS = 100
+
+# Worker -> UI messages: ("progress", current, total, text) or ("done", outcome, error)
+progress_queue: "queue.Queue[tuple]" = queue.Queue()
+cancel_event = threading.Event()
+
+# Milliseconds of typing pause before the preview filter runs.
+_FILTER_DELAY_MS = 150
+
+
+class PreviewList:
+    """
+    Virtual list of a rename plan: the Listbox only ever holds the rows on
+    screen, fetched from a PlanView as the user scrolls, so a preview of
+    100k+ files shows at once and costs Tk a screenful of items.
+    """
+
+    def __init__(self, parent, *, width: int, height: int) -> None:
+        self.frame = tkinter.Frame(parent)
+        self.listbox = tkinter.Listbox(self.frame, width=width, height=height, activestyle="none")
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scrollbar)
+        self.listbox.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.height = height
+        self.view = PlanView()
+        self.top = 0
+
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.listbox.bind(sequence, self._on_wheel)
+        for key, step in (("<Up>", -1), ("<Down>", 1), ("<Prior>", -height), ("<Next>", height)):
+            self.listbox.bind(key, lambda _event, step=step: self._scroll_by(step))
+        self.listbox.bind("<Home>", lambda _event: self.scroll_to(0))
+        self.listbox.bind("<End>", lambda _event: self.scroll_to(len(self.view)))
+        self._draw()
+
+    def show(self, plan) -> int:
+        """
+        Displays plan (a RenamePlan) under the current filter; returns the
+        number of rows shown.
+        """
+        filter_text = self.view.filter_text
+        self.view = PlanView(plan)
+        return self.set_filter(filter_text)
+
+    def clear(self) -> None:
+        self.show(None)
+
+    def set_filter(self, text: str) -> int:
+        count = self.view.set_filter(text)
+        self.scroll_to(0)
+        return count
+
+    def scroll_to(self, top: int) -> str:
+        self.top = max(0, min(top, len(self.view) - self.height))
+        self._draw()
+        return "break"
+
+    def _scroll_by(self, rows: int) -> str:
+        return self.scroll_to(self.top + rows)
+
+    def _on_wheel(self, event) -> str:
+        if event.num == 4 or event.delta > 0:
+            return self._scroll_by(-3)
+        return self._scroll_by(3)
+
+    def _on_scrollbar(self, action: str, amount: str, unit: str = "") -> None:
+        if action == "moveto":
+            self.scroll_to(round(float(amount) * len(self.view)))
+        else:
+            self._scroll_by(int(amount) * (self.height if unit == "pages" else 1))
+
+    def _draw(self) -> None:
+        rows = self.view.rows(self.top, self.height)
+        self.listbox.delete(0, tkinter.END)
+        if rows:
+            self.listbox.insert(tkinter.END, *(f'{op.old_name} "->" {op.new_name}' for op in rows))
+        total = len(self.view)
+        if total:
+            self.scrollbar.set(self.top / total, (self.top + len(rows)) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
 
 # =========================
 # UI Helpers / Callbacks
 # =========================
 def _set_status(text: str) -> None:
     status_label.config(text=text)
-    mainwindow.update_idletasks()
+
+
+def _progress(action: str) -> Progress:
+    """
+    Progress for a task on the worker thread: at most one event per
+    refresh, only queued there, the UI thread draws it.
+    """
+
+    def report(event: ProgressEvent) -> None:
+        text = f"{action} {event.done} of {event.total}: {event.name}"
+        if event.eta is not None:
+            text += f" ({event.files_per_sec:,.0f} files/s, {event.eta:.0f}s left)"
+        progress_queue.put(("progress", event.done, event.total, text))
+
+    return Progress(report, interval=_REFRESH_MS / 1000)
+
+
+def _start_task(
+    status: str,
+    work: Callable[[], Any],
+    on_done: Callable[[Any, Optional[BaseException]], None],
+) -> None:
+    """
+    Runs work() on a worker thread, keeping the window responsive.
+
+    - work reports through a _progress() and checks cancel_event (the Cancel
+      button) to stop between file operations;
+    - on_done(outcome, error) runs on the UI thread once work returns or
+      raises (error is then the exception).
+    """
+    app_state.is_busy = True
+    cancel_event.clear()
+    progress_bar["value"] = 0
+    _set_status(status)
+    for button in (button_preview, button_rename, button_undo):
+        button.config(state="disabled")
+    button_cancel.config(state="normal")
+
+    def run() -> None:
+        try:
+            progress_queue.put(("done", work(), None))
+        except Exception as e:
+            progress_queue.put(("done", None, e))
+
+    threading.Thread(target=run, name="relabeler-task", daemon=True).start()
+    mainwindow.after(_REFRESH_MS, _poll, on_done)
+
+
+def _poll(on_done: Callable[[Any, Optional[BaseException]], None]) -> None:
+    """
+    Drains the worker's messages and redraws once with the latest progress.
+    """
+    latest = None
+    done = None
+    try:
+        while True:
+            message = progress_queue.get_nowait()
+            if message[0] == "progress":
+                latest = message
+            else:
+                done = message
+    except queue.Empty:
+        pass
+
+    if latest is not None:
+        _, current, total, text = latest
+        progress_bar["maximum"] = max(total, 1)
+        progress_bar["value"] = current
+        _set_status(text)
+
+    if done is None:
+        mainwindow.after(_REFRESH_MS, _poll, on_done)
+        return
+
+    app_state.is_busy = False
+    button_cancel.config(state="disabled")
+    button_preview.config(state="normal")
+    button_rename.config(state="normal")
+    button_undo.config(state="normal" if app_state.can_undo() else "disabled")
+    _, outcome, error = done
+    on_done(outcome, error)
+
+
+def cancel_task():
+    """
+    Asks the running task to stop after the file operation in progress.
+    """
+    if app_state.is_busy:
+        cancel_event.set()
+        button_cancel.config(state="disabled")
+        _set_status("Cancelling...")
 
 
 def browse_folder():
@@ -70,7 +250,7 @@ def _build_options_from_ui() -> RenameOptions:
 def rename_files():
     """
     Renames all files in the selected folder according to the pattern and options
-    provided by the user.
+    provided by the user. Planning and renaming run on a worker thread.
     """
     if app_state.is_busy:
         return
@@ -83,37 +263,37 @@ def rename_files():
         messagebox.showerror("Error", "\n".join(errors))
         return
 
-    app_state.is_busy = True
-    try:
-        # Create a log file path
-        log_file_path = build_timestamped_log_path()
-
-        # Build operations via engine (tested)
+    def work():
+        # Build operations via engine (tested); reuses the preview's plan if unchanged
         try:
-            operations = build_rename_plan(folder_path, options)
+            cached = app_state.plan_cache.get_plan(folder_path, options)
         except Exception as e:
-            messagebox.showerror("Error", f"Error building rename plan: {e}")
-            return
+            raise RuntimeError(f"Error building rename plan: {e}") from e
 
-        total = len(operations)
-        progress_bar["maximum"] = total
-        progress_bar["value"] = 0
-        _set_status("Starting rename...")
-
-        def on_progress(current: int, total: int, op):
-            progress_bar["value"] = current
-            _set_status(f"Renaming file {current} of {total}: {op.old_name}")
-
-        # Apply plan via filesystem (tested)
-        result = apply_rename_plan(
-            folder_path,
-            operations,
-            log_file_path=log_file_path,
-            on_progress=on_progress,
-        )
+        # Apply plan via filesystem (tested), logging to a new timestamped file
+        try:
+            with SessionLogger.create() as logger:
+                return apply_rename_plan(
+                    folder_path,
+                    cached.plan,
+                    progress=_progress("Renaming file"),
+                    logger=logger,
+                    snapshot=cached.snapshot,
+                    cancel=cancel_event,
+                )
+        finally:
+            # The folder changed; a coarse mtime (FAT, some network mounts) can hide that from the cache
+            app_state.plan_cache.invalidate(folder_path)
+
+    def done(result, error):
+        if error is not None:
+            _set_status("Rename failed.")
+            messagebox.showerror("Error", str(error))
+            return
 
-        # Save mappings for undo (owned by AppState)
+        # Save mappings for undo (owned by AppState); a cancelled run keeps what it renamed
         app_state.undo_mappings = result.mappings.copy()
+        button_undo.config(state="normal" if app_state.can_undo() else "disabled")
 
         # UI feedback
         if result.errors:
@@ -125,46 +305,53 @@ def rename_files():
                 "The following files were skipped because they already exist:\n\n" + "\n".join(result.skipped)
             )
 
+        if result.cancelled:
+            _set_status(f"Rename cancelled after {result.attempted} file(s).")
+            return
         _set_status("Renaming complete!")
         messagebox.showinfo("Success", "Rename operation finished!")
 
-        button_undo.config(state="normal" if app_state.can_undo() else "disabled")
-
-    finally:
-        app_state.is_busy = False
+    _start_task("Starting rename...", work, done)
 
 
 def preview_files():
     """
     Displays a preview of the renamed files in the listbox.
-    Uses engine + validation (logic separated from UI).
+    Uses engine + validation (logic separated from UI); the plan is built
+    on a worker thread.
     """
+    if app_state.is_busy:
+        return
+
     folder_path = entry_folder_path.get()
     options = _build_options_from_ui()
 
-    preview_listbox.delete(0, tkinter.END)
+    preview_list.clear()
 
     errors = validate_inputs(folder_path, options)
     if errors:
         messagebox.showerror("Error", "\n".join(errors))
         return
 
-    try:
-        operations = build_rename_plan(folder_path, options)
-    except Exception as e:
-        messagebox.showerror("Error", f"Error generating preview: {e}")
-        return
+    def done(operations, error):
+        if error is not None:
+            _set_status("Preview failed.")
+            messagebox.showerror("Error", f"Error generating preview: {error}")
+            return
 
-    for op in operations:
-        preview_listbox.insert(tkinter.END, f'{op.old_name} "->" {op.new_name}')
+        shown = preview_list.show(operations)
+        if shown == len(operations):
+            _set_status(f"Preview ready: {len(operations)} file(s).")
+        else:
+            _set_status(f"Preview ready: {len(operations)} file(s), {shown} matching the filter.")
 
-    _set_status(f"Preview ready: {len(operations)} file(s).")
+    _start_task("Building preview...", lambda: app_state.plan_cache.get_plan(folder_path, options).plan, done)
 
 
 def undo_rename():
     """
     Reverts the last rename operation by renaming files back to their original names.
-    Uses filesystem undo (tested).
+    Uses filesystem undo (tested) on a worker thread.
     """
     if app_state.is_busy:
         return
@@ -172,31 +359,55 @@ def undo_rename():
     if not app_state.can_undo():
         return
 
-    app_state.is_busy = True
-    try:
-        total = len(app_state.undo_mappings)
-        progress_bar["maximum"] = total
-        progress_bar["value"] = 0
-        _set_status("Starting undo...")
+    mappings = app_state.undo_mappings
 
-        def on_undo_progress(current: int, total: int, filename: str):
-            progress_bar["value"] = current
-            _set_status(f"Undoing {current} of {total}: {filename}")
+    def work():
+        try:
+            return undo_renames(mappings, progress=_progress("Undoing"), cancel=cancel_event)
+        finally:
+            # Cached plans of the folders undo touched are stale (see rename_files)
+            for folder in {os.path.dirname(new_path) for new_path, _ in mappings}:
+                app_state.plan_cache.invalidate(folder)
+
+    def done(result, error):
+        if error is not None:
+            _set_status("Undo failed.")
+            messagebox.showerror("Error", f"Undo failed: {error}")
+            return
+
+        if result.errors:
+            messagebox.showerror("Error", "Undo had issues:\n\n" + "\n".join(result.errors))
 
-        errors = undo_rename_mappings(app_state.undo_mappings, on_progress=on_undo_progress)
+        # A cancelled undo can be finished later: keep the reversals it did not reach
+        app_state.undo_mappings = result.remaining
+        button_undo.config(state="normal" if app_state.can_undo() else "disabled")
 
-        if errors:
-            messagebox.showerror("Error", "Undo had issues:\n\n" + "\n".join(errors))
+        if result.cancelled:
+            _set_status(f"Undo cancelled ({result.restored} file(s) restored).")
+        elif result.errors:
             _set_status("Undo completed with errors.")
         else:
             messagebox.showinfo("Success", "Undo successful!")
             _set_status("Undo complete.")
 
-        app_state.clear_undo()
-        button_undo.config(state="disabled")
+    _start_task("Starting undo...", work, done)
 
-    finally:
-        app_state.is_busy = False
+
+def _apply_preview_filter() -> None:
+    app_state.filter_job = None
+    shown = preview_list.set_filter(filter_var.get())
+    total = len(preview_list.view.plan)
+    if total:
+        _set_status(f"Showing {shown} of {total} file(s).")
+
+
+def on_filter_changed(*_args) -> None:
+    """
+    Re-filters the preview once typing pauses for _FILTER_DELAY_MS.
+    """
+    if app_state.filter_job is not None:
+        mainwindow.after_cancel(app_state.filter_job)
+    app_state.filter_job = mainwindow.after(_FILTER_DELAY_MS, _apply_preview_filter)
 
 
 def handle_drag_and_drop(event):
@@ -288,12 +499,20 @@ checkbox_date.grid(row=1, column=2, padx=5, pady=5)
 checkbox_time = tkinter.Checkbutton(mainwindow, text="Include Time", variable=time_var)
 checkbox_time.grid(row=1, column=3, padx=5, pady=5)
 
-# Preview listbox
+# Preview list (virtual: only the visible rows are in Tk) and its filter
 label_preview = tkinter.Label(mainwindow, text="Preview of renamed files:")
-label_preview.grid(row=2, column=0, columnspan=4, padx=5, pady=5, sticky="w")
+label_preview.grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+
+label_filter = tkinter.Label(mainwindow, text="Filter:")
+label_filter.grid(row=2, column=2, padx=5, pady=5, sticky="e")
 
-preview_listbox = tkinter.Listbox(mainwindow, width=105, height=10)
-preview_listbox.grid(row=3, column=0, columnspan=4, padx=5, pady=5)
+filter_var = tkinter.StringVar()
+filter_var.trace_add("write", on_filter_changed)
+entry_filter = tkinter.Entry(mainwindow, textvariable=filter_var)
+entry_filter.grid(row=2, column=3, padx=5, pady=5, sticky="we")
+
+preview_list = PreviewList(mainwindow, width=102, height=10)
+preview_list.frame.grid(row=3, column=0, columnspan=4, padx=5, pady=5)
 
 # Buttons frame
 button_frame = tkinter.Frame(mainwindow)
@@ -308,6 +527,9 @@ button_rename.pack(pady=5)
 button_undo = tkinter.Button(button_frame, text="Undo", command=undo_rename, state="disabled", width=15)
 button_undo.pack(pady=5)
 
+button_cancel = tkinter.Button(button_frame, text="Cancel", command=cancel_task, state="disabled", width=15)
+button_cancel.pack(pady=5)
+
 button_about = tkinter.Button(button_frame, text="About", command=show_about, width=15)
 button_about.pack(pady=5)
 
@@ -1,16 +1,17 @@
 from __future__ import annotations
 
 import argparse
-import json
 import os
 import sys
-from dataclasses import asdict
 from typing import Any, Optional
 
-from engine import build_rename_plan, RenameOptions
-from filesystem import apply_rename_plan, undo_rename_mappings
-from validation import validate_inputs
-from log_utils import maybe_create_log_path
+from engine import iter_plan_for_entries, iter_rename_plan, iter_tree_plans, RenameOptions, RenamePlan, COUNTER_SCOPES, DEFAULT_MEMORY_BUDGET
+from scanner import DEFAULT_WALK_WORKERS, scan_directory
+from validation import positive_int, validate_inputs
+
+# Modules only some subcommands need (batch, filesystem, log_utils,
+# mappings_io, metrics, plan_cache) are imported inside them: the CLI runs from shell loops,
+# where startup time adds up. tests/test_startup.py guards this.
 
 
 def _eprint(*args: Any) -> None:
@@ -38,38 +39,35 @@ def _print_preview(operations) -> None:
         print(f'{op.old_name} -> {op.new_name}')
 
 
-def _save_mappings(path: str, mappings: list[tuple[str, str]]) -> None:
-    # mappings are (new_path, old_path)
-    payload = {
-        "version": 1,
-        "mappings": [{"new_path": n, "old_path": o} for (n, o) in mappings],
-    }
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
+def _cached_plan(args: argparse.Namespace, folder: str, options: RenameOptions):
+    """
+    Plan + snapshot from the --plan-cache file (rebuilt if the folder changed).
+    """
+    from plan_cache import PlanCache
 
+    cache = PlanCache.load(args.plan_cache)
+    cached = cache.get_plan(folder, options, memory_budget=args.memory_budget)
+    cache.save(args.plan_cache)
+    return cached
 
-def _load_mappings(path: str) -> list[tuple[str, str]]:
-    with open(path, "r", encoding="utf-8") as f:
-        payload = json.load(f)
 
-    if not isinstance(payload, dict) or "mappings" not in payload:
-        raise ValueError("Invalid mappings file format.")
+def _check_recursive(args: argparse.Namespace) -> None:
+    if args.recursive and args.plan_cache:
+        _exit_with_errors(["--plan-cache works on one folder; it cannot be combined with --recursive."])
 
-    mappings = payload["mappings"]
-    if not isinstance(mappings, list):
-        raise ValueError("Invalid mappings file format (mappings must be a list).")
 
-    out: list[tuple[str, str]] = []
-    for item in mappings:
-        if not isinstance(item, dict):
-            raise ValueError("Invalid mappings file format (mapping item must be an object).")
-        new_path = item.get("new_path")
-        old_path = item.get("old_path")
-        if not isinstance(new_path, str) or not isinstance(old_path, str):
-            raise ValueError("Invalid mappings file format (paths must be strings).")
-        out.append((new_path, old_path))
+def _tree_plans(args: argparse.Namespace, folder: str, options: RenameOptions, walk_errors: list[str], **kwargs):
+    def on_error(path: str, error: OSError) -> None:
+        walk_errors.append(f"Cannot list {path}: {error}")
 
-    return out
+    return iter_tree_plans(
+        folder,
+        options,
+        counter=args.counter,
+        workers=args.walk_workers,
+        on_error=on_error,
+        **kwargs,
+    )
 
 
 def cmd_preview(args: argparse.Namespace) -> int:
@@ -79,34 +77,132 @@ def cmd_preview(args: argparse.Namespace) -> int:
     errors = validate_inputs(folder, options)
     if errors:
         _exit_with_errors(errors)
-
-    ops = build_rename_plan(folder, options)
+    _check_recursive(args)
+
+    if args.recursive:
+        walk_errors: list[str] = []
+        for plan, _snapshot in _tree_plans(args, folder, options, walk_errors, ordered=True):
+            relative = os.path.relpath(plan.folder_path, folder)
+            if relative != os.curdir:
+                print(f"{relative}{os.sep}:")
+            _print_preview(plan)
+        for message in walk_errors:
+            _eprint(f"Error: {message}")
+        return 1 if walk_errors else 0
+
+    if args.plan_cache:
+        ops = _cached_plan(args, folder, options).plan
+    else:
+        ops = iter_rename_plan(folder, options, memory_budget=args.memory_budget)
     _print_preview(ops)
     return 0
 
 
 def cmd_rename(args: argparse.Namespace) -> int:
+    from filesystem import apply_rename_plan
+    from log_utils import maybe_create_session_logger
+    from metrics import Metrics, add_hook, load_hook, publish, write_json
+
     folder = args.folder
     options = _options_from_args(args)
 
     errors = validate_inputs(folder, options)
     if errors:
         _exit_with_errors(errors)
+    if args.metrics_hook:
+        try:
+            add_hook(load_hook(args.metrics_hook))
+        except (ImportError, AttributeError, ValueError) as e:
+            _exit_with_errors([f"Invalid --metrics-hook: {e}"])
+
+    if args.journal and args.workers > 1:
+        _exit_with_errors(["--journal cannot be combined with --workers > 1."])
+    _check_recursive(args)
+    if args.recursive and args.journal:
+        _exit_with_errors(["--journal works on one folder; it cannot be combined with --recursive."])
+
+    # Detailed metrics (per-entry timers, syscall counts) only when asked for
+    metrics = Metrics() if args.stats or args.stats_json or args.metrics_hook else None
+
+    planning = metrics if metrics is not None else Metrics()
+    snapshot = None
+    walk_errors: list[str] = []
+    if args.recursive:
+        # Each directory is renamed as soon as it is listed and planned
+        ops = _tree_plans(args, folder, options, walk_errors, metrics=metrics)
+    elif args.plan_cache:
+        with planning.phase("plan"):
+            ops, snapshot, _status = _cached_plan(args, folder, options)
+    else:
+        # One listing serves the plan and apply's name index
+        with planning.phase("plan"):
+            snapshot = scan_directory(folder, with_stat=options.include_date, metrics=metrics)
+            ops = iter_plan_for_entries(snapshot.entries, options, memory_budget=args.memory_budget, metrics=metrics)
+            if not args.no_reorder:
+                # Reordering needs the whole plan; keep it packed
+                ops = RenamePlan.from_operations(folder, ops)
+
+    logger = maybe_create_session_logger(args.log)
+
+    # v2 mappings are written while renaming (a .json path keeps v1, saved at the end)
+    writer = None
+    if not args.dry_run and args.mappings_out:
+        from mappings_io import MappingsWriter, default_version
+
+        if default_version(args.mappings_out) == 2:
+            writer = MappingsWriter(args.mappings_out, folder)
 
-    ops = build_rename_plan(folder, options)
+    journal = None
+    if args.journal and not args.dry_run:
+        from journal import RenameJournal
 
-    log_path: Optional[str] = maybe_create_log_path(args.log)
+        try:
+            journal = RenameJournal.create(args.journal, folder, _fsync_policy(args))
+        except FileExistsError:
+            _exit_with_errors([f"Journal {args.journal} exists: resume or roll back that run first, or delete it."])
 
     # Apply
-    result = apply_rename_plan(
-        folder,
-        ops,
-        log_file_path=log_path,
-        dry_run=bool(args.dry_run),
-    )
+    try:
+        if args.recursive:
+            from filesystem import apply_rename_tree
+
+            result = apply_rename_tree(
+                folder,
+                ops,
+                dry_run=bool(args.dry_run),
+                workers=args.workers,
+                logger=logger,
+                reorder=not args.no_reorder,
+                metrics=metrics,
+                mappings_writer=writer,
+            )
+            result.errors.extend(walk_errors)
+        else:
+            result = apply_rename_plan(
+                folder,
+                ops,
+                dry_run=bool(args.dry_run),
+                workers=args.workers,
+                logger=logger,
+                reorder=not args.no_reorder,
+                compact=True,
+                snapshot=snapshot,
+                metrics=metrics,
+                mappings_writer=writer,
+                journal=journal,
+            )
+    finally:
+        if journal is not None:
+            journal.close()
+        if writer is not None:
+            writer.close()
+        if logger is not None:
+            logger.close()
+    if metrics is None:
+        result.metrics.merge(planning)
 
     # Print summary
-    print(f"Planned: {len(ops)}")
+    print(f"Planned: {result.attempted}")
     print(f"Renamed: {len(result.renamed)}")
     print(f"Skipped: {len(result.skipped)}")
     print(f"Errors: {len(result.errors)}")
@@ -123,25 +219,101 @@ def cmd_rename(args: argparse.Namespace) -> int:
 
     # Save undo mappings only when real rename occurred
     if not args.dry_run and args.mappings_out:
-        _save_mappings(args.mappings_out, result.mappings)
+        if writer is None:
+            from mappings_io import save_mappings
+
+            with result.metrics.phase("mappings"):
+                save_mappings(args.mappings_out, result.mappings)
         print(f"\nUndo mappings saved to: {args.mappings_out}")
 
+    if args.stats:
+        print()
+        print(result.metrics.format())
+    if args.stats_json:
+        write_json(args.stats_json, "rename", result.metrics)
+    publish("rename", result.metrics)
+
     # Return non-zero if errors happened (useful for automation)
     return 1 if result.errors else 0
 
 
+def _fsync_policy(args: argparse.Namespace):
+    from journal import DEFAULT_FSYNC_POLICY, parse_fsync_policy
+
+    if args.fsync is None:
+        return DEFAULT_FSYNC_POLICY
+    try:
+        return parse_fsync_policy(args.fsync)
+    except ValueError as e:
+        _exit_with_errors([str(e)])
+
+
+def cmd_resume(args: argparse.Namespace) -> int:
+    from filesystem import journal_mappings, resume_rename_journal
+    from log_utils import maybe_create_session_logger
+
+    logger = maybe_create_session_logger(args.log)
+    try:
+        state, result = resume_rename_journal(args.journal, policy=_fsync_policy(args), logger=logger)
+    except (OSError, ValueError) as e:
+        _exit_with_errors([f"Cannot resume {args.journal}: {e}"])
+    finally:
+        if logger is not None:
+            logger.close()
+
+    print(f"Resumed: {result.attempted}")
+    print(f"Renamed: {len(result.renamed)}")
+    print(f"Skipped: {len(result.skipped)}")
+    print(f"Errors: {len(result.errors)}")
+    for e in result.errors:
+        print(f"  - {e}")
+
+    if args.mappings_out:
+        from mappings_io import save_mappings
+
+        # The whole run, including the renames made before the interruption
+        save_mappings(args.mappings_out, journal_mappings(state))
+        print(f"\nUndo mappings saved to: {args.mappings_out}")
+    return 1 if result.errors else 0
+
+
+def cmd_rollback(args: argparse.Namespace) -> int:
+    from filesystem import rollback_rename_journal
+
+    try:
+        errors = rollback_rename_journal(args.journal, policy=_fsync_policy(args))
+    except (OSError, ValueError) as e:
+        _exit_with_errors([f"Cannot roll back {args.journal}: {e}"])
+
+    if errors:
+        print("Rollback completed with errors:")
+        for e in errors:
+            print(f"  - {e}")
+        return 1
+
+    print("Rollback successful.")
+    return 0
+
+
 def cmd_undo(args: argparse.Namespace) -> int:
+    from filesystem import undo_renames
+    from mappings_io import open_mappings
+
     mappings_path = args.mappings
     try:
-        mappings = _load_mappings(mappings_path)
+        mappings = open_mappings(mappings_path)
     except Exception as e:
         _exit_with_errors([f"Failed to load mappings file: {e}"])
 
-    errors = undo_rename_mappings(mappings)
+    try:
+        # v2 files are read as a stream
+        result = undo_renames(mappings, workers=args.workers)
+    except ValueError as e:
+        _exit_with_errors([f"Failed to read mappings file: {e}"])
 
-    if errors:
-        print("Undo completed with errors:")
-        for e in errors:
+    if result.failed:
+        print(f"Undo completed with errors ({result.restored} restored):")
+        for e in result.errors:
             print(f"  - {e}")
         return 1
 
@@ -149,10 +321,54 @@ def cmd_undo(args: argparse.Namespace) -> int:
     return 0
 
 
+def cmd_batch(args: argparse.Namespace) -> int:
+    from batch import ManifestError, load_manifest, run_batch
+    from log_utils import maybe_create_session_logger
+
+    # Every row is checked before any folder is touched
+    try:
+        entries = load_manifest(args.manifest)
+    except OSError as e:
+        _exit_with_errors([f"Cannot read manifest: {e}"])
+    except ManifestError as e:
+        _exit_with_errors(e.messages)
+
+    def on_folder(done: int, total: int, result) -> None:
+        status = "ok" if not result.errors else f"{len(result.errors)} error(s)"
+        print(f"[{done}/{total}] {result.folder}: renamed {result.renamed}, skipped {len(result.skipped)}, {status}")
+
+    logger = maybe_create_session_logger(args.log)
+    try:
+        summary = run_batch(
+            entries,
+            jobs=args.jobs,
+            dry_run=bool(args.dry_run),
+            mappings_out=args.mappings_out,
+            results_out=args.results,
+            logger=logger,
+            on_folder=on_folder,
+        )
+    finally:
+        if logger is not None:
+            logger.close()
+
+    print()
+    print(f"Folders: {summary.folders} ({summary.failed} with errors)")
+    print(f"Planned: {summary.planned}")
+    print(f"Renamed: {summary.renamed}")
+    print(f"Skipped: {summary.skipped}")
+    print(f"Errors: {summary.errors}")
+    if args.results:
+        print(f"\nPer-folder results saved to: {args.results}")
+    if not args.dry_run and args.mappings_out:
+        print(f"Undo mappings saved to: {args.mappings_out}")
+    return 1 if summary.failed else 0
+
+
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(
         prog="relabeler",
-        description="Relabeler CLI - batch file renaming (preview/rename/undo).",
+        description="Relabeler CLI - batch file renaming (preview/rename/batch/undo/resume/rollback).",
     )
     sub = p.add_subparsers(dest="command", required=True)
 
@@ -163,6 +379,30 @@ def build_parser() -> argparse.ArgumentParser:
         sp.add_argument("--date", action="store_true", help="Append file timestamp date (YYYYMMDD).")
         sp.add_argument("--time", action="store_true", help="Append file timestamp time (HHMMSS). Requires --date.")
         sp.add_argument("--ext", default=None, help='Change extension, e.g. "jpg" or ".jpg".')
+        sp.add_argument(
+            "--memory-budget",
+            type=positive_int,
+            default=DEFAULT_MEMORY_BUDGET,
+            help="Files sorted in memory before spilling to a temp-dir merge sort.",
+        )
+        sp.add_argument(
+            "--plan-cache",
+            default=None,
+            help="Cache file reused between preview and rename while the folder is unchanged.",
+        )
+        sp.add_argument("--recursive", action="store_true", help="Also rename files in every subfolder.")
+        sp.add_argument(
+            "--counter",
+            choices=COUNTER_SCOPES,
+            default="directory",
+            help="With --recursive: restart numbering in each folder, or number across the whole tree.",
+        )
+        sp.add_argument(
+            "--walk-workers",
+            type=positive_int,
+            default=DEFAULT_WALK_WORKERS,
+            help=f"With --recursive: folders listed in parallel. Default: {DEFAULT_WALK_WORKERS}.",
+        )
 
     sp_preview = sub.add_parser("preview", help="Print rename preview (no changes).")
     add_common(sp_preview)
@@ -172,15 +412,87 @@ def build_parser() -> argparse.ArgumentParser:
     add_common(sp_rename)
     sp_rename.add_argument("--log", action="store_true", help="Write a log file in ./logs/")
     sp_rename.add_argument("--dry-run", action="store_true", help="Simulate (no filesystem changes).")
+    sp_rename.add_argument(
+        "--workers",
+        type=positive_int,
+        default=1,
+        help="Rename independent files on N threads (helps on network filesystems).",
+    )
+    sp_rename.add_argument(
+        "--no-reorder",
+        action="store_true",
+        help="Apply in plan order and skip occupied targets (streams the plan, lowest memory).",
+    )
     sp_rename.add_argument(
         "--mappings-out",
         default="undo_mappings.json",
-        help="Where to save undo mappings JSON (rename only).",
+        help="Where to save undo mappings (a .ndjson or .ndjson.gz path streams them while renaming).",
+    )
+    sp_rename.add_argument(
+        "--journal",
+        default=None,
+        metavar="PATH",
+        help="Write-ahead journal, so an interrupted run can be resumed or rolled back.",
+    )
+    sp_rename.add_argument(
+        "--fsync",
+        default=None,
+        metavar="POLICY",
+        help='Journal fsync batching: "op", every N renames (e.g. 1000) or a time window (default: 1s).',
+    )
+    sp_rename.add_argument("--stats", action="store_true", help="Print per-phase timings and counters.")
+    sp_rename.add_argument(
+        "--stats-json",
+        default=None,
+        metavar="PATH",
+        help='Write timings and counters as JSON ("-" for stdout).',
+    )
+    sp_rename.add_argument(
+        "--metrics-hook",
+        default=None,
+        metavar="MODULE:FUNCTION",
+        help="Call FUNCTION(kind, metrics_dict) with the run's metrics (e.g. to push them to monitoring).",
     )
     sp_rename.set_defaults(func=cmd_rename)
 
-    sp_undo = sub.add_parser("undo", help="Undo a previous rename using a mappings JSON file.")
-    sp_undo.add_argument("mappings", help="Path to mappings JSON produced by rename.")
+    sp_resume = sub.add_parser("resume", help="Finish a rename interrupted while writing a --journal.")
+    sp_resume.add_argument("journal", help="Journal of the interrupted run.")
+    sp_resume.add_argument("--fsync", default=None, metavar="POLICY", help="As for rename.")
+    sp_resume.add_argument("--log", action="store_true", help="Write a log file in ./logs/")
+    sp_resume.add_argument("--mappings-out", default=None, help="Save undo mappings for the whole run.")
+    sp_resume.set_defaults(func=cmd_resume)
+
+    sp_rollback = sub.add_parser("rollback", help="Revert every rename recorded in a --journal.")
+    sp_rollback.add_argument("journal", help="Journal of the run to revert.")
+    sp_rollback.add_argument("--fsync", default=None, metavar="POLICY", help="As for rename.")
+    sp_rollback.set_defaults(func=cmd_rollback)
+
+    sp_batch = sub.add_parser("batch", help="Rename many folders listed in a manifest (CSV or JSON lines).")
+    sp_batch.add_argument("manifest", help="One folder per row: folder, pattern, date, time, ext, recursive, counter.")
+    sp_batch.add_argument(
+        "--jobs",
+        type=positive_int,
+        default=1,
+        help="Folders renamed in parallel, on N processes. Default: 1.",
+    )
+    sp_batch.add_argument("--dry-run", action="store_true", help="Simulate (no filesystem changes).")
+    sp_batch.add_argument("--log", action="store_true", help="Write one log file for the whole batch in ./logs/")
+    sp_batch.add_argument(
+        "--mappings-out",
+        default="undo_mappings.ndjson",
+        help="Undo mappings of every folder in one file (one `undo` reverts the batch).",
+    )
+    sp_batch.add_argument("--results", default=None, metavar="PATH", help="Write one JSON line of results per folder.")
+    sp_batch.set_defaults(func=cmd_batch)
+
+    sp_undo = sub.add_parser("undo", help="Undo a previous rename using a mappings file.")
+    sp_undo.add_argument("mappings", help="Path to the mappings file produced by rename (v1 or v2).")
+    sp_undo.add_argument(
+        "--workers",
+        type=positive_int,
+        default=1,
+        help="Restore independent files on N threads (helps on network filesystems).",
+    )
     sp_undo.set_defaults(func=cmd_undo)
 
     return p
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Iterator, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from metrics import Metrics
+
+
+# scandir threads walk_tree uses by default (listing is I/O-bound, and
+# network filesystems answer many directories at once).
+DEFAULT_WALK_WORKERS = 8
+
+# Ordered walk_tree lists at most this many directories per worker ahead
+# of the one it yields next.
+_READ_AHEAD_PER_WORKER = 4
+
+
+class FileEntry(NamedTuple):
+    name: str
+    is_file: bool
+    size: Optional[int]     # None when the entry was not stat'ed
+    mtime: Optional[float]
+    ctime: Optional[float]
+    inode: int
+
+
+@dataclass
+class ScanSnapshot:
+    folder_path: str
+    entries: list[FileEntry] = field(default_factory=list)
+
+    def files(self) -> list[FileEntry]:
+        return [e for e in self.entries if e.is_file]
+
+    def names(self) -> set[str]:
+        return {e.name for e in self.entries}
+
+
+def iter_scan(folder_path: str, *, with_stat: bool = True, metrics: Optional[Metrics] = None) -> Iterator[FileEntry]:
+    """
+    Lists folder_path once with os.scandir, yielding one FileEntry per entry.
+
+    - Entry type comes from the DirEntry (no extra syscall on most platforms).
+    - with_stat=True stats each regular file once (size/mtime/ctime).
+    - with_stat=False leaves size/mtime/ctime as None (cheapest listing).
+    - Symlinks are followed, matching os.path.isfile / os.stat.
+    - metrics (a metrics.Metrics) gets the time spent listing ("list") and
+      stat'ing ("stat"), plus scandir/entry/stat counts.
+    """
+    if metrics is not None:
+        yield from _iter_scan_timed(folder_path, with_stat, metrics)
+        return
+
+    with os.scandir(folder_path) as it:
+        for entry in it:
+            try:
+                is_file = entry.is_file()
+            except OSError:
+                is_file = False
+
+            size = mtime = ctime = None
+            if with_stat and is_file:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    # Vanished or unreadable between listing and stat: treat as not a file
+                    is_file = False
+                else:
+                    size, mtime, ctime = st.st_size, st.st_mtime, st.st_ctime
+
+            yield FileEntry(entry.name, is_file, size, mtime, ctime, entry.inode())
+
+
+def _iter_scan_timed(folder_path: str, with_stat: bool, metrics: Metrics) -> Iterator[FileEntry]:
+    """
+    iter_scan with timers; kept apart so the plain scan pays nothing.
+    Time spent by the consumer between entries is not counted.
+    """
+    clock = time.perf_counter
+    entries = stats = 0
+    start = clock()
+    try:
+        with os.scandir(folder_path) as it:
+            metrics.count("scandir")
+            for entry in it:
+                try:
+                    is_file = entry.is_file()
+                except OSError:
+                    is_file = False
+
+                size = mtime = ctime = None
+                if with_stat and is_file:
+                    listed = clock()
+                    metrics.add_time("list", listed - start)
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        is_file = False
+                    else:
+                        size, mtime, ctime = st.st_size, st.st_mtime, st.st_ctime
+                    stats += 1
+                    start = clock()
+                    metrics.add_time("stat", start - listed)
+
+                entries += 1
+                item = FileEntry(entry.name, is_file, size, mtime, ctime, entry.inode())
+                metrics.add_time("list", clock() - start)
+                yield item
+                start = clock()
+        metrics.add_time("list", clock() - start)
+    finally:
+        metrics.count("entries", entries)
+        metrics.count("stat", stats)
+
+
+def scan_directory(folder_path: str, *, with_stat: bool = True, metrics: Optional[Metrics] = None) -> ScanSnapshot:
+    """
+    Returns a reusable in-memory snapshot of folder_path (see iter_scan).
+    """
+    entries = list(iter_scan(folder_path, with_stat=with_stat, metrics=metrics))
+    return ScanSnapshot(folder_path=folder_path, entries=entries)
+
+
+def _scan_dir(folder_path: str, with_stat: bool, metrics: Optional[Metrics]) -> tuple[list[FileEntry], list[str]]:
+    """
+    One directory's entries (as iter_scan lists them) and the names of its
+    subdirectories (symlinks to directories excluded).
+    """
+    entries: list[FileEntry] = []
+    subdirs: list[str] = []
+    stats = 0
+    with os.scandir(folder_path) as it:
+        for entry in it:
+            try:
+                is_file = entry.is_file()
+            except OSError:
+                is_file = False
+
+            size = mtime = ctime = None
+            if is_file:
+                if with_stat:
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        is_file = False
+                    else:
+                        size, mtime, ctime = st.st_size, st.st_mtime, st.st_ctime
+                    stats += 1
+            else:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                except OSError:
+                    pass
+
+            entries.append(FileEntry(entry.name, is_file, size, mtime, ctime, entry.inode()))
+    if metrics is not None:
+        metrics.count("scandir")
+        metrics.count("entries", len(entries))
+        metrics.count("stat", stats)
+    return entries, subdirs
+
+
+def walk_tree(
+    root: str,
+    *,
+    with_stat: bool = True,
+    workers: int = DEFAULT_WALK_WORKERS,
+    ordered: bool = False,
+    on_error: Optional[Callable[[str, OSError], None]] = None,
+    metrics: Optional[Metrics] = None,
+) -> Iterator[ScanSnapshot]:
+    """
+    Lists root and every directory below it, with scandir calls running on
+    a pool of worker threads, and yields one ScanSnapshot per directory as
+    soon as it is listed (a subdirectory is queued as soon as its parent
+    is listed).
+
+    - ordered=False yields directories as they finish; ordered=True yields
+      them in a fixed pre-order (a directory, then each subdirectory's tree
+      in case-insensitive name order) while the workers list the next few
+      directories ahead.
+    - Entries are as in iter_scan; symlinks to directories are listed but
+      not descended into (no loops).
+    - A directory that cannot be listed goes to on_error(path, error) and
+      is skipped; without on_error the error is raised. Any other error
+      in a listing is raised.
+    - metrics gets scandir/entry/stat counts and the time spent waiting for
+      listings ("list").
+    - Closing the generator early cancels the listings still queued.
+    """
+    import queue
+    import threading
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+    stopped = False
+    finished: queue.Queue = queue.Queue()   # (path, snapshot, error, children) when not ordered
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="relabeler-walk")
+
+    def list_dir(path: str) -> tuple:
+        try:
+            entries, subdirs = _scan_dir(path, with_stat, metrics)
+        except OSError as e:
+            return (path, None, e, [])
+        subdirs.sort(key=str.lower)
+        children = [os.path.join(path, name) for name in subdirs]
+        return (path, ScanSnapshot(folder_path=path, entries=entries), None, children)
+
+    def scan(path: str) -> None:
+        # Unordered: each worker queues its listing, then its children
+        if stopped:
+            return
+        try:
+            listed = list_dir(path)
+            finished.put(listed)   # before any child's, so the consumer counts the children first
+            for child in listed[3]:
+                if stopped:
+                    break
+                pool.submit(scan, child)
+        except BaseException as e:
+            finished.put((path, None, e, []))   # re-raised by the consumer, which would wait forever otherwise
+
+    lock = threading.Lock()
+    listing: dict[str, Future] = {}        # ordered: submitted listings not yet yielded
+    slots = [max(1, workers) * _READ_AHEAD_PER_WORKER]   # ordered: listings still allowed ahead
+
+    def scan_ordered(path: str) -> tuple:
+        listed = list_dir(path)
+        with lock:
+            for child in listed[3]:
+                if stopped or slots[0] <= 0:
+                    break
+                slots[0] -= 1
+                listing[child] = pool.submit(scan_ordered, child)
+        return listed
+
+    def wait(get: Callable[[], tuple]) -> tuple:
+        if metrics is None:
+            return get()
+        start = time.perf_counter()
+        listed = get()
+        metrics.add_time("list", time.perf_counter() - start)
+        return listed
+
+    def listings() -> Iterator[tuple]:
+        if not ordered:
+            pool.submit(scan, root)
+            remaining = 1
+            while remaining:
+                listed = wait(finished.get)
+                remaining += len(listed[3]) - 1
+                yield listed
+            return
+
+        # Ordered: workers list subdirectories ahead only while a slot is
+        # free (children found past that are listed once the consumer gets
+        # close), so the listings held stay bounded
+        pending = [root]                       # next directory last
+        while pending:
+            path = pending[-1]
+            with lock:
+                for ahead in pending[:-workers - 1:-1]:
+                    if ahead not in listing and (slots[0] > 0 or ahead == path):
+                        slots[0] -= 1
+                        listing[ahead] = pool.submit(scan_ordered, ahead)
+                future = listing[path]
+            listed = wait(future.result)
+            with lock:
+                del listing[path]
+                slots[0] += 1
+            pending.pop()
+            pending.extend(reversed(listed[3]))
+            yield listed
+
+    try:
+        for path, snapshot, error, children in listings():
+            if error is not None:
+                if on_error is None or not isinstance(error, OSError):
+                    raise error
+                on_error(path, error)
+                continue
+            yield snapshot
+    finally:
+        stopped = True
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+from typing import NamedTuple, Optional, Sequence
+
+from engine import RenameOperation
+
+
+# Prefix of the temporary names used to break rename cycles.
+TEMP_PREFIX = ".relabeler-tmp-"
+
+
+class RenameStep(NamedTuple):
+    op_index: int   # index of the plan operation this step belongs to
+    src: str
+    dst: str
+    kind: str       # "direct", "stage" (old -> temp) or "unstage" (temp -> new)
+
+
+def direct_steps(operations: Sequence[RenameOperation]) -> list[RenameStep]:
+    """
+    One step per operation, in plan order (no reordering).
+    """
+    return [RenameStep(i, op.old_name, op.new_name, "direct") for i, op in enumerate(operations)]
+
+
+def schedule_renames(
+    operations: Sequence[RenameOperation],
+    *,
+    temp_token: Optional[str] = None,
+) -> list[RenameStep]:
+    """
+    Orders a plan so that renames whose target is another operation's source
+    run after that source has moved away, in O(n).
+
+    Operations with a unique source and a unique target (and old != new)
+    form a graph where every node has at most one successor and one
+    predecessor, i.e. disjoint chains and cycles:
+
+    - chains run from their free end backwards (a->b, b->c runs b->c first);
+    - each cycle is broken with exactly one temporary name: its first op is
+      staged to a temp name, the rest of the cycle runs, then the staged
+      file moves to its final name.
+
+    Other operations (duplicate sources/targets, no-ops) keep their plan
+    position and are left for the executor's usual collision checks.
+    Unrelated operations keep their relative plan order.
+    """
+    n = len(operations)
+    token = temp_token or os.urandom(4).hex()
+
+    source_count: dict[str, int] = {}
+    target_count: dict[str, int] = {}
+    for op in operations:
+        source_count[op.old_name] = source_count.get(op.old_name, 0) + 1
+        target_count[op.new_name] = target_count.get(op.new_name, 0) + 1
+
+    by_source: dict[str, int] = {}
+    for i, op in enumerate(operations):
+        if (
+            op.old_name != op.new_name
+            and source_count[op.old_name] == 1
+            and target_count[op.new_name] == 1
+        ):
+            by_source[op.old_name] = i
+
+    def successor(i: int) -> Optional[int]:
+        # The operation that must vacate operations[i].new_name first
+        return by_source.get(operations[i].new_name)
+
+    steps: list[RenameStep] = []
+    state = bytearray(n)  # 0 = pending, 1 = on the current walk, 2 = scheduled
+
+    for start in range(n):
+        if state[start]:
+            continue
+        op = operations[start]
+        if by_source.get(op.old_name) != start:
+            state[start] = 2
+            steps.append(RenameStep(start, op.old_name, op.new_name, "direct"))
+            continue
+
+        path: list[int] = []
+        j: Optional[int] = start
+        while j is not None and state[j] == 0:
+            state[j] = 1
+            path.append(j)
+            j = successor(j)
+
+        if j is not None and state[j] == 1:
+            # Unique targets mean a cycle can only close on the walk's start
+            head = operations[path[0]]
+            temp_name = f"{TEMP_PREFIX}{token}-{path[0]}"
+            steps.append(RenameStep(path[0], head.old_name, temp_name, "stage"))
+            for k in reversed(path[1:]):
+                steps.append(RenameStep(k, operations[k].old_name, operations[k].new_name, "direct"))
+            steps.append(RenameStep(path[0], temp_name, head.new_name, "unstage"))
+        else:
+            for k in reversed(path):
+                steps.append(RenameStep(k, operations[k].old_name, operations[k].new_name, "direct"))
+
+        for k in path:
+            state[k] = 2
+
+    return steps
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+from batch import BatchEntry, ManifestError, load_manifest, run_batch, run_folder
+from engine import RenameOptions
+from filesystem import undo_rename_mappings
+from mappings_io import load_mappings
+
+
+def _create_files(folder, names):
+    folder.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (folder / name).write_text(name, encoding="utf-8")
+
+
+def test_load_manifest_reports_every_problem_before_running(tmp_path):
+    _create_files(tmp_path / "a", ["x.txt"])
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(
+        "folder,pattern,recursive\n"
+        f"{tmp_path},Root_##,yes\n"
+        f"{tmp_path / 'a'},A_##,\n"
+        f"{tmp_path / 'missing'},M_##,\n"
+        f"{tmp_path / 'a'},A_##,maybe\n",
+        encoding="utf-8",
+    )
+
+    with pytest.raises(ManifestError) as excinfo:
+        load_manifest(str(manifest))
+
+    messages = excinfo.value.messages
+    # Lines count from the header
+    assert any(m.startswith("line 4 (") and "does not exist" in m for m in messages)
+    assert "line 5: recursive must be a yes/no value, got 'maybe'" in messages
+    assert f"line 3: {tmp_path / 'a'} is inside recursive line 2" in messages
+    assert (tmp_path / "a" / "x.txt").exists()
+
+
+def test_run_batch_shards_folders_and_consolidates_outputs(tmp_path):
+    folders = [tmp_path / f"shoot{i}" for i in range(5)]
+    for folder in folders:
+        _create_files(folder, ["b.jpg", "a.jpg"])
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(
+        "".join(json.dumps({"folder": str(folder), "pattern": "P_##"}) + "\n" for folder in folders),
+        encoding="utf-8",
+    )
+    mappings_out = tmp_path / "undo.ndjson"
+    results_out = tmp_path / "results.jsonl"
+
+    summary = run_batch(
+        load_manifest(str(manifest)),
+        jobs=2,
+        mappings_out=str(mappings_out),
+        results_out=str(results_out),
+    )
+
+    assert (summary.folders, summary.failed, summary.renamed) == (5, 0, 10)
+    for folder in folders:
+        assert sorted(p.name for p in folder.iterdir()) == ["P_01.jpg", "P_02.jpg"]
+    results = [json.loads(line) for line in results_out.read_text(encoding="utf-8").splitlines()]
+    assert sorted(r["folder"] for r in results) == sorted(str(f) for f in folders)
+
+    assert undo_rename_mappings(load_mappings(str(mappings_out))) == []
+    for folder in folders:
+        assert (folder / "a.jpg").read_text(encoding="utf-8") == "a.jpg"
+
+
+def test_run_folder_lists_the_folder_once(tmp_path, monkeypatch):
+    _create_files(tmp_path, [f"IMG_{i:02d}.jpg" for i in range(20)])
+    calls = []
+    scandir = os.scandir
+
+    def counting(path="."):
+        calls.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting)
+    options = RenameOptions(pattern="P_##", include_date=False, include_time=False, change_extension=False, new_extension=None)
+    result = run_folder(BatchEntry(2, str(tmp_path), options))
+
+    assert (result.renamed, result.errors) == (20, [])
+    assert calls == [str(tmp_path)]
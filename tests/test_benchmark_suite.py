@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+import suite  # noqa: E402
+
+
+def test_suite_runs_every_phase_and_writes_json(tmp_path, capsys):
+    out = tmp_path / "results.json"
+    assert suite.main(["--sizes", "30", "--date", "--tmp", str(tmp_path), "--json", str(out)]) == 0
+
+    results = json.loads(out.read_text())["results"]
+    assert [r["phase"] for r in results] == list(suite.PHASES)
+    by_phase = {r["phase"]: r for r in results}
+    assert by_phase["apply"]["os_events"]["os.rename"] == 30
+    assert by_phase["apply_dry_run"]["os_events"].get("os.rename", 0) == 0
+    assert all(r["files_per_sec"] > 0 for r in results)
+
+    # Identical runs never count as a regression
+    assert suite.main(["--compare", str(out), str(out)]) == 0
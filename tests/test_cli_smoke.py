@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
 
 import pytest
@@ -95,3 +96,120 @@ def test_cli_validation_errors_return_nonzero(tmp_path, capsys):
 
     err = capsys.readouterr().err
     assert "Include Time requires Include Date" in err
+
+
+def test_cli_preview_then_rename_with_plan_cache(tmp_path, capsys):
+    folder = tmp_path / "in"
+    folder.mkdir()
+    _create_files(folder, ["b.txt", "a.txt"])
+    cache_file = tmp_path / "plans.cache"
+
+    assert main(["preview", str(folder), "--pattern", "C_##", "--plan-cache", str(cache_file)]) == 0
+    assert cache_file.exists()
+    assert "a.txt -> C_01.txt" in capsys.readouterr().out
+
+    code = main([
+        "rename", str(folder), "--pattern", "C_##",
+        "--plan-cache", str(cache_file),
+        "--mappings-out", str(tmp_path / "undo.json"),
+    ])
+    assert code == 0
+    assert sorted(p.name for p in folder.iterdir()) == ["C_01.txt", "C_02.txt"]
+
+
+def test_cli_rename_writes_stats_json(tmp_path, capsys):
+    folder = tmp_path / "in"
+    folder.mkdir()
+    _create_files(folder, ["b.txt", "a.txt"])
+    stats_file = tmp_path / "stats.json"
+
+    code = main([
+        "rename", str(folder), "--pattern", "S_##",
+        "--mappings-out", str(tmp_path / "undo.json"),
+        "--stats", "--stats-json", str(stats_file),
+    ])
+    assert code == 0
+    assert "Time:" in capsys.readouterr().out
+
+    stats = json.loads(stats_file.read_text(encoding="utf-8"))
+    assert stats["kind"] == "rename"
+    assert {"plan", "rename", "mappings"} <= set(stats["phases"])
+    assert stats["counters"]["renamed"] == 2
+
+
+def test_cli_rename_streams_v2_mappings_and_undo_reads_them(tmp_path, capsys):
+    folder = tmp_path / "in"
+    folder.mkdir()
+    _create_files(folder, ["b.txt", "a.txt"])
+    mappings_path = tmp_path / "undo.ndjson.gz"
+
+    assert main(["rename", str(folder), "--pattern", "V_##", "--mappings-out", str(mappings_path)]) == 0
+    assert mappings_path.read_bytes()[:2] == b"\x1f\x8b"
+
+    assert main(["undo", str(mappings_path)]) == 0
+    assert sorted(p.name for p in folder.iterdir()) == ["a.txt", "b.txt"]
+
+
+def test_cli_rename_with_journal_then_rollback(tmp_path, capsys):
+    folder = tmp_path / "in"
+    folder.mkdir()
+    _create_files(folder, ["b.txt", "a.txt"])
+    journal = tmp_path / "run.journal"
+
+    args = ["rename", str(folder), "--pattern", "J_##", "--mappings-out", "", "--journal", str(journal), "--fsync", "op"]
+    assert main(args) == 0
+    assert sorted(p.name for p in folder.iterdir()) == ["J_01.txt", "J_02.txt"]
+    with pytest.raises(SystemExit):
+        main(args)   # the journal of a previous run is never overwritten
+
+    with pytest.raises(SystemExit):
+        main(["resume", str(journal)])   # nothing left to resume
+    assert main(["rollback", str(journal)]) == 0
+    assert sorted(p.name for p in folder.iterdir()) == ["a.txt", "b.txt"]
+
+
+def test_cli_recursive_rename_and_undo(tmp_path, capsys):
+    folder = tmp_path / "tree"
+    (folder / "2023" / "trip").mkdir(parents=True)
+    _create_files(folder, ["b.txt"])
+    _create_files(folder / "2023", ["x.txt", "y.txt"])
+    _create_files(folder / "2023" / "trip", ["z.txt"])
+    mappings_path = tmp_path / "undo.ndjson"
+
+    assert main(["preview", str(folder), "--pattern", "F_##", "--recursive", "--counter", "global"]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "z.txt -> F_04.txt"
+
+    code = main([
+        "rename", str(folder), "--pattern", "F_##", "--recursive", "--walk-workers", "2",
+        "--mappings-out", str(mappings_path),
+    ])
+    assert code == 0
+    assert sorted(p.relative_to(folder).as_posix() for p in folder.rglob("*.txt")) == [
+        "2023/F_01.txt", "2023/F_02.txt", "2023/trip/F_01.txt", "F_01.txt",
+    ]
+
+    assert main(["undo", str(mappings_path)]) == 0
+    assert sorted(p.relative_to(folder).as_posix() for p in folder.rglob("*.txt")) == [
+        "2023/trip/z.txt", "2023/x.txt", "2023/y.txt", "b.txt",
+    ]
+
+
+@pytest.mark.parametrize("extra", [[], ["--no-reorder"], ["--date"]])
+def test_cli_rename_lists_the_folder_once(tmp_path, capsys, monkeypatch, extra):
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    _create_files(folder, [f"IMG_{i:03d}.jpg" for i in range(50)])
+    calls = []
+    scandir = os.scandir
+
+    def counting(path="."):
+        calls.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting)
+    code = main(["rename", str(folder), "--pattern", "File_##", "--mappings-out", str(tmp_path / "undo.json"), *extra])
+    monkeypatch.undo()
+
+    assert code == 0
+    assert calls == [str(folder)]
+    assert all(p.name.startswith("File_") for p in folder.iterdir())
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from columns import FolderPairColumn, NameColumn, PairColumn
+
+
+def test_name_column_round_trips_names():
+    names = ["a.txt", "", "héllo.jpg", "bad\udcff.bin"]
+    column = NameColumn(names)
+
+    assert len(column) == 4
+    assert list(column) == names
+    assert column[-1] == "bad\udcff.bin"
+    assert column[1:3] == ["", "héllo.jpg"]
+    with pytest.raises(IndexError):
+        column[4]
+
+
+def test_pair_column_compares_equal_to_list():
+    pairs = PairColumn([("a", "b")])
+    pairs.append(("c", "d"))
+
+    assert pairs == [("a", "b"), ("c", "d")]
+    assert pairs.copy() == [("a", "b"), ("c", "d")]
+    assert PairColumn() == []
+
+
+def test_folder_pair_column_stores_names_only(tmp_path):
+    folder = str(tmp_path)
+    column = FolderPairColumn(folder)
+    column.append((os.path.join(folder, "new.txt"), os.path.join(folder, "old.txt")))
+
+    assert column[0] == (os.path.join(folder, "new.txt"), os.path.join(folder, "old.txt"))
+    assert column.nbytes() < len(folder)  # folder prefix is not stored per row
+    with pytest.raises(ValueError):
+        column.append(("/elsewhere/new.txt", os.path.join(folder, "old.txt")))
+
+
+def test_name_column_search_finds_rows_without_crossing_names():
+    column = NameColumn(["IMG_1.jpg", "", "photo.JPG", "ab", "cd", "héllo.jpg"])
+
+    assert list(column.search("jpg")) == [0, 2, 5]
+    assert list(column.search("jpg", ignore_case=False)) == [0, 5]
+    assert list(column.search("bc")) == []        # "ab" + "cd" only touch in the buffer
+    assert list(column.search("héllo")) == [5]
+    assert list(column.search("")) == [0, 1, 2, 3, 4, 5]
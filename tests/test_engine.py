@@ -1,8 +1,9 @@
 import datetime
-from types import SimpleNamespace
+import os
 
 import engine
-from engine import build_rename_plan, RenameOptions
+import scanner
+from engine import build_rename_plan, iter_tree_plans, RenameOptions
 
 
 def _create_files(folder, names):
@@ -10,6 +11,15 @@ def _create_files(folder, names):
         (folder / name).write_text("x", encoding="utf-8")
 
 
+def _freeze_ctime(monkeypatch, fixed_ts):
+    # Patch the scanner seam used by the engine (never patch global os.stat)
+    def fake_scan(folder_path, **kwargs):
+        for e in scanner.iter_scan(folder_path, **kwargs):
+            yield e._replace(ctime=fixed_ts)
+
+    monkeypatch.setattr(engine, "iter_scan", fake_scan)
+
+
 def test_numbering_and_pattern_replacement(tmp_path):
     _create_files(tmp_path, ["a.txt", "b.txt", "c.txt"])
 
@@ -97,11 +107,7 @@ def test_include_date_appends_yyyymmdd(monkeypatch, tmp_path):
     fixed_dt = datetime.datetime(2026, 1, 5, 9, 8, 7)
     fixed_ts = fixed_dt.timestamp()
 
-    # Patch ONLY engine.os.stat (never patch global os.stat in tests on Py3.13)
-    def fake_stat(path, *args, **kwargs):
-        return SimpleNamespace(st_ctime=fixed_ts)
-
-    monkeypatch.setattr(engine.os, "stat", fake_stat)
+    _freeze_ctime(monkeypatch, fixed_ts)
 
     options = RenameOptions(
         pattern="File_#####",  # 5 digits
@@ -122,11 +128,7 @@ def test_include_date_and_time_appends_yyyymmdd_hhmmss(monkeypatch, tmp_path):
     fixed_dt = datetime.datetime(2026, 1, 5, 9, 8, 7)
     fixed_ts = fixed_dt.timestamp()
 
-    def fake_stat(path, *args, **kwargs):
-        return SimpleNamespace(st_ctime=fixed_ts)
-
-    # Patch ONLY engine.os.stat
-    monkeypatch.setattr(engine.os, "stat", fake_stat)
+    _freeze_ctime(monkeypatch, fixed_ts)
 
     options = RenameOptions(
         pattern="File_#####",  # 5 digits
@@ -159,3 +161,102 @@ def test_ignores_directories(tmp_path):
     # Only the file in root folder should be included
     assert [op.old_name for op in ops] == ["a.txt"]
     assert [op.new_name for op in ops] == ["X_00001.txt"]
+
+
+def test_rename_template_matches_counter_pattern():
+    options = RenameOptions(
+        pattern="IMG_###_edited",
+        include_date=False,
+        include_time=False,
+        change_extension=False,
+        new_extension=None,
+    )
+    template = engine.RenameTemplate(options)
+    entries = [scanner.FileEntry(n, True, None, None, None, 0) for n in ["a.png", "b"]]
+
+    names = template.render(range(9, 11), entries)
+
+    assert names == ["IMG_009_edited.png", "IMG_010_edited"]
+    assert names[0] == engine._apply_counter_pattern("IMG_###_edited", 9) + ".png"
+
+
+def test_rename_template_memoizes_date_per_second():
+    options = RenameOptions(
+        pattern="P_##",
+        include_date=True,
+        include_time=True,
+        change_extension=True,
+        new_extension="jpg",
+    )
+    template = engine.RenameTemplate(options)
+    ts = datetime.datetime(2026, 1, 5, 9, 8, 7).timestamp()
+    entries = [
+        scanner.FileEntry("a.png", True, 1, ts, ts + 0.25, 0),
+        scanner.FileEntry("b.png", True, 1, ts, ts + 0.75, 0),
+    ]
+
+    names = template.render(range(1, 3), entries)
+
+    assert names == ["P_01_20260105_090807.jpg", "P_02_20260105_090807.jpg"]
+    assert len(template._date_cache) == 1
+
+
+def test_extension_helper_matches_splitext():
+    for name in ["a.txt", "archive.tar.gz", ".bashrc", "..a", "a.", "noext", ".a.b"]:
+        assert engine._extension(name) == os.path.splitext(name)[1]
+
+
+def test_iter_rename_plan_with_spill_matches_build(tmp_path):
+    _create_files(tmp_path, [f"{c}{i}.txt" for i in range(12) for c in "bAc"])
+
+    options = RenameOptions(
+        pattern="F_###",
+        include_date=False,
+        include_time=False,
+        change_extension=False,
+        new_extension=None,
+    )
+
+    streamed = list(engine.iter_rename_plan(str(tmp_path), options, memory_budget=5))
+
+    assert streamed == build_rename_plan(str(tmp_path), options)
+    assert [op.new_name for op in streamed][:2] == ["F_001.txt", "F_002.txt"]
+
+
+def test_build_compact_plan_iterates_like_operations(tmp_path):
+    _create_files(tmp_path, ["b.txt", "A.txt"])
+
+    options = RenameOptions(
+        pattern="X_##",
+        include_date=False,
+        include_time=False,
+        change_extension=False,
+        new_extension=None,
+    )
+
+    plan = engine.build_compact_plan(str(tmp_path), options)
+
+    assert len(plan) == 2
+    assert plan.folder_path == str(tmp_path)
+    assert list(plan) == build_rename_plan(str(tmp_path), options)
+    assert plan[1].old_name == "b.txt" and plan[1].new_name == "X_02.txt"
+
+
+def test_iter_tree_plans_numbers_per_directory_or_across_the_tree(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "empty").mkdir()
+    _create_files(tmp_path, ["b.txt", "a.txt"])
+    _create_files(tmp_path / "sub", ["c.txt"])
+    options = RenameOptions(pattern="F_##", include_date=False, include_time=False, change_extension=False, new_extension=None)
+
+    def plans(counter):
+        return {
+            os.path.relpath(plan.folder_path, tmp_path): [(op.old_name, op.new_name) for op in plan]
+            for plan, _snapshot in iter_tree_plans(str(tmp_path), options, counter=counter)
+        }
+
+    assert plans("directory") == {
+        ".": [("a.txt", "F_01.txt"), ("b.txt", "F_02.txt")],
+        "sub": [("c.txt", "F_01.txt")],
+    }
+    assert plans("global")["sub"] == [("c.txt", "F_03.txt")]
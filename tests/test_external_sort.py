@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+import external_sort
+from external_sort import sorted_stream
+
+
+def test_sorted_stream_in_memory_matches_sorted():
+    items = ["b", "A", "c", "a"]
+    out = list(sorted_stream(items, key=str.lower, memory_budget=100))
+    assert out == sorted(items, key=str.lower)
+
+
+def test_sorted_stream_spills_and_stays_stable(tmp_path):
+    # Many ties on the key: order within ties must follow the input order
+    items = [f"{'aBb'[i % 3]}_{i:03d}" for i in range(250)]
+    key = lambda s: s[0].lower()
+
+    out = list(sorted_stream(items, key=key, memory_budget=7, spill_dir=str(tmp_path)))
+
+    assert out == sorted(items, key=key)
+    # Spill directory is cleaned up once the stream is exhausted
+    assert os.listdir(tmp_path) == []
+
+
+def test_sorted_stream_cleans_up_when_closed_early(tmp_path):
+    stream = sorted_stream(range(50), key=lambda n: -n, memory_budget=5, spill_dir=str(tmp_path))
+    assert next(stream) == 49
+    stream.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_sorted_stream_rejects_empty_budget():
+    with pytest.raises(ValueError):
+        list(sorted_stream([1], key=int, memory_budget=0))
+
+
+def test_sorted_stream_merges_many_runs_in_passes(tmp_path, monkeypatch):
+    monkeypatch.setattr(external_sort, "_MERGE_FANIN", 3)
+    read_run = external_sort._read_run
+    open_runs = [0, 0]   # now, most at once
+
+    def counted(path):
+        open_runs[0] += 1
+        open_runs[1] = max(open_runs[1], open_runs[0])
+        try:
+            yield from read_run(path)
+        finally:
+            open_runs[0] -= 1
+
+    monkeypatch.setattr(external_sort, "_read_run", counted)
+    items = [f"{'aBb'[i % 3]}_{i:03d}" for i in range(250)]
+    key = lambda s: s[0].lower()
+
+    out = list(sorted_stream(items, key=key, memory_budget=7, spill_dir=str(tmp_path)))
+
+    assert out == sorted(items, key=key)
+    assert open_runs[1] <= 3
+    assert os.listdir(tmp_path) == []
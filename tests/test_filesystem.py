@@ -1,7 +1,10 @@
 import os
 
-from engine import RenameOperation
-from filesystem import apply_rename_plan, undo_rename_mappings
+import pytest
+
+from engine import RenameOperation, RenamePlan
+from filesystem import UndoItem, apply_rename_plan, dir_fd_supported, undo_rename_mappings, undo_renames
+from scanner import scan_directory
 
 
 def _create_file(path, text="x"):
@@ -66,3 +69,300 @@ def test_undo_rename_mappings_restores_originals(tmp_path):
     assert (tmp_path / "b.txt").exists()
     assert not (tmp_path / "X_1.txt").exists()
     assert not (tmp_path / "X_2.txt").exists()
+
+
+def test_apply_rename_plan_consumes_a_stream(tmp_path):
+    _create_file(tmp_path / "a.txt")
+    _create_file(tmp_path / "b.txt")
+
+    ops = (
+        RenameOperation(old_name=name, new_name=f"S_{i}.txt")
+        for i, name in enumerate(["a.txt", "b.txt"], start=1)
+    )
+
+    result = apply_rename_plan(str(tmp_path), ops)
+
+    assert result.errors == []
+    assert result.attempted == 2
+    assert (tmp_path / "S_1.txt").exists()
+    assert (tmp_path / "S_2.txt").exists()
+
+
+def test_apply_compact_plan_returns_compact_result(tmp_path):
+    _create_file(tmp_path / "a.txt")
+
+    plan = RenamePlan.from_operations(str(tmp_path), [RenameOperation("a.txt", "C_1.txt")])
+
+    result = apply_rename_plan(str(tmp_path), plan, compact=True)
+
+    assert result.renamed == [("a.txt", "C_1.txt")]
+    assert result.mappings == [(str(tmp_path / "C_1.txt"), str(tmp_path / "a.txt"))]
+
+    assert undo_rename_mappings(result.mappings) == []
+    assert (tmp_path / "a.txt").exists()
+
+
+def test_apply_rename_plan_parallel_matches_serial(tmp_path):
+    serial_dir = tmp_path / "serial"
+    parallel_dir = tmp_path / "parallel"
+    ops = [RenameOperation(old_name=f"f{i}.txt", new_name=f"P_{i:03d}.txt") for i in range(40)]
+    # Chain: b -> c must run after c -> d vacates c; x -> c competes for the same target
+    ops += [
+        RenameOperation(old_name="c.txt", new_name="d.txt"),
+        RenameOperation(old_name="b.txt", new_name="c.txt"),
+        RenameOperation(old_name="x.txt", new_name="c.txt"),
+        RenameOperation(old_name="missing.txt", new_name="m.txt"),
+        RenameOperation(old_name="s1.txt", new_name="s2.txt"),
+        RenameOperation(old_name="s2.txt", new_name="s1.txt"),
+    ]
+
+    results = []
+    for folder, workers in ((serial_dir, 1), (parallel_dir, 8)):
+        folder.mkdir()
+        for name in [f"f{i}.txt" for i in range(40)] + ["b.txt", "c.txt", "x.txt", "s1.txt", "s2.txt"]:
+            _create_file(folder / name, name)
+        results.append(apply_rename_plan(str(folder), ops, workers=workers))
+
+    serial, parallel = results
+    assert parallel.renamed == serial.renamed
+    assert parallel.skipped == serial.skipped == ["c.txt"]
+    assert parallel.errors == serial.errors
+    assert sorted(os.listdir(parallel_dir)) == sorted(os.listdir(serial_dir))
+    assert (parallel_dir / "c.txt").read_text(encoding="utf-8") == "b.txt"
+    assert (parallel_dir / "s1.txt").read_text(encoding="utf-8") == "s2.txt"
+
+
+def test_apply_rename_plan_renumbers_existing_sequence_in_one_pass(tmp_path):
+    # Re-running a pattern over already-numbered files: swap plus a chain
+    for name in ["File_01.txt", "File_02.txt", "File_03.txt", "File_04.txt"]:
+        _create_file(tmp_path / name, name)
+
+    ops = [
+        RenameOperation(old_name="File_02.txt", new_name="File_01.txt"),
+        RenameOperation(old_name="File_01.txt", new_name="File_02.txt"),
+        RenameOperation(old_name="File_03.txt", new_name="File_04.txt"),
+        RenameOperation(old_name="File_04.txt", new_name="File_05.txt"),
+    ]
+
+    dry = apply_rename_plan(str(tmp_path), ops, dry_run=True)
+    assert dry.skipped == [] and dry.errors == []
+
+    result = apply_rename_plan(str(tmp_path), ops)
+
+    assert result.skipped == [] and result.errors == []
+    assert len(result.renamed) == 4
+    assert (tmp_path / "File_01.txt").read_text(encoding="utf-8") == "File_02.txt"
+    assert (tmp_path / "File_02.txt").read_text(encoding="utf-8") == "File_01.txt"
+    assert (tmp_path / "File_05.txt").read_text(encoding="utf-8") == "File_04.txt"
+    assert sorted(os.listdir(tmp_path)) == ["File_01.txt", "File_02.txt", "File_04.txt", "File_05.txt"]
+
+    # Step mappings replay backwards to the original state
+    assert undo_rename_mappings(result.mappings) == []
+    for name in ["File_01.txt", "File_02.txt", "File_03.txt", "File_04.txt"]:
+        assert (tmp_path / name).read_text(encoding="utf-8") == name
+
+
+def test_apply_rename_plan_without_reorder_skips_occupied_targets(tmp_path):
+    _create_file(tmp_path / "File_01.txt")
+    _create_file(tmp_path / "File_02.txt")
+
+    ops = [
+        RenameOperation(old_name="File_02.txt", new_name="File_01.txt"),
+        RenameOperation(old_name="File_01.txt", new_name="File_02.txt"),
+    ]
+
+    result = apply_rename_plan(str(tmp_path), iter(ops), reorder=False)
+
+    assert result.skipped == ["File_01.txt", "File_02.txt"]
+
+
+def test_compact_result_keeps_temporary_steps_for_undo(tmp_path):
+    _create_file(tmp_path / "a.txt", "a")
+    _create_file(tmp_path / "b.txt", "b")
+
+    plan = RenamePlan.from_operations(
+        str(tmp_path),
+        [RenameOperation("a.txt", "b.txt"), RenameOperation("b.txt", "a.txt")],
+    )
+
+    result = apply_rename_plan(str(tmp_path), plan, compact=True)
+
+    assert result.renamed == [("a.txt", "b.txt"), ("b.txt", "a.txt")]
+    assert len(result.mappings) == 3
+    assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "b"
+
+    assert undo_rename_mappings(result.mappings) == []
+    assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "a"
+
+
+@pytest.mark.skipif(not dir_fd_supported(), reason="needs dir_fd support for os.rename/os.stat")
+def test_dir_fd_renames_survive_folder_move(tmp_path):
+    folder = tmp_path / "incoming"
+    folder.mkdir()
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        _create_file(folder / name)
+
+    ops = [RenameOperation(old_name=n, new_name=f"D_{n}") for n in ["a.txt", "b.txt", "c.txt"]]
+
+    def move_folder_once(current, total, op):
+        if current == 1:
+            os.rename(folder, tmp_path / "moved")
+
+    result = apply_rename_plan(str(folder), ops, on_progress=move_folder_once, use_dir_fd=True)
+
+    assert result.errors == []
+    assert sorted(os.listdir(tmp_path / "moved")) == ["D_a.txt", "D_b.txt", "D_c.txt"]
+
+
+def test_path_mode_and_undo_without_dir_fd(tmp_path):
+    _create_file(tmp_path / "a.txt")
+
+    result = apply_rename_plan(str(tmp_path), [RenameOperation("a.txt", "P.txt")], use_dir_fd=False)
+    assert (tmp_path / "P.txt").exists()
+
+    assert undo_rename_mappings(result.mappings, use_dir_fd=False) == []
+    assert (tmp_path / "a.txt").exists()
+
+
+def test_name_index_avoids_per_op_stat_calls(tmp_path, monkeypatch):
+    ops = []
+    for i in range(50):
+        _create_file(tmp_path / f"{i}.txt")
+        ops.append(RenameOperation(old_name=f"{i}.txt", new_name=f"N_{i}.txt"))
+    _create_file(tmp_path / "N_7.txt")  # collision still detected from the index
+
+    calls = []
+    real_stat = os.stat  # os.path.exists goes through os.stat too
+    monkeypatch.setattr(os, "stat", lambda *a, **k: calls.append(a) or real_stat(*a, **k))
+
+    result = apply_rename_plan(str(tmp_path), ops)
+
+    monkeypatch.undo()
+    assert result.skipped == ["N_7.txt"]
+    assert len(result.renamed) == 49
+    assert len(calls) <= 1  # at most the case-sensitivity probe
+
+
+def test_stale_snapshot_falls_back_to_rename_errors(tmp_path):
+    _create_file(tmp_path / "a.txt")
+    _create_file(tmp_path / "b.txt")
+    snapshot = scan_directory(str(tmp_path))
+    os.remove(tmp_path / "b.txt")  # gone after the snapshot was taken
+
+    ops = [RenameOperation("a.txt", "A1.txt"), RenameOperation("b.txt", "B1.txt")]
+
+    result = apply_rename_plan(str(tmp_path), ops, snapshot=snapshot)
+
+    assert result.renamed == [("a.txt", "A1.txt")]
+    assert result.errors == ["Missing source file: b.txt"]
+
+
+@pytest.mark.parametrize("use_dir_fd", [False, True] if dir_fd_supported() else [False])
+def test_target_created_after_the_scan_is_never_replaced(tmp_path, use_dir_fd):
+    _create_file(tmp_path / "a.txt", "a")
+    snapshot = scan_directory(str(tmp_path))
+    _create_file(tmp_path / "b.txt", "created later")
+
+    result = apply_rename_plan(
+        str(tmp_path), [RenameOperation("a.txt", "b.txt")], snapshot=snapshot, use_dir_fd=use_dir_fd
+    )
+
+    assert result.renamed == [] and result.skipped == ["b.txt"]
+    assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "a"
+    assert (tmp_path / "b.txt").read_text(encoding="utf-8") == "created later"
+
+
+def test_undo_renames_restores_rotations_on_workers(tmp_path):
+    names = [f"File_{i:02d}.txt" for i in range(1, 31)]
+    for name in names:
+        _create_file(tmp_path / name, name)
+    # Ten independent 3-cycles: every original name is held by another renamed file
+    ops = [
+        RenameOperation(names[i], names[i - i % 3 + (i + 1) % 3])
+        for i in range(len(names))
+    ]
+    result = apply_rename_plan(str(tmp_path), ops, workers=4)
+    assert result.errors == [] and result.skipped == []
+
+    undo = undo_renames(result.mappings, workers=4)
+
+    assert undo.failed == []
+    assert undo.restored == undo.attempted == 30
+    for name in names:
+        assert (tmp_path / name).read_text(encoding="utf-8") == name
+
+
+def test_undo_renames_collapses_chains_and_never_overwrites(tmp_path):
+    _create_file(tmp_path / "c.txt", "c")
+    _create_file(tmp_path / "d.txt", "d")
+    mappings = [
+        (str(tmp_path / "b.txt"), str(tmp_path / "a.txt")),   # a -> b
+        (str(tmp_path / "c.txt"), str(tmp_path / "b.txt")),   # b -> c
+        (str(tmp_path / "d.txt"), str(tmp_path / "x.txt")),   # x -> d
+    ]
+    _create_file(tmp_path / "x.txt", "new file")  # created after the rename
+
+    undo = undo_renames(mappings)
+
+    assert undo.restored == 1
+    assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "c"
+    assert undo.failed == [UndoItem(str(tmp_path / "d.txt"), str(tmp_path / "x.txt"), "skipped")]
+    assert undo.errors == ["Cannot restore d.txt: x.txt already exists"]
+    assert (tmp_path / "x.txt").read_text(encoding="utf-8") == "new file"
+    assert (tmp_path / "d.txt").read_text(encoding="utf-8") == "d"
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_cancel_stops_between_operations_and_undo_resumes(tmp_path, workers):
+    import threading
+
+    names = [f"File_{i:02d}.txt" for i in range(1, 31)]
+    for name in names:
+        _create_file(tmp_path / name, name)
+    ops = [RenameOperation(names[i], names[i - i % 3 + (i + 1) % 3]) for i in range(len(names))]
+    cancel = threading.Event()
+
+    def on_progress(current, total, op):
+        if current == 4:
+            cancel.set()
+
+    result = apply_rename_plan(str(tmp_path), ops, workers=workers, on_progress=on_progress, cancel=cancel)
+
+    assert result.cancelled and result.errors == []
+    assert 4 <= result.attempted < len(ops)
+    # No file was left at a temporary name: every file is where the plan or the original put it
+    assert sorted(os.listdir(tmp_path)) == names
+
+    cancel.set()
+    undo = undo_renames(result.mappings, cancel=cancel)
+    assert undo.cancelled and undo.restored == 0 and undo.errors == []
+    assert undo.failed and {item.status for item in undo.failed} == {"cancelled"}
+
+    undo = undo_renames(undo.remaining)
+    assert not undo.cancelled and undo.failed == []
+    for name in names:
+        assert (tmp_path / name).read_text(encoding="utf-8") == name
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_mappings_writer_gets_each_scheduled_rename_as_it_happens(tmp_path, workers):
+    from mappings_io import MappingsWriter, load_mappings
+
+    names = [f"File_{i:02d}.txt" for i in range(1, 13)]
+    for name in names:
+        _create_file(tmp_path / name, name)
+    ops = [RenameOperation(names[i], names[i - i % 3 + (i + 1) % 3]) for i in range(len(names))]
+    out = str(tmp_path.parent / f"undo-{workers}.ndjson")
+    seen = []
+
+    with MappingsWriter(out, str(tmp_path)) as writer:
+        def on_progress(current, total, op):
+            seen.append(len(writer))
+
+        apply_rename_plan(str(tmp_path), ops, workers=workers, mappings_writer=writer, on_progress=on_progress)
+
+    assert seen[0] > 0   # rows were appended before the run ended
+    undo = undo_renames(load_mappings(out))
+    assert undo.failed == []
+    for name in names:
+        assert (tmp_path / name).read_text(encoding="utf-8") == name
@@ -1,5 +1,8 @@
-from engine import RenameOperation
-from filesystem import apply_rename_plan
+import zipfile
+
+from engine import RenameOperation, RenameOptions
+from filesystem import Progress, apply_rename_plan, undo_renames
+from zip_service import ZipJob, run_zip_job
 
 
 def _create_file(path, text="x"):
@@ -26,3 +29,83 @@ def test_progress_callback_called_for_each_operation(tmp_path):
     assert len(calls) == 2
     assert calls[0][0] == 1 and calls[0][1] == 2
     assert calls[1][0] == 2 and calls[1][1] == 2
+
+
+def test_progress_callback_counts_up_with_workers(tmp_path):
+    ops = []
+    for i in range(20):
+        _create_file(tmp_path / f"{i}.txt")
+        ops.append(RenameOperation(old_name=f"{i}.txt", new_name=f"X_{i}.txt"))
+
+    calls = []
+
+    def on_progress(current, total, op):
+        calls.append((current, total))
+
+    result = apply_rename_plan(str(tmp_path), ops, on_progress=on_progress, workers=4)
+
+    assert result.errors == []
+    assert calls == [(i, 20) for i in range(1, 21)]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_progress_batches_events_by_count_and_reports_the_last_item(tmp_path):
+    ops = []
+    for i in range(25):
+        _create_file(tmp_path / f"{i:02d}.txt")
+        ops.append(RenameOperation(old_name=f"{i:02d}.txt", new_name=f"X_{i:02d}.txt"))
+    events = []
+
+    result = apply_rename_plan(str(tmp_path), ops, progress=Progress(events.append, every=10), workers=4)
+
+    assert result.errors == []
+    assert [(e.done, e.total, e.batch) for e in events] == [(10, 25, 10), (20, 25, 10), (25, 25, 5)]
+    assert events[-1].eta == 0
+
+    events.clear()
+    undo = undo_renames(result.mappings, progress=Progress(events.append, every=10))
+    assert undo.restored == 25
+    assert [e.done for e in events] == [10, 20, 25]
+
+
+def test_progress_batches_events_by_time_with_rate_and_eta():
+    clock = _Clock()
+    events = []
+    progress = Progress(events.append, interval=1.0, clock=clock)
+    progress.expect(100)
+
+    for i in range(40):
+        clock.now += 0.125        # 8 items per second
+        progress.advance(1, f"f{i}", nbytes=5)
+
+    assert [e.done for e in events] == [8, 16, 24, 32, 40]
+    last = events[-1]
+    assert last.bytes_done == 200 and last.name == "f39"
+    assert last.files_per_sec == 8.0 and last.eta == 7.5
+
+    progress.advance(1, "f40")
+    progress.flush()
+    assert events[-1].done == 41 and events[-1].batch == 1
+
+
+def test_zip_job_reports_members_and_bytes(tmp_path):
+    zip_in = tmp_path / "in.zip"
+    with zipfile.ZipFile(zip_in, "w") as z:
+        for i in range(5):
+            z.writestr(f"IMG_{i}.jpg", "x" * 10)
+    events = []
+    options = RenameOptions(
+        pattern="File_##", include_date=False, include_time=False, change_extension=False, new_extension=None
+    )
+
+    run_zip_job(ZipJob(str(zip_in), str(tmp_path / "out.zip"), options), progress=Progress(events.append, every=2))
+
+    assert [e.done for e in events] == [2, 4, 5]
+    assert events[-1].bytes_done == 50 and events[-1].name.startswith("File_")
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+import filesystem
+from engine import RenameOperation
+from filesystem import apply_rename_plan, resume_rename_journal, rollback_rename_journal
+from journal import FsyncPolicy, RenameJournal, parse_fsync_policy, read_journal
+
+
+def _make_files(folder, names):
+    for name in names:
+        (folder / name).write_text(name, encoding="utf-8")
+
+
+def _contents(folder):
+    return {p.name: p.read_text(encoding="utf-8") for p in folder.iterdir()}
+
+
+def _interrupted_run(tmp_path, monkeypatch, ops, renames_before_crash):
+    """
+    Applies ops with a journal and "kills" the process on the given rename.
+    """
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    _make_files(folder, sorted({op.old_name for op in ops}))
+    journal_path = str(tmp_path / "run.journal")
+
+    real_rename = filesystem._rename_noreplace
+    calls = []
+
+    def crashing_rename(*args, **kwargs):
+        if len(calls) == renames_before_crash:
+            raise KeyboardInterrupt
+        calls.append(args)
+        return real_rename(*args, **kwargs)
+
+    monkeypatch.setattr(filesystem, "_rename_noreplace", crashing_rename)
+    with RenameJournal.create(journal_path, str(folder), FsyncPolicy(every_ops=2)) as journal:
+        with pytest.raises(KeyboardInterrupt):
+            apply_rename_plan(str(folder), ops, journal=journal, use_dir_fd=False)
+    monkeypatch.setattr(filesystem, "_rename_noreplace", real_rename)
+    return folder, journal_path
+
+
+def test_interrupted_run_resumes_then_rolls_back(tmp_path, monkeypatch):
+    # A cycle (staged through a temporary name) plus a plain rename
+    ops = [
+        RenameOperation("a.txt", "b.txt"),
+        RenameOperation("b.txt", "a.txt"),
+        RenameOperation("c.txt", "C_01.txt"),
+    ]
+    folder, journal_path = _interrupted_run(tmp_path, monkeypatch, ops, renames_before_crash=2)
+    state = read_journal(journal_path)
+    assert state.began and not state.finished and len(state.renames) == 2
+
+    state, result = resume_rename_journal(journal_path, use_dir_fd=False)
+    assert result.errors == []
+    assert _contents(folder) == {"a.txt": "b.txt", "b.txt": "a.txt", "C_01.txt": "c.txt"}
+    with pytest.raises(ValueError):
+        resume_rename_journal(journal_path)
+
+    assert rollback_rename_journal(journal_path) == []
+    assert _contents(folder) == {"a.txt": "a.txt", "b.txt": "b.txt", "c.txt": "c.txt"}
+    assert rollback_rename_journal(journal_path) == []   # already rolled back
+
+
+def test_lost_step_records_are_resolved_from_the_folder(tmp_path, monkeypatch):
+    # A chain runs from its free end: c->d, b->c, then a->b
+    ops = [RenameOperation("a.txt", "b.txt"), RenameOperation("b.txt", "c.txt"), RenameOperation("c.txt", "d.txt")]
+    folder, journal_path = _interrupted_run(tmp_path, monkeypatch, ops, renames_before_crash=2)
+
+    # Power loss: the step records after the last fsync never reached the disk
+    with open(journal_path, "rb") as f:
+        lines = f.read().splitlines(keepends=True)
+    with open(journal_path, "wb") as f:
+        f.writelines(line for line in lines if not line.startswith((b'["R"', b'["N"')))
+    assert read_journal(journal_path).renames == []
+
+    assert rollback_rename_journal(journal_path) == []
+    assert _contents(folder) == {"a.txt": "a.txt", "b.txt": "b.txt", "c.txt": "c.txt"}
+
+
+def test_lost_records_only_trust_the_journaled_inodes(tmp_path, monkeypatch):
+    ops = [RenameOperation("a.txt", "b.txt"), RenameOperation("b.txt", "c.txt"), RenameOperation("c.txt", "d.txt")]
+    folder, journal_path = _interrupted_run(tmp_path, monkeypatch, ops, renames_before_crash=1)
+    with open(journal_path, "rb") as f:
+        lines = f.read().splitlines(keepends=True)
+    with open(journal_path, "wb") as f:
+        f.writelines(line for line in lines if not line.startswith((b'["R"', b'["N"')))
+    # a->b never ran, but now "looks" done: its source is gone and b.txt exists
+    (folder / "a.txt").unlink()
+
+    assert rollback_rename_journal(journal_path) == []
+    assert _contents(folder) == {"b.txt": "b.txt", "c.txt": "c.txt"}   # b.txt was not moved to a.txt
+
+
+def test_rollback_skips_recorded_renames_whose_file_was_replaced(tmp_path, monkeypatch):
+    ops = [RenameOperation(f"{c}.txt", f"{c.upper()}_1.txt") for c in "abc"]
+    folder, journal_path = _interrupted_run(tmp_path, monkeypatch, ops, renames_before_crash=2)
+    assert len(read_journal(journal_path).renames) == 2
+    # After the crash the user replaces one renamed file with a new one
+    (tmp_path / "new.txt").write_text("new", encoding="utf-8")
+    os.replace(tmp_path / "new.txt", folder / "A_1.txt")
+
+    errors = rollback_rename_journal(journal_path)
+
+    assert errors == ["Cannot roll back A_1.txt: it was replaced after the run; left as is"]
+    assert _contents(folder) == {"A_1.txt": "new", "b.txt": "b.txt", "c.txt": "c.txt"}
+
+
+def test_journal_takes_inodes_from_the_scan(tmp_path, monkeypatch):
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    _make_files(folder, ["a.txt", "b.txt", "c.txt"])
+    expected = {name: os.lstat(folder / name).st_ino for name in ["a.txt", "b.txt", "c.txt"]}
+    ops = [RenameOperation("a.txt", "b.txt"), RenameOperation("b.txt", "a.txt"), RenameOperation("c.txt", "d.txt")]
+
+    def no_lstat(*args):
+        raise AssertionError("stat per step")
+
+    monkeypatch.setattr(filesystem, "_inode", no_lstat)
+    with RenameJournal.create(str(tmp_path / "run.journal"), str(folder)) as journal:
+        apply_rename_plan(str(folder), ops, journal=journal)
+
+    state = read_journal(str(tmp_path / "run.journal"))
+    for step, inode in zip(state.steps, state.inodes):
+        original = ops[step.op_index].old_name
+        assert inode == expected[original]
+
+
+def test_journal_folder_is_absolute_and_must_exist(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ops = [RenameOperation("a.txt", "b.txt"), RenameOperation("b.txt", "a.txt")]
+    (tmp_path / "d").mkdir()
+    _make_files(tmp_path / "d", ["a.txt", "b.txt"])
+    with RenameJournal.create("run.journal", "d") as journal:
+        apply_rename_plan("d", ops, journal=journal)
+    assert read_journal("run.journal").folder_path == str(tmp_path / "d")
+
+    (tmp_path / "d").rename(tmp_path / "moved")
+    with pytest.raises(ValueError, match="does not exist"):
+        rollback_rename_journal(str(tmp_path / "run.journal"))
+    (tmp_path / "moved").rename(tmp_path / "d")
+
+    # Rolled back from elsewhere, where a different "d" exists
+    other = tmp_path / "other"
+    (other / "d").mkdir(parents=True)
+    _make_files(other / "d", ["a.txt", "b.txt"])
+    monkeypatch.chdir(other)
+    assert rollback_rename_journal(str(tmp_path / "run.journal")) == []
+    assert _contents(tmp_path / "d") == {"a.txt": "a.txt", "b.txt": "b.txt"}
+    assert _contents(other / "d") == {"a.txt": "a.txt", "b.txt": "b.txt"}
+
+def test_parse_fsync_policy():
+    assert parse_fsync_policy("op") == FsyncPolicy(every_ops=1)
+    assert parse_fsync_policy("500") == FsyncPolicy(every_ops=500)
+    assert parse_fsync_policy("250ms") == FsyncPolicy(every_seconds=0.25)
+    assert parse_fsync_policy("2s").sync_window > 0
+    for bad in ("0", "-1s", "soon"):
+        with pytest.raises(ValueError):
+            parse_fsync_policy(bad)
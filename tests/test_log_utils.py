@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 
-from log_utils import LogConfig, build_timestamped_log_path, maybe_create_log_path
+from log_utils import LogConfig, SessionLogger, build_timestamped_log_path, maybe_create_log_path
 
 
 def test_build_timestamped_log_path_creates_directory(tmp_path, monkeypatch):
@@ -24,3 +24,49 @@ def test_maybe_create_log_path_enabled_returns_path(tmp_path):
     p = maybe_create_log_path(True, config)
     assert p is not None
     assert os.path.isdir(config.directory)
+
+
+def test_session_logger_buffers_until_flush(tmp_path):
+    config = LogConfig(directory=str(tmp_path / "logs_test"), flush_interval=3600, buffer_size=1 << 20)
+
+    logger = SessionLogger.create(config)
+    logger.log("first")
+    logger.log("second")
+    assert Path(logger.path).read_text(encoding="utf-8") == ""
+
+    logger.flush()
+    lines = Path(logger.path).read_text(encoding="utf-8").splitlines()
+    assert [line.split("] ", 1)[1] for line in lines] == ["first", "second"]
+    assert lines[0].startswith("[") and lines[0][20] == "]"
+    logger.close()
+    assert logger.closed
+
+
+def test_session_logger_flushes_on_size_and_on_exception(tmp_path):
+    path = tmp_path / "session.log"
+    config = LogConfig(flush_interval=3600, buffer_size=64)
+
+    try:
+        with SessionLogger(str(path), config) as logger:
+            logger.log("x" * 100)  # over buffer_size: written immediately
+            assert "x" * 100 in path.read_text(encoding="utf-8")
+            logger.log("before crash")
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    assert "before crash" in path.read_text(encoding="utf-8")
+
+
+def test_apply_rename_plan_writes_session_log(tmp_path):
+    from engine import RenameOperation
+    from filesystem import apply_rename_plan
+
+    (tmp_path / "a.txt").write_text("x", encoding="utf-8")
+    log_path = tmp_path / "apply.log"
+
+    with SessionLogger(str(log_path)) as logger:
+        apply_rename_plan(str(tmp_path), [RenameOperation("a.txt", "b.txt")], logger=logger)
+        # flushed (not closed) when apply returns
+        assert "Renamed: a.txt -> b.txt" in log_path.read_text(encoding="utf-8")
+        assert not logger.closed
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from engine import RenameOperation
+from filesystem import apply_rename_plan, undo_rename_mappings
+from mappings_io import MappingsFile, MappingsWriter, load_mappings, open_mappings, save_mappings
+
+
+@pytest.mark.parametrize("name", ["undo.ndjson", "undo.ndjson.gz"])
+def test_v2_written_during_apply_is_undone_as_a_stream(tmp_path, name, monkeypatch):
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    for n in ("a.txt", "b.txt", "c.txt"):
+        (folder / n).write_text(n, encoding="utf-8")
+    ops = [RenameOperation("a.txt", "b.txt"), RenameOperation("b.txt", "c.txt"), RenameOperation("c.txt", "a.txt")]
+    path = str(tmp_path / name)
+
+    with MappingsWriter(path, str(folder)) as writer:
+        result = apply_rename_plan(str(folder), ops, mappings_writer=writer)
+    assert result.mappings is writer and len(writer) == 4   # one cycle: one temporary name
+
+    monkeypatch.setattr("mappings_io._BLOCK", 16)   # several backward blocks
+    mappings = open_mappings(path)
+    assert isinstance(mappings, MappingsFile) and len(mappings) == 4
+    assert list(mappings)[0][0].startswith(str(folder))
+    assert undo_rename_mappings(mappings) == []
+    assert {p.name: p.read_text(encoding="utf-8") for p in folder.iterdir()} == {n: n for n in ("a.txt", "b.txt", "c.txt")}
+
+
+def test_v2_ignores_a_cut_off_last_row_and_v1_still_loads(tmp_path):
+    pairs = [("/data/N_1.txt", "/data/x.txt"), ("/data/N_2.txt", "/other/y.txt")]
+
+    v2 = tmp_path / "undo.ndjson"
+    save_mappings(str(v2), pairs)
+    lines = v2.read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[0]) == {"version": 2, "folder": ""}   # spans two folders: full paths
+    with open(v2, "a", encoding="utf-8") as f:
+        f.write('["/data/N_3.txt", "/da')   # crash mid-row
+    assert load_mappings(str(v2)) == pairs
+    assert list(reversed(open_mappings(str(v2)))) == pairs[::-1]
+
+    v1 = tmp_path / "undo.json"
+    save_mappings(str(v1), pairs)
+    assert json.loads(v1.read_text(encoding="utf-8"))["version"] == 1
+    assert open_mappings(str(v1)) == pairs
+
+
+@pytest.mark.parametrize("name", ["undo.json", "undo.ndjson"])
+def test_archive_mappings_are_refused_for_undo(tmp_path, name):
+    path = str(tmp_path / name)
+    save_mappings(path, [("File_01.txt", "a.txt")], archive="out.zip")
+
+    with pytest.raises(ValueError, match="out.zip"):
+        open_mappings(path)
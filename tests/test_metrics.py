@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import time
+
+import metrics
+from engine import RenameOptions, iter_rename_plan
+from filesystem import apply_rename_plan
+from metrics import Metrics
+
+
+def test_nested_phases_are_exclusive():
+    m = Metrics()
+    with m.phase("outer"):
+        time.sleep(0.02)
+        with m.phase("inner"):
+            time.sleep(0.02)
+            m.add_time("hot", 0.01)   # e.g. timed by hand inside a loop
+
+    assert 0.015 < m.phases["outer"] < 0.1
+    assert 0.005 < m.phases["inner"] < 0.1
+    assert m.phases["hot"] == 0.01
+    assert abs(m.seconds - sum(m.phases.values())) < 1e-9
+
+
+def test_apply_records_phases_counters_and_publishes(tmp_path):
+    for name in ("b.txt", "a.txt", "c.txt"):
+        (tmp_path / name).write_text("x", encoding="utf-8")
+    options = RenameOptions(pattern="F_##", include_date=True, include_time=False, change_extension=False, new_extension=None)
+
+    # Without a Metrics: coarse phases and outcome counts only
+    (tmp_path / "F_01.txt").write_text("x", encoding="utf-8")
+    plain = apply_rename_plan(str(tmp_path), list(iter_rename_plan(str(tmp_path), options)), dry_run=True)
+    assert {"index", "schedule", "rename"} <= set(plain.metrics.phases)
+    assert "stat" not in plain.metrics.counters
+    (tmp_path / "F_01.txt").unlink()
+
+    m = Metrics()
+    ops = list(iter_rename_plan(str(tmp_path), options, metrics=m))
+    result = apply_rename_plan(str(tmp_path), ops, metrics=m)
+
+    assert result.metrics is m
+    assert {"list", "stat", "plan", "index", "schedule", "rename"} <= set(m.phases)
+    assert m.counters["rename"] == 3
+    assert m.counters["renamed"] == 3
+    assert m.counters["errors"] == 0
+    assert m.counters["scandir"] == 2   # planning + name index
+
+    seen = []
+    hook = lambda kind, data: seen.append((kind, data["counters"]["renamed"]))  # noqa: E731
+    metrics.add_hook(hook)
+    try:
+        metrics.add_hook(lambda kind, data: 1 / 0)   # a broken hook is ignored
+        metrics.publish("rename", m)
+    finally:
+        metrics._hooks.clear()
+    assert seen == [("rename", 3)]
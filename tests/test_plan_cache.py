@@ -0,0 +1,79 @@
+import os
+
+from engine import RenameOptions, build_rename_plan
+from plan_cache import PlanCache
+
+
+def _create_files(folder, names):
+    for name in names:
+        (folder / name).write_text("x", encoding="utf-8")
+
+
+def _opts(**overrides):
+    base = dict(
+        pattern="File_###",
+        include_date=False,
+        include_time=False,
+        change_extension=False,
+        new_extension=None,
+    )
+    base.update(overrides)
+    return RenameOptions(**base)
+
+
+def test_unchanged_folder_returns_same_plan(tmp_path):
+    _create_files(tmp_path, ["b.txt", "a.txt"])
+    cache = PlanCache()
+
+    first = cache.get_plan(str(tmp_path), _opts())
+    second = cache.get_plan(str(tmp_path), _opts())
+
+    assert first.status == "miss"
+    assert second.status == "hit"
+    assert second.plan is first.plan
+    assert list(second.plan) == build_rename_plan(str(tmp_path), _opts())
+
+
+def test_different_options_reuse_the_snapshot(tmp_path):
+    _create_files(tmp_path, ["a.txt"])
+    cache = PlanCache()
+
+    cache.get_plan(str(tmp_path), _opts())
+    other = cache.get_plan(str(tmp_path), _opts(pattern="Other_##"))
+
+    assert other.status == "hit"
+    assert [op.new_name for op in other.plan] == ["Other_01.txt"]
+
+
+def test_changed_folder_rescans_and_only_stats_new_files(tmp_path, monkeypatch):
+    _create_files(tmp_path, ["a.txt", "b.txt"])
+    cache = PlanCache()
+    cache.get_plan(str(tmp_path), _opts(include_date=True))
+
+    _create_files(tmp_path, ["c.txt"])
+    os.utime(tmp_path, ns=(0, 10**18))  # make sure the folder mtime differs
+
+    stat_paths = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda p, *a, **k: stat_paths.append(str(p)) or real_stat(p, *a, **k))
+    result = cache.get_plan(str(tmp_path), _opts(include_date=True))
+    monkeypatch.undo()
+
+    assert result.status == "incremental"
+    assert [op.old_name for op in result.plan] == ["a.txt", "b.txt", "c.txt"]
+    assert [p for p in stat_paths if p.endswith(".txt")] == [str(tmp_path / "c.txt")]
+
+
+def test_cache_round_trips_through_a_file(tmp_path):
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    _create_files(folder, ["a.txt"])
+    cache_file = str(tmp_path / "plans.cache")
+
+    cache = PlanCache()
+    cache.get_plan(str(folder), _opts())
+    cache.save(cache_file)
+
+    loaded = PlanCache.load(cache_file)
+    assert loaded.get_plan(str(folder), _opts()).status == "hit"
+    assert PlanCache.load(str(tmp_path / "missing.cache")).get_plan(str(folder), _opts()).status == "miss"
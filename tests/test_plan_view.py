@@ -0,0 +1,34 @@
+import pytest
+
+from engine import RenamePlan
+from plan_view import PlanView
+
+
+def _plan(count):
+    plan = RenamePlan("/photos")
+    for i in range(count):
+        plan.append(f"IMG_{i:04d}.jpg", f"Trip_{i:04d}.jpg")
+    return plan
+
+
+def test_plan_view_filters_old_and_new_names():
+    view = PlanView(_plan(200))
+
+    assert len(view) == 200
+    assert view.set_filter("img_001") == 10               # old names, case-insensitive
+    assert view[0].old_name == "IMG_0010.jpg"
+    assert view.set_filter("Trip_0199") == 1              # new names
+    assert view[-1].new_name == "Trip_0199.jpg"
+    assert view.plan_index(0) == 199
+    assert view.set_filter("nothing") == 0
+    assert view.set_filter("") == 200
+
+
+def test_plan_view_returns_one_window_of_rows():
+    view = PlanView(_plan(25))
+
+    assert [row.old_name for row in view.rows(20, 10)] == [f"IMG_{i:04d}.jpg" for i in range(20, 25)]
+    assert view.rows(30, 10) == []
+    assert len(PlanView()) == 0
+    with pytest.raises(IndexError):
+        view[25]
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+import scanner
+from scanner import scan_directory, walk_tree
+
+
+def _create_file(path, text="x"):
+    path.write_text(text, encoding="utf-8")
+
+
+def test_scan_directory_reports_files_and_dirs(tmp_path):
+    _create_file(tmp_path / "a.txt", "hello")
+    (tmp_path / "sub").mkdir()
+
+    snapshot = scan_directory(str(tmp_path))
+    by_name = {e.name: e for e in snapshot.entries}
+
+    assert set(by_name) == {"a.txt", "sub"}
+    assert by_name["a.txt"].is_file is True
+    assert by_name["sub"].is_file is False
+    assert [e.name for e in snapshot.files()] == ["a.txt"]
+
+
+def test_scan_directory_captures_stat_fields(tmp_path):
+    _create_file(tmp_path / "a.txt", "hello")
+    st = os.stat(tmp_path / "a.txt")
+
+    entry = scan_directory(str(tmp_path)).files()[0]
+
+    assert entry.size == 5
+    assert entry.mtime == st.st_mtime
+    assert entry.ctime == st.st_ctime
+    assert entry.inode == st.st_ino
+
+
+def test_scan_directory_without_stat_leaves_fields_empty(tmp_path):
+    _create_file(tmp_path / "a.txt")
+
+    entry = scan_directory(str(tmp_path), with_stat=False).files()[0]
+
+    assert entry.is_file is True
+    assert entry.size is None and entry.mtime is None and entry.ctime is None
+
+
+def test_walk_tree_yields_every_directory_in_pre_order(tmp_path):
+    for folder in ["b", "A", "A/z", "A/y", "b/c"]:
+        (tmp_path / folder).mkdir()
+        _create_file(tmp_path / folder / "f.txt")
+    _create_file(tmp_path / "root.txt")
+
+    snapshots = list(walk_tree(str(tmp_path), with_stat=False, workers=3, ordered=True))
+    unordered = list(walk_tree(str(tmp_path), with_stat=False, workers=3))
+
+    relative = [os.path.relpath(s.folder_path, tmp_path) for s in snapshots]
+    assert relative == [".", "A", os.path.join("A", "y"), os.path.join("A", "z"), "b", os.path.join("b", "c")]
+    assert [e.name for e in snapshots[0].files()] == ["root.txt"]
+    assert sorted(s.folder_path for s in unordered) == sorted(s.folder_path for s in snapshots)
+
+
+def test_walk_tree_reports_unlistable_directories(tmp_path):
+    errors = []
+    snapshots = list(walk_tree(str(tmp_path / "missing"), on_error=lambda path, e: errors.append(path)))
+
+    assert snapshots == []
+    assert errors == [str(tmp_path / "missing")]
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_walk_tree_raises_other_listing_errors(tmp_path, monkeypatch, ordered):
+    for folder in ["a", "b", "b/c"]:
+        (tmp_path / folder).mkdir()
+    scan_dir = scanner._scan_dir
+
+    def broken(path, *args):
+        if path.endswith("c"):
+            raise RuntimeError("listing bug")
+        return scan_dir(path, *args)
+
+    monkeypatch.setattr(scanner, "_scan_dir", broken)
+    with pytest.raises(RuntimeError, match="listing bug"):
+        list(walk_tree(str(tmp_path), workers=2, ordered=ordered, on_error=lambda path, e: None))
+
+
+def test_walk_tree_ordered_read_ahead_is_bounded(tmp_path, monkeypatch):
+    for i in range(50):
+        (tmp_path / f"d{i:02}").mkdir()
+    listed = []
+    scan_dir = scanner._scan_dir
+
+    def counting(path, *args):
+        listed.append(path)
+        return scan_dir(path, *args)
+
+    monkeypatch.setattr(scanner, "_scan_dir", counting)
+    walk = walk_tree(str(tmp_path), workers=2, ordered=True)
+    next(walk)
+    next(walk)
+
+    # two yielded, the rest held ahead (plus the one the consumer waits on)
+    assert len(listed) - 2 <= 2 * scanner._READ_AHEAD_PER_WORKER + 1
+    walk.close()
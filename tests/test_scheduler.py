@@ -0,0 +1,55 @@
+from engine import RenameOperation
+from scheduler import TEMP_PREFIX, schedule_renames
+
+
+def _ops(*pairs):
+    return [RenameOperation(old_name=a, new_name=b) for a, b in pairs]
+
+
+def _simulate(names, steps):
+    names = set(names)
+    for step in steps:
+        assert step.src in names and step.dst not in names, step
+        names.remove(step.src)
+        names.add(step.dst)
+    return names
+
+
+def test_chain_runs_from_free_end():
+    ops = _ops(("a", "b"), ("b", "c"), ("c", "d"))
+
+    steps = schedule_renames(ops)
+
+    assert [(s.src, s.dst) for s in steps] == [("c", "d"), ("b", "c"), ("a", "b")]
+    assert all(s.kind == "direct" for s in steps)
+
+
+def test_swap_uses_one_temporary_name():
+    ops = _ops(("File_02", "File_01"), ("File_01", "File_02"))
+
+    steps = schedule_renames(ops, temp_token="t")
+
+    assert [s.kind for s in steps] == ["stage", "direct", "unstage"]
+    assert steps[0].dst == f"{TEMP_PREFIX}t-0"
+    assert _simulate({"File_01", "File_02"}, steps) == {"File_01", "File_02"}
+
+
+def test_renumbering_with_cycles_and_chains_is_linear_and_complete():
+    n = 1000
+    # Shift every number by one, plus a few swaps: chains and cycles mixed
+    ops = _ops(*[(f"F_{i:04d}", f"F_{i + 1:04d}") for i in range(n)])
+    ops += _ops(("x", "y"), ("y", "z"), ("z", "x"))
+
+    steps = schedule_renames(ops)
+
+    assert len(steps) == len(ops) + 1  # the single cycle costs one extra (temporary) rename
+    names = {op.old_name for op in ops}
+    assert _simulate(names, steps) == {op.new_name for op in ops}
+
+
+def test_conflicting_ops_keep_plan_position():
+    ops = _ops(("a", "t"), ("b", "t"), ("c", "c"))
+
+    steps = schedule_renames(ops)
+
+    assert [(s.op_index, s.kind) for s in steps] == [(0, "direct"), (1, "direct"), (2, "direct")]
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+from bench_startup import commands, startup_report  # noqa: E402
+
+
+# Modules that must stay out of these commands' startup (loaded lazily by
+# the code paths that need them). shutil is not listed: argparse loads it.
+_HEAVY = {"json", "pickle", "tempfile", "concurrent.futures", "multiprocessing", "secrets", "relabeler_cli"}
+
+# Modules each command must not load. The module count and import time
+# ceilings depend on the machine: `python benchmarks/bench_startup.py --check`.
+_FORBIDDEN = {
+    "cli preview": _HEAVY | {"zipfile", "filesystem", "plan_cache", "log_utils", "mappings_io"},
+    "cli rename --dry-run": _HEAVY | {"zipfile", "plan_cache"},
+    "zip_service": _HEAVY | {"zip_pack"},
+}
+
+
+@pytest.mark.parametrize("label", sorted(_FORBIDDEN))
+def test_startup_skips_heavy_modules(tmp_path, label):
+    report = startup_report(commands(tmp_path)[label], str(tmp_path))
+
+    assert sorted(_FORBIDDEN[label] & set(report["modules"])) == []
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import json
+import threading
+import urllib.error
+import urllib.request
+import zipfile
+from dataclasses import replace
+
+import pytest
+
+from engine import RenameOptions
+from zip_daemon import JobQueue, LatencyWindow, QueueFull, make_server
+from zip_service import ZipJob
+
+
+def _make_zip(zip_path, files: dict[str, str]) -> None:
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        for name, content in files.items():
+            z.writestr(name, content)
+
+
+def _job(tmp_path, name: str = "in") -> ZipJob:
+    zip_in = tmp_path / f"{name}.zip"
+    _make_zip(zip_in, {"b.txt": "b", "a.txt": "a"})
+    options = RenameOptions(pattern="File_##", include_date=False, include_time=False, change_extension=False, new_extension=None)
+    return ZipJob(zip_in=str(zip_in), zip_out=str(tmp_path / f"{name}_out.zip"), options=options)
+
+
+def test_job_queue_runs_jobs_and_reports_stats(tmp_path):
+    jobs = JobQueue(workers=2, max_queued=10)
+    jobs.start()
+    try:
+        records = [jobs.submit(_job(tmp_path, f"in{i}")) for i in range(3)]
+        for record in records:
+            assert jobs.wait(record.id, timeout=10).status == "done"
+        assert records[0].result.pop("metrics")["counters"]["members"] == 2
+        assert records[0].result == {"planned": 2, "renamed": 2, "skipped": 0, "errors": 0}
+        with zipfile.ZipFile(records[0].job.zip_out) as z:
+            assert sorted(z.namelist()) == ["File_01.txt", "File_02.txt"]
+
+        stats = jobs.stats()
+        assert stats["done"] == 3 and stats["queue_depth"] == 0
+        assert stats["latency_ms"]["p50"] is not None
+    finally:
+        jobs.stop()
+
+
+def test_job_queue_is_bounded_and_cancels_queued_jobs(tmp_path):
+    jobs = JobQueue(workers=1, max_queued=1)  # not started: jobs stay queued
+    record = jobs.submit(_job(tmp_path))
+    with pytest.raises(QueueFull):
+        jobs.submit(_job(tmp_path, "other"))
+
+    assert jobs.cancel(record.id).status == "cancelled"
+    assert jobs.stats()["queue_depth"] == 0
+    jobs.submit(_job(tmp_path, "other"))  # the slot is free again
+    jobs.stop()
+
+
+def test_latency_percentiles_nearest_rank():
+    window = LatencyWindow()
+    for ms in range(1, 101):
+        window.add(ms / 1000)
+    assert window.percentiles() == {"p50": 50.0, "p90": 90.0, "p99": 99.0}
+
+
+def test_http_api_submit_status_and_stats(tmp_path):
+    jobs = JobQueue(workers=1)
+    server = make_server(jobs, port=0)
+    jobs.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        job = _job(tmp_path)
+        body = json.dumps({"zip_in": job.zip_in, "zip_out": job.zip_out, "pattern": "File_##"}).encode()
+        request = urllib.request.Request(f"{base}/jobs", data=body, method="POST")
+        with urllib.request.urlopen(request) as response:
+            assert response.status == 202
+            job_id = json.load(response)["id"]
+
+        with urllib.request.urlopen(f"{base}/jobs/{job_id}?wait=10") as response:
+            status = json.load(response)
+        assert status["status"] == "done"
+        assert status["result"]["renamed"] == 2
+
+        with urllib.request.urlopen(f"{base}/stats") as response:
+            assert json.load(response)["done"] == 1
+
+        bad = urllib.request.Request(f"{base}/jobs", data=b'{"pattern": "X"}', method="POST")
+        with pytest.raises(urllib.error.HTTPError) as exc:
+            urllib.request.urlopen(bad)
+        assert exc.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+        jobs.stop()
+
+
+def test_concurrent_jobs_write_separate_logs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    jobs = JobQueue(workers=2, max_queued=10)
+    jobs.start()
+    try:
+        records = [jobs.submit(replace(_job(tmp_path, f"in{i}"), log=True)) for i in range(2)]
+        for record in records:
+            assert jobs.wait(record.id, timeout=10).status == "done"
+    finally:
+        jobs.stop()
+
+    logs = sorted(p.name for p in (tmp_path / "logs").iterdir())
+    assert len(logs) == 2
+    assert all(any(record.id in name for name in logs) for record in records)
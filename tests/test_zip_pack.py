@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import os
+import zipfile
+
+import zip_pack
+import zip_rewrite
+from zip_service import create_zip
+
+
+def _create_files(folder, files: dict[str, bytes]) -> None:
+    for name, content in files.items():
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+
+def test_parallel_create_zip_matches_serial_archive(tmp_path):
+    src = tmp_path / "src"
+    _create_files(src, {
+        "b.txt": b"bbb " * 5000,
+        "a.bin": os.urandom(20000),
+        "sub/c.txt": b"nested",
+        "empty.txt": b"",
+    })
+
+    serial = tmp_path / "serial.zip"
+    parallel = tmp_path / "parallel.zip"
+    create_zip(src, serial)
+    create_zip(src, parallel, jobs=2)
+
+    with zipfile.ZipFile(serial) as zs, zipfile.ZipFile(parallel) as zp:
+        assert zp.testzip() is None
+        assert zp.namelist() == ["a.bin", "b.txt", "empty.txt", "sub/c.txt"]
+        for info in zs.infolist():
+            packed = zp.getinfo(info.filename)
+            assert zp.read(info.filename) == zs.read(info.filename)
+            assert (packed.CRC, packed.compress_size, packed.compress_type) == (
+                info.CRC,
+                info.compress_size,
+                info.compress_type,
+            )
+
+
+def test_compress_member_spills_large_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_pack, "_SPILL_SIZE", 100)
+    path = tmp_path / "big.txt"
+    path.write_bytes(b"x" * 1000)
+
+    member = zip_pack.compress_member(str(path), "big.txt", str(tmp_path))
+    assert member.data is None
+    assert os.path.getsize(member.chunk_path) == member.info.compress_size
+    assert member.info.file_size == 1000
+
+
+def test_create_zip_without_the_raw_append(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    _create_files(src, {"b.txt": b"bbb " * 5000, "a.bin": os.urandom(2000)})
+    monkeypatch.setattr(zip_rewrite, "_raw_append_supported", lambda zout: False)
+
+    create_zip(src, tmp_path / "out.zip")
+
+    with zipfile.ZipFile(tmp_path / "out.zip") as z:
+        assert z.testzip() is None
+        assert z.read("b.txt") == b"bbb " * 5000
+        assert z.getinfo("b.txt").compress_type == zipfile.ZIP_DEFLATED
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import os
+import zipfile
+
+from zip_policy import CompressionPolicy
+from zip_service import create_zip
+
+
+def _create_files(folder, files: dict[str, bytes]) -> None:
+    folder.mkdir(parents=True, exist_ok=True)
+    for name, content in files.items():
+        (folder / name).write_bytes(content)
+
+
+def test_policy_decisions(tmp_path):
+    _create_files(tmp_path, {"noise.dat": os.urandom(8192), "text.dat": b"abc " * 4096})
+    policy = CompressionPolicy(extension_overrides={"TXT": 9, ".png": 6})
+
+    def decide(name):
+        path = tmp_path / name
+        size = path.stat().st_size if path.exists() else 0
+        return policy.decide(name, str(path), size)
+
+    assert decide("photo.JPG")[::2] == (zipfile.ZIP_STORED, "extension")
+    assert decide("noise.dat")[::2] == (zipfile.ZIP_STORED, "sniffed")
+    assert decide("text.dat") == (zipfile.ZIP_DEFLATED, None, "deflate")
+    assert decide("scan.tif") == (zipfile.ZIP_DEFLATED, 1, "deflate")
+    assert decide("notes.txt") == (zipfile.ZIP_DEFLATED, 9, "override")
+    assert decide("icon.png") == (zipfile.ZIP_DEFLATED, 6, "override")
+    assert CompressionPolicy(mode="deflate").decide("photo.jpg", "", 0)[0] == zipfile.ZIP_DEFLATED
+
+
+def test_create_zip_stats_and_member_methods(tmp_path):
+    src = tmp_path / "src"
+    _create_files(src, {"a.jpg": os.urandom(5000), "b.txt": b"hello " * 2000})
+
+    stats = create_zip(src, tmp_path / "out.zip")
+    with zipfile.ZipFile(tmp_path / "out.zip") as z:
+        assert z.testzip() is None
+        assert z.getinfo("a.jpg").compress_type == zipfile.ZIP_STORED
+        assert z.getinfo("b.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert z.read("a.jpg") == (src / "a.jpg").read_bytes()
+
+    assert (stats.members, stats.stored, stats.deflated) == (2, 1, 1)
+    assert stats.bytes_in == 17000
+    assert stats.bytes_saved > 11000
+    assert stats.reasons == {"extension": 1, "deflate": 1}
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import warnings
+import zipfile
+
+import pytest
+
+import zip_rewrite
+from engine import RenameOptions
+from zip_rewrite import rename_archive
+
+
+def _options(pattern: str) -> RenameOptions:
+    return RenameOptions(pattern=pattern, include_date=False, include_time=False, change_extension=False, new_extension=None)
+
+
+def _raw_member(zip_path, name: str) -> bytes:
+    with zipfile.ZipFile(zip_path) as z:
+        info = z.getinfo(name)
+    with open(zip_path, "rb") as f:
+        f.seek(info.header_offset + 26)
+        name_length = int.from_bytes(f.read(2), "little")
+        extra_length = int.from_bytes(f.read(2), "little")
+        f.seek(name_length + extra_length, 1)
+        return f.read(info.compress_size)
+
+
+def test_rename_archive_copies_compressed_bytes(tmp_path, monkeypatch):
+    zip_in = tmp_path / "in.zip"
+    zip_out = tmp_path / "out.zip"
+    with zipfile.ZipFile(zip_in, "w") as z:
+        z.writestr("b.jpg", b"\xff\xd8" * 500, compress_type=zipfile.ZIP_STORED)
+        z.writestr("A.txt", b"hello " * 500, compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr("sub/c.txt", b"nested", compress_type=zipfile.ZIP_DEFLATED)
+        z.comment = b"keep me"
+
+    # Neither compression nor decompression may run
+    def fail(*args, **kwargs):
+        raise AssertionError("zlib used")
+
+    monkeypatch.setattr(zipfile.zlib, "compressobj", fail)
+    monkeypatch.setattr(zipfile.zlib, "decompressobj", fail)
+    plan, result = rename_archive(str(zip_in), str(zip_out), _options("File_##"))
+    monkeypatch.undo()
+
+    assert [(op.old_name, op.new_name) for op in plan.operations] == [
+        ("A.txt", "File_01.txt"),
+        ("b.jpg", "File_02.jpg"),
+    ]
+    assert result.mappings == [("File_01.txt", "A.txt"), ("File_02.jpg", "b.jpg")]
+
+    with zipfile.ZipFile(zip_out) as z:
+        assert z.testzip() is None
+        assert z.namelist() == ["File_02.jpg", "File_01.txt", "sub/c.txt"]
+        assert z.getinfo("File_02.jpg").compress_type == zipfile.ZIP_STORED
+        assert z.getinfo("File_01.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert z.read("File_01.txt") == b"hello " * 500
+        assert z.comment == b"keep me"
+    assert _raw_member(zip_out, "File_01.txt") == _raw_member(zip_in, "A.txt")
+
+
+def test_rename_archive_skips_collisions_and_dry_run_writes_nothing(tmp_path):
+    zip_in = tmp_path / "in.zip"
+    zip_out = tmp_path / "out.zip"
+    with zipfile.ZipFile(zip_in, "w") as z:
+        z.writestr("x.txt", "x")
+        z.writestr("File_01.txt/inner.txt", "a folder already uses the target name")
+
+    _, result = rename_archive(str(zip_in), str(zip_out), _options("File_##"), dry_run=True)
+    assert result.skipped == ["File_01.txt"]
+    assert result.renamed == []
+    assert not zip_out.exists()
+
+
+def test_rename_archive_recursive_renames_nested_members(tmp_path):
+    zip_in = tmp_path / "in.zip"
+    zip_out = tmp_path / "out.zip"
+    with zipfile.ZipFile(zip_in, "w") as z:
+        z.writestr("x.txt", "x")
+        z.writestr("sub/", "")
+        z.writestr("sub/b.txt", "b")
+        z.writestr("sub/a.txt", "a")
+        z.writestr("sub/deep/c.txt", "c")
+
+    _, result = rename_archive(str(zip_in), str(zip_out), _options("File_##"), recursive=True, counter="global")
+
+    assert result.renamed == [
+        ("x.txt", "File_01.txt"),
+        ("sub/a.txt", "sub/File_02.txt"),
+        ("sub/b.txt", "sub/File_03.txt"),
+        ("sub/deep/c.txt", "sub/deep/File_04.txt"),
+    ]
+    with zipfile.ZipFile(zip_out) as z:
+        assert z.namelist() == ["File_01.txt", "sub/", "sub/File_03.txt", "sub/File_02.txt", "sub/deep/File_04.txt"]
+        assert z.read("sub/File_02.txt") == b"a"
+
+
+def test_rename_archive_renames_one_member_per_duplicate_name(tmp_path):
+    zip_in = tmp_path / "in.zip"
+    zip_out = tmp_path / "out.zip"
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # zipfile warns about the duplicate name
+        with zipfile.ZipFile(zip_in, "w") as z:
+            z.writestr("a.txt", "first")
+            z.writestr("a.txt", "second")
+            z.writestr("b.txt", "b")
+
+    _, result = rename_archive(str(zip_in), str(zip_out), _options("File_##"))
+
+    assert result.renamed == [("a.txt", "File_01.txt"), ("b.txt", "File_03.txt")]
+    with zipfile.ZipFile(zip_out) as z:
+        assert [(info.filename, z.read(info)) for info in z.infolist()] == [
+            ("File_01.txt", b"first"),
+            ("a.txt", b"second"),
+            ("File_03.txt", b"b"),
+        ]
+
+
+@pytest.mark.parametrize("raw", [True, False])
+def test_rename_archive_with_and_without_the_raw_append(tmp_path, monkeypatch, raw):
+    zip_in = tmp_path / "in.zip"
+    zip_out = tmp_path / "out.zip"
+    with zipfile.ZipFile(zip_in, "w") as z:
+        z.writestr("b.jpg", b"\xff\xd8" * 500, compress_type=zipfile.ZIP_STORED)
+        z.writestr("A.txt", b"hello " * 500, compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr("c.bin", bytes(range(256)) * 40, compress_type=zipfile.ZIP_BZIP2)
+    monkeypatch.setattr(zip_rewrite, "_raw_append_supported", lambda zout: raw)
+
+    rename_archive(str(zip_in), str(zip_out), _options("File_##"))
+
+    with zipfile.ZipFile(zip_out) as z:
+        assert z.testzip() is None
+        assert z.namelist() == ["File_02.jpg", "File_01.txt", "File_03.bin"]
+        assert [info.compress_type for info in z.infolist()] == [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2]
+        assert z.read("File_01.txt") == b"hello " * 500
+        assert z.read("File_03.bin") == bytes(range(256)) * 40
+    assert _raw_member(zip_out, "File_02.jpg") == _raw_member(zip_in, "b.jpg")
+    if raw:
+        assert _raw_member(zip_out, "File_01.txt") == _raw_member(zip_in, "A.txt")
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 import zipfile
 from pathlib import Path
 
@@ -63,3 +64,42 @@ def test_zip_service_writes_mappings_file(tmp_path):
     assert code == 0
     assert zip_out.exists()
     assert mappings_out.exists()
+
+
+def test_zip_service_extract_mode_still_available(tmp_path):
+    zip_in = tmp_path / "input.zip"
+    zip_out = tmp_path / "output.zip"
+
+    _make_zip(zip_in, {"b.txt": "b", "A.txt": "a"})
+
+    code = zip_main([str(zip_in), str(zip_out), "--pattern", "File_##", "--extract"])
+    assert code == 0
+    assert _list_zip_names(zip_out) == ["File_01.txt", "File_02.txt"]
+
+
+def test_zip_service_stats_json_times_each_phase(tmp_path, capsys):
+    zip_in = tmp_path / "input.zip"
+    zip_out = tmp_path / "output.zip"
+    _make_zip(zip_in, {"a.txt": "x", "b.txt": "y"})
+
+    code = zip_main([str(zip_in), str(zip_out), "--pattern", "Z_##", "--stats-json", "-"])
+    assert code == 0
+
+    out = capsys.readouterr().out
+    stats = json.loads(out[out.index("{"):])
+    assert stats["kind"] == "zip_job"
+    assert {"index", "plan", "rename", "write"} <= set(stats["phases"])
+    assert stats["counters"]["members"] == 2
+    assert stats["counters"]["bytes_written"] == zip_out.stat().st_size
+
+
+@pytest.mark.parametrize("date_args, expected", [([], "F_01.txt"), (["--date"], "F_01_19800101.txt")])
+def test_zip_service_accepts_zero_dos_dates(tmp_path, date_args, expected):
+    zip_in = tmp_path / "input.zip"
+    zip_out = tmp_path / "output.zip"
+    with zipfile.ZipFile(zip_in, "w") as z:
+        z.writestr(zipfile.ZipInfo("a.txt", date_time=(1980, 0, 0, 0, 0, 0)), "a")
+
+    code = zip_main([str(zip_in), str(zip_out), "--pattern", "F_##", *date_args])
+    assert code == 0
+    assert _list_zip_names(zip_out) == [expected]
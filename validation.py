@@ -10,6 +10,18 @@ from engine import RenameOptions
 _HASH_RUNS_RE = re.compile(r"(#+)")
 
 
+def positive_int(value: str) -> int:
+    """
+    argparse type for counts that must be at least 1.
+    """
+    import argparse  # already loaded by any caller parsing arguments
+
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+
 def validate_inputs(folder_path: str, options: RenameOptions) -> List[str]:
     """
     Returns a list of human-friendly validation error messages.
@@ -24,6 +36,17 @@ def validate_inputs(folder_path: str, options: RenameOptions) -> List[str]:
     if not os.path.isdir(folder_path):
         errors.append("Selected folder does not exist or is not a folder.")
 
+    errors.extend(validate_options(options))
+    return errors
+
+
+def validate_options(options: RenameOptions) -> List[str]:
+    """
+    The option checks of validate_inputs, for callers without a folder
+    (e.g. renaming inside an archive).
+    """
+    errors: List[str] = []
+
     if not options.pattern or not options.pattern.strip():
         errors.append("Please enter a rename pattern.")
     else:
@@ -0,0 +1,469 @@
+from __future__ import annotations
+
+import argparse
+import collections
+import json
+import math
+import os
+import secrets
+import socketserver
+import threading
+import time
+from dataclasses import asdict, dataclass, field, replace
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from engine import COUNTER_SCOPES, RenameOptions
+from validation import validate_options
+from zip_policy import POLICY_MODES, CompressionPolicy
+from zip_service import JobCancelled, ZipJob, ZipJobError, run_zip_job
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Latencies kept for the percentiles in stats().
+_LATENCY_WINDOW = 1024
+
+# Error messages returned per job (the counts are always complete).
+_MAX_REPORTED_ERRORS = 100
+
+# Seconds between progress updates of a running job.
+_PROGRESS_INTERVAL = 0.5
+
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+
+class QueueFull(Exception):
+    pass
+
+
+@dataclass(eq=False)
+class JobRecord:
+    id: str
+    job: ZipJob
+    status: str = "queued"  # "queued", "running", then one of FINISHED_STATES
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: Optional[dict] = None
+    errors: list[str] = field(default_factory=list)
+    progress: Optional[dict] = None  # the latest filesystem.ProgressEvent, while running
+    cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "zip_in": self.job.zip_in,
+            "zip_out": self.job.zip_out,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "cancel_requested": self.cancel.is_set(),
+            "progress": self.progress,
+            "result": self.result,
+            "errors": self.errors,
+        }
+
+
+class LatencyWindow:
+    """
+    The last `size` latencies (seconds) with nearest-rank percentiles.
+    """
+
+    def __init__(self, size: int = _LATENCY_WINDOW) -> None:
+        self._values: collections.deque[float] = collections.deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._values.append(seconds)
+
+    def percentiles(self, points: tuple[int, ...] = (50, 90, 99)) -> dict[str, Optional[float]]:
+        ordered = sorted(self._values)
+        out: dict[str, Optional[float]] = {}
+        for p in points:
+            if not ordered:
+                out[f"p{p}"] = None
+            else:
+                rank = max(1, math.ceil(p / 100 * len(ordered)))
+                out[f"p{p}"] = round(ordered[rank - 1] * 1000, 3)  # milliseconds
+        return out
+
+
+def _summarize(job_result) -> dict:
+    result = job_result.result
+    summary = {
+        "planned": job_result.planned,
+        "renamed": len(result.renamed),
+        "skipped": len(result.skipped),
+        "errors": len(result.errors),
+        "metrics": job_result.metrics.to_dict(),
+    }
+    if job_result.stats is not None:
+        summary["compression"] = dict(asdict(job_result.stats), bytes_saved=job_result.stats.bytes_saved)
+    return summary
+
+
+class JobQueue:
+    """
+    Bounded FIFO of ZipJobs run by a pool of worker threads in this process,
+    so imports, compiled templates and the interpreter are paid for once.
+
+    - submit() raises QueueFull when max_queued jobs are already waiting;
+    - cancel() drops a queued job at once and asks a running one to stop
+      at its next checkpoint (see zip_service.run_zip_job);
+    - the newest `history` finished jobs stay queryable.
+    """
+
+    def __init__(self, workers: int = 4, max_queued: int = 100, history: int = 10000) -> None:
+        self.workers = workers
+        self.max_queued = max_queued
+        self.history = history
+        self._lock = threading.Condition()
+        self._pending: collections.deque[JobRecord] = collections.deque()
+        self._records: dict[str, JobRecord] = {}
+        self._finished_ids: collections.deque[str] = collections.deque()
+        self._counts = {state: 0 for state in FINISHED_STATES}
+        self._running = 0
+        self._wait_latency = LatencyWindow()
+        self._total_latency = LatencyWindow()
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"relabeler-zip-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, *, cancel_running: bool = True) -> None:
+        """
+        Cancels queued jobs (and running ones unless cancel_running=False)
+        and waits for the workers to exit.
+        """
+        with self._lock:
+            self._stopping = True
+            while self._pending:
+                self._finish(self._pending.popleft(), "cancelled")
+            if cancel_running:
+                for record in self._records.values():
+                    if record.status == "running":
+                        record.cancel.set()
+            self._lock.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+
+    def submit(self, job: ZipJob) -> JobRecord:
+        with self._lock:
+            if self._stopping:
+                raise QueueFull("service is shutting down")
+            if len(self._pending) >= self.max_queued:
+                raise QueueFull(f"{len(self._pending)} jobs already queued")
+            job_id = secrets.token_hex(8)
+            # Jobs started in the same second must not share a log file
+            record = JobRecord(id=job_id, job=replace(job, log_suffix=job_id))
+            self._records[record.id] = record
+            self._pending.append(record)
+            self._lock.notify_all()
+            return record
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        with self._lock:
+            return self._records.get(job_id)
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[JobRecord]:
+        """
+        Blocks until the job has finished or timeout expires; returns the
+        record either way (None for an unknown id).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                record = self._records.get(job_id)
+                if record is None or record.status in FINISHED_STATES:
+                    return record
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return record
+                self._lock.wait(remaining)
+
+    def cancel(self, job_id: str) -> Optional[JobRecord]:
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is None or record.status in FINISHED_STATES:
+                return record
+            record.cancel.set()
+            if record.status == "queued":
+                self._pending.remove(record)
+                self._finish(record, "cancelled")
+            return record
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": len(self._pending),
+                "max_queued": self.max_queued,
+                "running": self._running,
+                **self._counts,
+                "queue_wait_ms": self._wait_latency.percentiles(),
+                "latency_ms": self._total_latency.percentiles(),
+            }
+
+    def _finish(self, record: JobRecord, status: str) -> None:
+        # Called with the lock held
+        record.status = status
+        record.finished = time.time()
+        self._counts[status] += 1
+        if record.started is not None:
+            self._total_latency.add(record.finished - record.submitted)
+        self._finished_ids.append(record.id)
+        while len(self._finished_ids) > self.history:
+            del self._records[self._finished_ids.popleft()]
+        self._lock.notify_all()
+
+    def _work(self) -> None:
+        from filesystem import Progress
+
+        while True:
+            with self._lock:
+                while not self._pending and not self._stopping:
+                    self._lock.wait()
+                if not self._pending:
+                    return
+                record = self._pending.popleft()
+                record.status = "running"
+                record.started = time.time()
+                self._running += 1
+                self._wait_latency.add(record.started - record.submitted)
+
+            def on_event(event, record=record) -> None:
+                record.progress = event._asdict()
+
+            status = "done"
+            try:
+                progress = Progress(on_event, interval=_PROGRESS_INTERVAL)
+                job_result = run_zip_job(record.job, cancel=record.cancel, progress=progress)
+            except JobCancelled:
+                status = "cancelled"
+            except ZipJobError as e:
+                status = "failed"
+                record.errors = e.messages
+            except Exception as e:
+                status = "failed"
+                record.errors = [f"{type(e).__name__}: {e}"]
+            else:
+                record.result = _summarize(job_result)
+                record.errors = list(job_result.result.errors[:_MAX_REPORTED_ERRORS])
+
+            with self._lock:
+                self._running -= 1
+                self._finish(record, status)
+
+
+def job_from_payload(payload: dict) -> ZipJob:
+    """
+    Builds a ZipJob from a POST /jobs body (same names as the zip_service
+    flags); raises ValueError with a user-facing message.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Job must be a JSON object.")
+    for key in ("zip_in", "zip_out", "pattern"):
+        if not isinstance(payload.get(key), str) or not payload[key]:
+            raise ValueError(f"Missing or invalid field: {key}")
+
+    ext = payload.get("ext")
+    options = RenameOptions(
+        pattern=payload["pattern"],
+        include_date=bool(payload.get("date", False)),
+        include_time=bool(payload.get("time", False)),
+        change_extension=ext is not None,
+        new_extension=ext,
+    )
+    errors = validate_options(options)
+    if errors:
+        raise ValueError(" ".join(errors))
+
+    compression = payload.get("compression", "auto")
+    if compression not in POLICY_MODES:
+        raise ValueError(f"compression must be one of: {', '.join(POLICY_MODES)}")
+    jobs = payload.get("jobs", 1)
+    if not isinstance(jobs, int) or jobs < 1:
+        raise ValueError("jobs must be a positive integer")
+    counter = payload.get("counter", "directory")
+    if counter not in COUNTER_SCOPES:
+        raise ValueError(f"counter must be one of: {', '.join(COUNTER_SCOPES)}")
+    level = payload.get("level")
+    ext_levels = payload.get("ext_levels") or {}
+    if not isinstance(ext_levels, dict):
+        raise ValueError("ext_levels must be an object of extension -> level")
+    for value in [level, *ext_levels.values()]:
+        if value is not None and (not isinstance(value, int) or not 0 <= value <= 9):
+            raise ValueError("compression levels must be integers between 0 and 9")
+
+    return ZipJob(
+        zip_in=payload["zip_in"],
+        zip_out=payload["zip_out"],
+        options=options,
+        dry_run=bool(payload.get("dry_run", False)),
+        extract=bool(payload.get("extract", False)),
+        jobs=jobs,
+        policy=CompressionPolicy(
+            mode=compression,
+            level=level,
+            extension_overrides=dict(ext_levels),
+            sniff_bytes=CompressionPolicy.sniff_bytes if payload.get("sniff", True) else 0,
+        ),
+        mappings_out=payload.get("mappings_out"),
+        log=bool(payload.get("log", False)),
+        recursive=bool(payload.get("recursive", False)),
+        counter=counter,
+    )
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API over a JobQueue (server.jobs):
+
+    - POST /jobs                  submit a job -> 202 {job}, 503 when full
+    - GET /jobs/<id>[?wait=SECS]  job status (optionally wait for it to finish)
+    - DELETE /jobs/<id>           cancel
+    - GET /stats                  queue depth, counters, latency percentiles
+    """
+
+    server_version = "relabeler-zip"
+    quiet = True
+
+    def log_message(self, format: str, *args) -> None:
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def address_string(self) -> str:
+        # Unix-socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else "local"
+
+    @property
+    def jobs(self) -> JobQueue:
+        return self.server.jobs
+
+    def _send(self, status: HTTPStatus, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _job_id(self, path: str) -> Optional[str]:
+        parts = path.strip("/").split("/")
+        return parts[1] if len(parts) == 2 and parts[0] == "jobs" else None
+
+    def do_POST(self) -> None:
+        if urlsplit(self.path).path.rstrip("/") != "/jobs":
+            self._send(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            job = job_from_payload(json.loads(self.rfile.read(length) or b"null"))
+        except (ValueError, TypeError) as e:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+        try:
+            record = self.jobs.submit(job)
+        except QueueFull as e:
+            self._send(HTTPStatus.SERVICE_UNAVAILABLE, {"error": f"queue full: {e}"})
+            return
+        self._send(HTTPStatus.ACCEPTED, record.to_dict())
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") == "/stats":
+            self._send(HTTPStatus.OK, self.jobs.stats())
+            return
+        job_id = self._job_id(url.path)
+        if job_id is None:
+            self._send(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            return
+        wait = parse_qs(url.query).get("wait")
+        try:
+            timeout = float(wait[0]) if wait else None
+        except ValueError:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": "wait must be a number of seconds"})
+            return
+        record = self.jobs.wait(job_id, timeout) if timeout is not None else self.jobs.get(job_id)
+        if record is None:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"unknown job: {job_id}"})
+            return
+        self._send(HTTPStatus.OK, record.to_dict())
+
+    def do_DELETE(self) -> None:
+        job_id = self._job_id(urlsplit(self.path).path)
+        record = self.jobs.cancel(job_id) if job_id is not None else None
+        if record is None:
+            self._send(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            return
+        self._send(HTTPStatus.OK, record.to_dict())
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(
+    jobs: JobQueue,
+    *,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: Optional[str] = None,
+) -> socketserver.BaseServer:
+    """
+    HTTP server for the job API on host:port, or on a Unix socket when
+    socket_path is given (a stale socket file is replaced).
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = _UnixHTTPServer(socket_path, JobRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), JobRequestHandler)
+        server.daemon_threads = True
+    server.jobs = jobs
+    return server
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Long-running zip_service: accepts rename jobs over a local HTTP API.")
+    p.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on. Default: {DEFAULT_HOST}.")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on. Default: {DEFAULT_PORT}.")
+    p.add_argument("--socket", default=None, help="Listen on this Unix socket path instead of host/port.")
+    p.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Jobs run concurrently.")
+    p.add_argument("--queue-size", type=int, default=100, help="Jobs that may wait before submissions get 503.")
+    p.add_argument("--verbose", action="store_true", help="Log every request to stderr.")
+    args = p.parse_args(argv)
+
+    if args.workers < 1 or args.queue_size < 1:
+        raise SystemExit("--workers and --queue-size must be at least 1")
+
+    jobs = JobQueue(workers=args.workers, max_queued=args.queue_size)
+    JobRequestHandler.quiet = not args.verbose
+    server = make_server(jobs, host=args.host, port=args.port, socket_path=args.socket)
+    jobs.start()
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Listening on {where} ({args.workers} workers, queue size {args.queue_size})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        jobs.stop()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
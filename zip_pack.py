@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import collections
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+from zip_policy import ArchiveStats, CompressionPolicy, MemberDecision
+from zip_rewrite import append_raw_member
+
+
+# Bytes read per call while compressing one file.
+_READ_CHUNK = 1024 * 1024
+
+# Files larger than this are compressed into a temp file instead of memory.
+_SPILL_SIZE = 8 * 1024 * 1024
+
+# Input bytes (or files) grouped into one pool task, so small files do not
+# pay one inter-process round-trip each.
+_TASK_BYTES = 4 * 1024 * 1024
+_TASK_FILES = 256
+
+
+class PackedMember(NamedTuple):
+    info: zipfile.ZipInfo        # CRC, sizes and compress_type filled in
+    data: Optional[bytes]        # member bytes, or None when read from chunk_path
+    chunk_path: Optional[str]    # temp deflate stream, or the source file when stored
+    temporary: bool              # chunk_path is a temp file to delete once written
+    reason: str                  # MemberDecision.reason
+    seconds: float               # time spent reading/compressing
+
+
+def _crc_file(path: str) -> tuple[int, int]:
+    crc = 0
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_READ_CHUNK)
+            if not chunk:
+                return crc, size
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+
+
+def compress_member(
+    path: str,
+    arcname: str,
+    spill_dir: str,
+    policy: Optional[CompressionPolicy] = None,
+) -> PackedMember:
+    """
+    Compresses one file as the policy decides (default: CompressionPolicy()).
+
+    Deflated members use a raw stream at the chosen level, like
+    ZipFile.write; stored members only get their CRC computed here and are
+    copied from the source file when written.
+    """
+    start = time.perf_counter()
+    policy = policy if policy is not None else CompressionPolicy()
+    info = zipfile.ZipInfo.from_file(path, arcname)
+    decision: MemberDecision = policy.decide(arcname, path, info.file_size)
+    info.compress_type = decision.compress_type
+
+    if decision.compress_type == zipfile.ZIP_STORED:
+        info.CRC, info.file_size = _crc_file(path)
+        info.compress_size = info.file_size
+        return PackedMember(info, None, path, False, decision.reason, time.perf_counter() - start)
+
+    level = zlib.Z_DEFAULT_COMPRESSION if decision.level is None else decision.level
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+
+    parts: list[bytes] = []
+    out = None
+    chunk_path = None
+    if info.file_size > _SPILL_SIZE:
+        fd, chunk_path = tempfile.mkstemp(dir=spill_dir, suffix=".deflate")
+        out = os.fdopen(fd, "wb")
+    write = out.write if out is not None else parts.append
+
+    crc = 0
+    file_size = 0
+    compress_size = 0
+    try:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(_READ_CHUNK)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                file_size += len(chunk)
+                packed = compressor.compress(chunk)
+                compress_size += len(packed)
+                write(packed)
+        packed = compressor.flush()
+        compress_size += len(packed)
+        write(packed)
+    finally:
+        if out is not None:
+            out.close()
+
+    # Sizes as actually read (the file may have changed since it was listed)
+    info.CRC = crc
+    info.file_size = file_size
+    info.compress_size = compress_size
+    data = None if out is not None else b"".join(parts)
+    return PackedMember(info, data, chunk_path, out is not None, decision.reason, time.perf_counter() - start)
+
+
+def _compress_batch(
+    members: list[tuple[str, str]],
+    spill_dir: str,
+    policy: Optional[CompressionPolicy],
+) -> list[PackedMember]:
+    return [compress_member(path, arcname, spill_dir, policy) for path, arcname in members]
+
+
+def _batches(src_folder: Path) -> list[list[tuple[str, str]]]:
+    """
+    (path, arcname) pairs of every file under src_folder, sorted by arcname
+    and grouped into pool tasks.
+    """
+    files = []
+    for file_path in src_folder.rglob("*"):
+        if file_path.is_file():
+            files.append((file_path.relative_to(src_folder).as_posix(), str(file_path), file_path.stat().st_size))
+    files.sort()
+
+    batches: list[list[tuple[str, str]]] = []
+    batch: list[tuple[str, str]] = []
+    batch_bytes = 0
+    for arcname, path, size in files:
+        batch.append((path, arcname))
+        batch_bytes += size
+        if batch_bytes >= _TASK_BYTES or len(batch) >= _TASK_FILES:
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _write_packed(zout: zipfile.ZipFile, member: PackedMember) -> None:
+    if member.chunk_path is None:
+        append_raw_member(zout, member.info, lambda fp: fp.write(member.data))
+        return
+    try:
+        with open(member.chunk_path, "rb") as chunk:
+            append_raw_member(zout, member.info, lambda fp: shutil.copyfileobj(chunk, fp, _READ_CHUNK))
+    finally:
+        if member.temporary:
+            os.remove(member.chunk_path)
+
+
+def _packed_in_order(
+    batches: list[list[tuple[str, str]]],
+    spill_dir: str,
+    policy: Optional[CompressionPolicy],
+    jobs: int,
+) -> Iterator[PackedMember]:
+    if jobs <= 1:
+        for batch in batches:
+            yield from _compress_batch(batch, spill_dir, policy)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending: "collections.deque[Future[list[PackedMember]]]" = collections.deque()
+        remaining = iter(batches)
+        for batch in remaining:
+            pending.append(pool.submit(_compress_batch, batch, spill_dir, policy))
+            if len(pending) >= 2 * jobs:
+                break
+        while pending:
+            members = pending.popleft().result()
+            batch = next(remaining, None)
+            if batch is not None:
+                pending.append(pool.submit(_compress_batch, batch, spill_dir, policy))
+            yield from members
+
+
+def pack_folder(
+    src_folder: Path,
+    zip_out: Path,
+    *,
+    jobs: int = 1,
+    policy: Optional[CompressionPolicy] = None,
+) -> ArchiveStats:
+    """
+    Zips every file under src_folder, choosing store/deflate per member with
+    policy (default: CompressionPolicy()), and returns the archive's stats.
+
+    - jobs > 1 compresses on a pool of jobs processes. Members are written
+      in sorted arcname order whatever order the workers finish in, so the
+      output is the same for any jobs value.
+    - Only about 2 * jobs tasks are in flight; large files are compressed
+      into temp files, so memory stays bounded for big folders.
+    """
+    stats = ArchiveStats()
+    batches = _batches(src_folder)
+    with tempfile.TemporaryDirectory(prefix="relabeler-pack-") as spill_dir:
+        with zipfile.ZipFile(zip_out, "w") as zout:
+            for member in _packed_in_order(batches, spill_dir, policy, jobs):
+                _write_packed(zout, member)
+                stats.add(member.info, member.reason, member.seconds)
+    return stats
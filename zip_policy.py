@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import zlib
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    import zipfile
+
+# Same values as zipfile's constants; this module stays importable without
+# loading zipfile (zip_service parses its flags with it).
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+
+# Formats that are already compressed: deflate costs CPU and saves ~nothing.
+STORED_EXTENSIONS = frozenset({
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".heif", ".avif",
+    ".mp4", ".m4v", ".mov", ".mkv", ".avi", ".webm",
+    ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".flac",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar",
+    ".docx", ".xlsx", ".pptx", ".odt", ".epub", ".jar", ".apk",
+})
+
+# Large, lightly compressible formats: the fastest level gets most of the gain.
+DEFAULT_EXTENSION_LEVELS = {
+    ".tif": 1, ".tiff": 1, ".psd": 1, ".pdf": 1,
+    ".dng": 1, ".cr2": 1, ".cr3": 1, ".nef": 1, ".arw": 1, ".raf": 1,
+}
+
+# Files smaller than this are deflated without sniffing.
+_MIN_SNIFF_SIZE = 4096
+
+POLICY_MODES = ("auto", "deflate", "store")
+
+
+class MemberDecision(NamedTuple):
+    compress_type: int     # ZIP_STORED or ZIP_DEFLATED
+    level: Optional[int]   # deflate level (None: zlib default)
+    reason: str            # "extension", "sniffed", "override", "deflate" or "mode"
+
+
+def _member_extension(arcname: str) -> str:
+    dot = arcname.rfind(".")
+    return arcname[dot:].lower() if dot > arcname.rfind("/") + 1 else ""
+
+
+def _normalize_extension(ext: str) -> str:
+    ext = ext.strip().lower()
+    return ext if ext.startswith(".") else "." + ext
+
+
+@dataclass(frozen=True)
+class CompressionPolicy:
+    """
+    Chooses store or deflate (and the deflate level) for each member.
+
+    In "auto" mode, in order:
+
+    - extension_overrides (from the CLI) win; level 0 means store;
+    - STORED_EXTENSIONS are stored;
+    - other files are deflated at extension_levels[ext] or level, unless a
+      sample of their first sniff_bytes compresses to more than
+      sniff_ratio of its size (random-looking data is stored).
+
+    "deflate" deflates everything at level (the old behavior); "store"
+    stores everything.
+    """
+
+    mode: str = "auto"
+    level: Optional[int] = None
+    store_extensions: frozenset[str] = STORED_EXTENSIONS
+    extension_levels: dict[str, int] = field(default_factory=lambda: dict(DEFAULT_EXTENSION_LEVELS))
+    extension_overrides: dict[str, int] = field(default_factory=dict)
+    sniff_bytes: int = 64 * 1024
+    sniff_ratio: float = 0.95
+
+    def __post_init__(self) -> None:
+        if self.mode not in POLICY_MODES:
+            raise ValueError(f"Unknown compression mode: {self.mode}")
+        overrides = {_normalize_extension(ext): level for ext, level in self.extension_overrides.items()}
+        object.__setattr__(self, "extension_overrides", overrides)
+
+    def _decide_by_name(self, name: str) -> Optional[MemberDecision]:
+        """
+        Decision from the name alone, or None when a sample is needed.
+        """
+        if self.mode == "store":
+            return MemberDecision(ZIP_STORED, None, "mode")
+        if self.mode == "deflate":
+            return MemberDecision(ZIP_DEFLATED, self.level, "mode")
+
+        ext = _member_extension(name)
+        override = self.extension_overrides.get(ext)
+        if override is not None:
+            if override == 0:
+                return MemberDecision(ZIP_STORED, None, "override")
+            return MemberDecision(ZIP_DEFLATED, override, "override")
+        if ext in self.store_extensions:
+            return MemberDecision(ZIP_STORED, None, "extension")
+        if self.sniff_bytes <= 0:
+            return MemberDecision(ZIP_DEFLATED, self.extension_levels.get(ext, self.level), "deflate")
+        return None
+
+    def decide(self, name: str, path: str, size: int) -> MemberDecision:
+        decision = self._decide_by_name(name)
+        if decision is not None:
+            return decision
+
+        level = self.extension_levels.get(_member_extension(name), self.level)
+        if size >= _MIN_SNIFF_SIZE:
+            with open(path, "rb") as f:
+                sample = f.read(self.sniff_bytes)
+            # Level 1 is enough to tell text-like data from random bytes
+            if sample and len(zlib.compress(sample, 1)) > self.sniff_ratio * len(sample):
+                return MemberDecision(ZIP_STORED, None, "sniffed")
+        return MemberDecision(ZIP_DEFLATED, level, "deflate")
+
+
+@dataclass
+class ArchiveStats:
+    """
+    Per-archive compression totals (sizes in bytes, seconds of CPU work
+    spent reading and compressing members, summed over workers).
+    """
+
+    members: int = 0
+    stored: int = 0
+    deflated: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    seconds: float = 0.0
+    reasons: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+    def add(self, info: zipfile.ZipInfo, reason: str, seconds: float) -> None:
+        self.members += 1
+        if info.compress_type == ZIP_STORED:
+            self.stored += 1
+        else:
+            self.deflated += 1
+        self.bytes_in += info.file_size
+        self.bytes_out += info.compress_size
+        self.seconds += seconds
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def summary(self) -> str:
+        saved_pct = 100.0 * self.bytes_saved / self.bytes_in if self.bytes_in else 0.0
+        return (
+            f"Compression: {self.members} members ({self.deflated} deflated, {self.stored} stored), "
+            f"{self.bytes_in} -> {self.bytes_out} bytes, saved {self.bytes_saved} ({saved_pct:.1f}%), "
+            f"{self.seconds:.2f}s"
+        )
@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import calendar
+import copy
+import datetime
+import os
+import struct
+import sys
+import zipfile
+import zlib
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Iterator, Optional
+
+from engine import COUNTER_SCOPES, RenameOperation, RenameOptions, iter_plan_for_entries
+from filesystem import ApplyResult, Progress, apply_rename_plan_to_names
+from log_utils import SessionLogger
+from metrics import Metrics
+from scanner import FileEntry
+
+
+# Bytes moved per read/write when copying a member's compressed data.
+_COPY_CHUNK = 1024 * 1024
+
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+
+_FLAG_ENCRYPTED = 0x01
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+_ZIP64_EXTRA_ID = 0x0001
+
+# Python versions whose ZipFile internals append_raw_member was checked
+# against; elsewhere it falls back to ZipFile.open (see _raw_append_supported).
+_RAW_APPEND_PYTHONS = ((3, 8), (3, 14))
+_RAW_APPEND_ATTRIBUTES = ("fp", "filelist", "NameToInfo", "start_dir", "_didModify")
+
+
+@dataclass
+class ArchivePlan:
+    """
+    Rename plan for the root-level members of an archive (or, when
+    recursive, for the members of every directory in it).
+
+    - operations are planned like a folder listing (member names,
+      case-insensitive order), dated from each member's date_time when
+      the date suffix is on;
+      recursive operations use full member names ("a/b/x.jpg");
+    - names holds every name taken at the archive root, including the
+      first component of nested members (implicit directories); when
+      recursive, every member name and every directory path in between.
+    """
+
+    infos: list[zipfile.ZipInfo]
+    comment: bytes = b""
+    operations: list[RenameOperation] = field(default_factory=list)
+    names: set[str] = field(default_factory=set)
+
+
+def _member_timestamp(info: zipfile.ZipInfo) -> float:
+    # ZIP stores local wall-clock time, which is what the date suffix shows.
+    # Fields out of range (e.g. the zero DOS date 1980-00-00) are clamped.
+    year, month, day, hour, minute, second = info.date_time
+    month = min(max(month, 1), 12)
+    day = min(max(day, 1), calendar.monthrange(year, month)[1])
+    return datetime.datetime(year, month, day, min(hour, 23), min(minute, 59), min(second, 59)).timestamp()
+
+
+def _root_entries(infos: list[zipfile.ZipInfo], dated: bool) -> Iterator[FileEntry]:
+    for info in infos:
+        if "/" in info.filename:
+            continue
+        ts = _member_timestamp(info) if dated else None
+        yield FileEntry(info.filename, True, info.file_size, ts, ts, 0)
+
+
+def _directory_entries(infos: list[zipfile.ZipInfo], dated: bool) -> dict[str, list[FileEntry]]:
+    """
+    File members by directory ("" for the root, "a/b" below it), each
+    named by its last path component (dated only when dated is True).
+    """
+    directories: dict[str, list[FileEntry]] = {}
+    for info in infos:
+        if info.is_dir():
+            continue
+        directory, _, name = info.filename.rpartition("/")
+        ts = _member_timestamp(info) if dated else None
+        directories.setdefault(directory, []).append(FileEntry(name, True, info.file_size, ts, ts, 0))
+    return directories
+
+
+def _tree_operations(infos: list[zipfile.ZipInfo], options: RenameOptions, counter: str) -> Iterator[RenameOperation]:
+    """
+    Every directory planned on its own, in the pre-order of
+    scanner.walk_tree (so "global" numbering matches a recursive folder
+    rename of the extracted archive).
+    """
+    directories = _directory_entries(infos, options.include_date)
+    start = 1
+    for directory in sorted(directories, key=lambda d: [part.lower() for part in d.split("/")] if d else []):
+        prefix = directory + "/" if directory else ""
+        planned = 0
+        for op in iter_plan_for_entries(directories[directory], options, start=start):
+            planned += 1
+            yield RenameOperation(prefix + op.old_name, prefix + op.new_name)
+        if counter == "global":
+            start += planned
+
+
+def plan_archive(
+    zip_path: str,
+    options: RenameOptions,
+    *,
+    recursive: bool = False,
+    counter: str = "directory",
+    metrics: Optional[Metrics] = None,
+) -> ArchivePlan:
+    """
+    Reads only the central directory of zip_path; no member is decompressed.
+
+    - recursive=True also plans members of nested directories, numbered
+      per directory or across the archive (counter, see
+      engine.iter_tree_plans).
+    - metrics gets the directory read ("index") and planning ("plan") times.
+    """
+    if counter not in COUNTER_SCOPES:
+        raise ValueError(f"counter must be one of: {', '.join(COUNTER_SCOPES)}")
+    metrics = metrics if metrics is not None else Metrics()
+    with metrics.phase("index"):
+        with zipfile.ZipFile(zip_path, "r") as z:
+            infos = z.infolist()
+            comment = z.comment
+        metrics.count("members", len(infos))
+
+    plan = ArchivePlan(infos=infos, comment=comment)
+    with metrics.phase("plan"):
+        if recursive:
+            for info in infos:
+                parts = info.filename.rstrip("/").split("/")
+                for end in range(1, len(parts) + 1):
+                    plan.names.add("/".join(parts[:end]))
+            plan.operations = list(_tree_operations(infos, options, counter))
+        else:
+            for info in infos:
+                plan.names.add(info.filename.split("/", 1)[0])
+            plan.operations = list(iter_plan_for_entries(_root_entries(infos, options.include_date), options))
+    return plan
+
+
+def _strip_zip64_extra(extra: bytes) -> bytes:
+    """
+    Drops ZIP64 extra fields; zipfile adds fresh ones where still needed.
+    """
+    kept = bytearray()
+    pos = 0
+    while pos + 4 <= len(extra):
+        field_id, size = struct.unpack_from("<HH", extra, pos)
+        end = pos + 4 + size
+        if field_id != _ZIP64_EXTRA_ID:
+            kept += extra[pos:end]
+        pos = end
+    return bytes(kept)
+
+
+def _data_offset(src: BinaryIO, info: zipfile.ZipInfo) -> int:
+    src.seek(info.header_offset)
+    header = src.read(_LOCAL_HEADER.size)
+    if len(header) != _LOCAL_HEADER.size or header[:4] != _LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local file header for {info.filename}")
+    fields = _LOCAL_HEADER.unpack(header)
+    name_length, extra_length = fields[-2], fields[-1]
+    return info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, offset: int, length: int) -> None:
+    src.seek(offset)
+    buffer = bytearray(min(_COPY_CHUNK, max(length, 1)))
+    view = memoryview(buffer)
+    remaining = length
+    while remaining:
+        n = src.readinto(view[:min(remaining, len(buffer))])
+        if not n:
+            raise zipfile.BadZipFile("Archive truncated while copying member data")
+        dst.write(view[:n])
+        remaining -= n
+
+
+def _raw_append_supported(zout: zipfile.ZipFile) -> bool:
+    return _RAW_APPEND_PYTHONS[0] <= sys.version_info[:2] <= _RAW_APPEND_PYTHONS[1] and all(
+        hasattr(zout, name) for name in _RAW_APPEND_ATTRIBUTES
+    )
+
+
+class _DecompressingWriter:
+    """
+    File-like target for write_data when the raw append is unavailable:
+    decompresses what it is given into a ZipFile.open(..., "w") handle,
+    which compresses it again with the member's method.
+    """
+
+    def __init__(self, dst: BinaryIO, info: zipfile.ZipInfo):
+        self._dst = dst
+        if info.compress_type == zipfile.ZIP_STORED:
+            self._decompressor = None
+        elif info.compress_type == zipfile.ZIP_DEFLATED:
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        elif info.compress_type == zipfile.ZIP_BZIP2:
+            import bz2
+
+            self._decompressor = bz2.BZ2Decompressor()
+        else:
+            raise NotImplementedError(f"Cannot copy {info.filename}: compression method {info.compress_type} is not supported on this Python version")
+
+    def write(self, data) -> int:
+        if self._decompressor is not None:
+            self._dst.write(self._decompressor.decompress(data))
+        else:
+            self._dst.write(data)
+        return len(data)
+
+    def finish(self) -> None:
+        flush = getattr(self._decompressor, "flush", None)  # zlib only
+        if flush is not None:
+            self._dst.write(flush())
+
+
+def append_raw_member(
+    zout: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    write_data: Callable[[BinaryIO], None],
+    *,
+    data_descriptor: bool = False,
+) -> None:
+    """
+    Appends a member whose compressed bytes are produced by write_data(fp)
+    to zout (opened for writing). info must already carry the final CRC,
+    sizes and compress_type; zipfile never compresses anything here.
+
+    data_descriptor=True keeps flag bit 3 and writes the descriptor after
+    the data (only needed for encrypted members that used one).
+
+    The member is registered through ZipFile attributes that are not public
+    API. On Python versions outside _RAW_APPEND_PYTHONS the data is instead
+    decompressed and written through ZipFile.open (same method, but
+    recompressed); encrypted members cannot be copied that way.
+    """
+    if not data_descriptor:
+        info.flag_bits &= ~_FLAG_DATA_DESCRIPTOR
+    zip64 = info.file_size > zipfile.ZIP64_LIMIT or info.compress_size > zipfile.ZIP64_LIMIT
+
+    if not _raw_append_supported(zout):
+        if info.flag_bits & _FLAG_ENCRYPTED:
+            raise NotImplementedError(f"Cannot copy encrypted member {info.filename} on this Python version")
+        with zout.open(info, "w", force_zip64=zip64) as dst:
+            writer = _DecompressingWriter(dst, info)
+            write_data(writer)
+            writer.finish()
+        return
+
+    fp = zout.fp
+    info.header_offset = fp.tell()
+    fp.write(info.FileHeader(zip64))
+    write_data(fp)
+    if data_descriptor:
+        size_format = "<LQQ" if zip64 else "<LLL"
+        fp.write(_DATA_DESCRIPTOR_SIGNATURE + struct.pack(size_format, info.CRC, info.compress_size, info.file_size))
+
+    # Register the member the way ZipFile.write does, so close() writes
+    # the central directory (with ZIP64 records where needed).
+    zout.filelist.append(info)
+    zout.NameToInfo[info.filename] = info
+    zout.start_dir = fp.tell()
+    zout._didModify = True
+
+
+def _copy_member_raw(src: BinaryIO, zout: zipfile.ZipFile, info: zipfile.ZipInfo, new_name: str) -> None:
+    """
+    Appends info's compressed bytes to zout under new_name, unchanged.
+
+    The member's size and CRC are known from the central directory, so the
+    local header carries them and no data descriptor is written (except for
+    encrypted members that used one: their password check byte depends on it).
+    """
+    data_offset = _data_offset(src, info)
+
+    out = copy.copy(info)
+    out.filename = new_name
+    out.orig_filename = new_name
+    out.extra = _strip_zip64_extra(info.extra)
+    append_raw_member(
+        zout,
+        out,
+        lambda fp: _copy_range(src, fp, data_offset, info.compress_size),
+        data_descriptor=bool(info.flag_bits & _FLAG_ENCRYPTED and info.flag_bits & _FLAG_DATA_DESCRIPTOR),
+    )
+
+
+def member_names(infos: list[zipfile.ZipInfo], renamed: list[tuple[str, str]]) -> list[str]:
+    """
+    New name of each member of infos, by position. Each (old_name, new_name)
+    pair renames one member: the first one named old_name not renamed yet,
+    so members sharing a name (zipfile allows that) are not all renamed.
+    """
+    pending: dict[str, list[str]] = {}
+    for old_name, new_name in reversed(renamed):
+        pending.setdefault(old_name, []).append(new_name)
+    names = []
+    for info in infos:
+        targets = pending.get(info.filename)
+        names.append(targets.pop() if targets else info.filename)
+    return names
+
+
+def write_renamed_archive(
+    zip_in: str,
+    zip_out: str,
+    plan: ArchivePlan,
+    new_names: list[str],
+    *,
+    on_member: Optional[Callable[[int, int], None]] = None,
+    metrics: Optional[Metrics] = None,
+    progress: Optional[Progress] = None,
+) -> None:
+    """
+    Writes a copy of zip_in (as listed in plan) to zip_out with each member
+    of plan.infos named new_names[i] (see member_names). Member order, compression
+    method, timestamps, attributes and comments are kept; compressed data
+    is copied byte for byte (deflate never runs).
+
+    The archive is written to zip_out + ".part" and moved into place once
+    complete. on_member(done, total) runs after each member; an exception
+    it raises (e.g. to cancel) aborts the copy and removes the partial file.
+    metrics gets "bytes_copied" (member data) and "bytes_written" (archive).
+    progress counts members and their compressed bytes.
+    """
+    part_path = zip_out + ".part"
+    try:
+        copied = 0
+        with open(zip_in, "rb") as src, zipfile.ZipFile(part_path, "w") as zout:
+            total = len(plan.infos)
+            if progress is not None:
+                progress.expect(total)
+            for done, (info, name) in enumerate(zip(plan.infos, new_names), start=1):
+                _copy_member_raw(src, zout, info, name)
+                copied += info.compress_size
+                if progress is not None:
+                    progress.advance(1, name, info.compress_size)
+                if on_member is not None:
+                    on_member(done, total)
+            zout.comment = plan.comment
+        os.replace(part_path, zip_out)
+        if metrics is not None:
+            metrics.count("bytes_copied", copied)
+            metrics.count("bytes_written", os.path.getsize(zip_out))
+    except BaseException:
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        raise
+
+
+def rename_archive(
+    zip_in: str,
+    zip_out: str,
+    options: RenameOptions,
+    *,
+    dry_run: bool = False,
+    recursive: bool = False,
+    counter: str = "directory",
+    logger: Optional[SessionLogger] = None,
+    on_member: Optional[Callable[[int, int], None]] = None,
+    metrics: Optional[Metrics] = None,
+    progress: Optional[Progress] = None,
+) -> tuple[ArchivePlan, ApplyResult]:
+    """
+    Renames the root-level members of zip_in into zip_out without extracting
+    or recompressing anything.
+
+    - The plan and collision checks run on member names (same rules as a
+      folder rename, including cycle handling); nested members are copied
+      under their original names unless recursive (see plan_archive).
+    - result.mappings are archive-relative (new_name, old_name) pairs.
+    - dry_run=True plans and logs but writes no output.
+    - on_member and progress are passed to write_renamed_archive.
+    - result.metrics times "index", "plan", "schedule", "rename",
+      "results" and "write" (recorded into metrics when given).
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    plan = plan_archive(zip_in, options, recursive=recursive, counter=counter, metrics=metrics)
+    result = apply_rename_plan_to_names(
+        plan.names,
+        plan.operations,
+        source=zip_in,
+        logger=logger,
+        dry_run=dry_run,
+        metrics=metrics,
+    )
+    if not dry_run:
+        with metrics.phase("write"):
+            write_renamed_archive(
+                zip_in,
+                zip_out,
+                plan,
+                member_names(plan.infos, result.renamed),
+                on_member=on_member,
+                metrics=metrics,
+                progress=progress,
+            )
+    return plan, result
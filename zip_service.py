@@ -2,30 +2,273 @@ from __future__ import annotations
 
 import argparse
 import os
-import shutil
-import tempfile
-import zipfile
-from pathlib import Path
-from typing import Optional
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Optional
 
-from engine import build_rename_plan, RenameOptions
-from filesystem import apply_rename_plan
-from validation import validate_inputs
-from log_utils import maybe_create_log_path
-from relabeler_cli import _save_mappings as save_mappings
+from engine import COUNTER_SCOPES, RenameOptions
+from validation import positive_int, validate_inputs, validate_options
+from log_utils import maybe_create_session_logger
+from metrics import Metrics, add_hook, load_hook, publish, write_json
+from zip_policy import POLICY_MODES, ArchiveStats, CompressionPolicy
+
+if TYPE_CHECKING:
+    import threading
+    from pathlib import Path
+
+    from filesystem import ApplyResult, Progress
+
+# zipfile and the rewrite path load when a job runs; tempfile, the
+# process-pool packer and mappings_io only when a job needs them
+# (tests/test_startup.py guards this).
 
 
 def extract_zip(zip_path: Path, dest: Path) -> None:
+    import zipfile
+
     with zipfile.ZipFile(zip_path, "r") as z:
         z.extractall(dest)
 
 
-def create_zip(src_folder: Path, zip_out: Path) -> None:
-    with zipfile.ZipFile(zip_out, "w", compression=zipfile.ZIP_DEFLATED) as z:
-        for file_path in src_folder.rglob("*"):
-            if file_path.is_file():
-                arcname = file_path.relative_to(src_folder)
-                z.write(file_path, arcname.as_posix())
+def create_zip(
+    src_folder: Path,
+    zip_out: Path,
+    *,
+    jobs: int = 1,
+    policy: Optional[CompressionPolicy] = None,
+) -> ArchiveStats:
+    """
+    Packs src_folder into zip_out (members in sorted order). Each member is
+    stored or deflated as policy decides (see zip_policy); jobs > 1
+    compresses on a process pool (see zip_pack).
+    """
+    from zip_pack import pack_folder
+
+    return pack_folder(src_folder, zip_out, jobs=jobs, policy=policy)
+
+
+def _extension_level(value: str) -> tuple[str, int]:
+    ext, sep, level = value.rpartition("=")
+    if not sep or not ext.strip():
+        raise argparse.ArgumentTypeError('expected EXT=LEVEL, e.g. "png=0" or "txt=9"')
+    try:
+        number = int(level)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid level: {level}") from None
+    if not 0 <= number <= 9:
+        raise argparse.ArgumentTypeError("level must be between 0 and 9")
+    return ext, number
+
+
+def _policy_from_args(args: argparse.Namespace) -> CompressionPolicy:
+    return CompressionPolicy(
+        mode=args.compression,
+        level=args.level,
+        extension_overrides=dict(args.ext_level),
+        sniff_bytes=0 if args.no_sniff else CompressionPolicy.sniff_bytes,
+    )
+
+
+class ZipJobError(Exception):
+    """
+    A job that cannot run (bad input); messages holds user-facing errors.
+    """
+
+    def __init__(self, messages: list[str]) -> None:
+        super().__init__("; ".join(messages))
+        self.messages = messages
+
+
+class JobCancelled(Exception):
+    pass
+
+
+@dataclass
+class ZipJob:
+    zip_in: str
+    zip_out: str
+    options: RenameOptions
+    dry_run: bool = False
+    extract: bool = False                         # extract / rename / recompress instead of rewriting
+    jobs: int = 1                                 # compression processes (extract only)
+    policy: Optional[CompressionPolicy] = None    # compression policy (extract only)
+    mappings_out: Optional[str] = None
+    log: bool = False
+    log_suffix: str = ""                          # added to the log file name (the daemon passes the job id)
+    recursive: bool = False                       # also rename members of nested directories
+    counter: str = "directory"                    # recursive numbering: "directory" or "global"
+
+
+@dataclass
+class ZipJobResult:
+    planned: int
+    result: ApplyResult
+    stats: Optional[ArchiveStats] = None          # only when the archive was recompressed
+
+    @property
+    def metrics(self) -> Metrics:
+        return self.result.metrics
+
+
+def run_zip_job(
+    job: ZipJob,
+    *,
+    cancel: Optional[threading.Event] = None,
+    progress: Optional[Progress] = None,
+) -> ZipJobResult:
+    """
+    Runs one zip-in/zip-out rename (what zip_service main does, without
+    printing), so it can also run inside a long-lived process.
+
+    - Raises ZipJobError for invalid input (missing or corrupt archive,
+      invalid options) before anything is written.
+    - cancel: when set, the job stops at its next checkpoint (between
+      phases and between archive members) with JobCancelled; a partial
+      output archive is removed.
+    - progress (a filesystem.Progress) reports in batches: archive members
+      and their bytes as they are copied, or with extract the files as
+      they are renamed.
+    - The result's metrics time every phase (see rename_archive; with
+      extract: "extract", planning, apply phases and "compress") and are
+      passed to metrics.publish("zip_job", ...) once the job completes.
+    """
+
+    def checkpoint(*_args) -> None:
+        if cancel is not None and cancel.is_set():
+            raise JobCancelled(job.zip_in)
+
+    if not os.path.isfile(job.zip_in):
+        raise ZipJobError([f"Input zip not found: {job.zip_in}"])
+    errors = validate_options(job.options)
+    if errors:
+        raise ZipJobError(errors)
+
+    import zipfile
+
+    from zip_rewrite import rename_archive
+
+    checkpoint()
+    metrics = Metrics()
+    metrics.count("bytes_in", os.path.getsize(job.zip_in))
+    logger = maybe_create_session_logger(job.log, suffix=job.log_suffix)
+    try:
+        if job.extract:
+            job_result = _run_extract_job(job, logger, checkpoint, metrics, progress)
+            publish("zip_job", metrics)
+            return job_result
+        try:
+            plan, result = rename_archive(
+                job.zip_in,
+                job.zip_out,
+                job.options,
+                dry_run=job.dry_run,
+                recursive=job.recursive,
+                counter=job.counter,
+                logger=logger,
+                on_member=checkpoint,
+                metrics=metrics,
+                progress=progress,
+            )
+        except zipfile.BadZipFile as e:
+            raise ZipJobError([f"Invalid zip file: {e}"]) from None
+    finally:
+        if logger is not None:
+            with metrics.phase("log"):
+                logger.close()
+
+    # Mappings are archive-relative member names, marked so undo refuses them
+    if job.mappings_out and not job.dry_run:
+        from mappings_io import save_mappings
+
+        with metrics.phase("mappings"):
+            save_mappings(job.mappings_out, result.mappings, archive=job.zip_out)
+    if progress is not None:
+        progress.flush()
+    publish("zip_job", metrics)
+    return ZipJobResult(len(plan.operations), result)
+
+
+def _run_extract_job(
+    job: ZipJob,
+    logger,
+    checkpoint: Callable[[], None],
+    metrics: Metrics,
+    progress: Optional[Progress],
+) -> ZipJobResult:
+    import tempfile
+    import zipfile
+    from pathlib import Path
+
+    from engine import build_rename_plan, iter_tree_plans
+    from filesystem import apply_rename_plan, apply_rename_tree
+    from mappings_io import save_mappings
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        work = Path(tmpdir)
+        extract_dir = work / "extracted"
+        extract_dir.mkdir(parents=True, exist_ok=True)
+
+        try:
+            with metrics.phase("extract"):
+                extract_zip(Path(job.zip_in), extract_dir)
+        except zipfile.BadZipFile as e:
+            raise ZipJobError([f"Invalid zip file: {e}"]) from None
+        checkpoint()
+
+        # Only files in the root of the extracted folder, unless recursive
+        folder_path = str(extract_dir)
+
+        errors = validate_inputs(folder_path, job.options)
+        if errors:
+            raise ZipJobError(errors)
+
+        if job.recursive:
+            # Each directory is renamed as soon as it is listed
+            plans = iter_tree_plans(folder_path, job.options, counter=job.counter, metrics=metrics)
+            result = apply_rename_tree(
+                folder_path,
+                plans,
+                dry_run=job.dry_run,
+                logger=logger,
+                metrics=metrics,
+                on_directory=checkpoint,
+                progress=progress,
+            )
+            planned = result.attempted
+        else:
+            ops = build_rename_plan(folder_path, job.options, metrics=metrics)
+            result = apply_rename_plan(
+                folder_path,
+                ops,
+                dry_run=job.dry_run,
+                logger=logger,
+                metrics=metrics,
+                progress=progress,
+            )
+            planned = len(ops)
+        checkpoint()
+
+        stats = None
+        if not job.dry_run:
+            with metrics.phase("compress"):
+                stats = create_zip(extract_dir, Path(job.zip_out), jobs=job.jobs, policy=job.policy)
+            metrics.count("bytes_written", os.path.getsize(job.zip_out))
+
+        # Save mappings (useful if you want to undo locally later)
+        if job.mappings_out and not job.dry_run:
+            with metrics.phase("mappings"):
+                save_mappings(job.mappings_out, result.mappings)
+
+    return ZipJobResult(planned, result, stats)
+
+
+def _print_summary(job_result: ZipJobResult) -> None:
+    result = job_result.result
+    print(f"Planned: {job_result.planned}")
+    print(f"Renamed: {len(result.renamed)}")
+    print(f"Skipped: {len(result.skipped)}")
+    print(f"Errors: {len(result.errors)}")
+    if job_result.stats is not None:
+        print(job_result.stats.summary())
 
 
 def main(argv: Optional[list[str]] = None) -> int:
@@ -39,13 +282,52 @@ def main(argv: Optional[list[str]] = None) -> int:
     p.add_argument("--log", action="store_true", help="Write a log file in ./logs/")
     p.add_argument("--dry-run", action="store_true", help="Simulate (no changes).")
     p.add_argument("--mappings-out", default=None, help="Write undo mappings JSON to this path.")
+    p.add_argument("--recursive", action="store_true", help="Also rename members of nested directories.")
+    p.add_argument(
+        "--counter",
+        choices=COUNTER_SCOPES,
+        default="directory",
+        help="With --recursive: restart numbering in each directory, or number across the archive.",
+    )
+    p.add_argument(
+        "--extract",
+        action="store_true",
+        help="Extract, rename on disk and recompress (default: rewrite the archive without recompressing).",
+    )
+    p.add_argument(
+        "--jobs",
+        type=positive_int,
+        default=1,
+        help="Processes compressing members in parallel when recompressing (--extract). Default: 1.",
+    )
+    p.add_argument(
+        "--compression",
+        choices=POLICY_MODES,
+        default="auto",
+        help="When recompressing: auto (store already-compressed files), deflate (everything) or store.",
+    )
+    p.add_argument("--level", type=int, choices=range(1, 10), default=None, metavar="1-9", help="Default deflate level.")
+    p.add_argument(
+        "--ext-level",
+        type=_extension_level,
+        action="append",
+        default=[],
+        metavar="EXT=LEVEL",
+        help='Deflate level for one extension, 0 = store (repeatable), e.g. --ext-level png=0.',
+    )
+    p.add_argument("--no-sniff", action="store_true", help="Do not sample file contents to detect incompressible data.")
+    p.add_argument("--stats", action="store_true", help="Print per-phase timings and counters.")
+    p.add_argument("--stats-json", default=None, metavar="PATH", help='Write timings and counters as JSON ("-" for stdout).')
+    p.add_argument(
+        "--metrics-hook",
+        default=None,
+        metavar="MODULE:FUNCTION",
+        help="Call FUNCTION(kind, metrics_dict) with the job's metrics (e.g. to push them to monitoring).",
+    )
     args = p.parse_args(argv)
 
-    zip_in = Path(args.zip_in)
-    zip_out = Path(args.zip_out)
-
-    if not zip_in.exists() or not zip_in.is_file():
-        raise SystemExit(f"Input zip not found: {zip_in}")
+    if not os.path.isfile(args.zip_in):
+        raise SystemExit(f"Input zip not found: {args.zip_in}")
 
     options = RenameOptions(
         pattern=args.pattern,
@@ -54,50 +336,39 @@ def main(argv: Optional[list[str]] = None) -> int:
         change_extension=(args.ext is not None),
         new_extension=args.ext,
     )
+    job = ZipJob(
+        zip_in=args.zip_in,
+        zip_out=args.zip_out,
+        options=options,
+        dry_run=bool(args.dry_run),
+        extract=bool(args.extract),
+        jobs=args.jobs,
+        policy=_policy_from_args(args),
+        mappings_out=args.mappings_out,
+        log=bool(args.log),
+        recursive=bool(args.recursive),
+        counter=args.counter,
+    )
 
-    log_path = maybe_create_log_path(args.log)
-
-    with tempfile.TemporaryDirectory() as tmpdir:
-        work = Path(tmpdir)
-        extract_dir = work / "extracted"
-        extract_dir.mkdir(parents=True, exist_ok=True)
-
-        extract_zip(zip_in, extract_dir)
-
-        # IMPORTANT: We only rename files in the root of the extracted folder
-        # to match your current app behavior (non-recursive).
-        folder_path = str(extract_dir)
-
-        errors = validate_inputs(folder_path, options)
-        if errors:
-            for e in errors:
-                print(f"Error: {e}")
-            return 2
-
-        ops = build_rename_plan(folder_path, options)
-        result = apply_rename_plan(
-            folder_path,
-            ops,
-            log_file_path=log_path,
-            dry_run=bool(args.dry_run),
-        )
+    if args.metrics_hook:
+        try:
+            add_hook(load_hook(args.metrics_hook))
+        except (ImportError, AttributeError, ValueError) as e:
+            raise SystemExit(f"Invalid --metrics-hook: {e}")
 
-        if not args.dry_run:
-            create_zip(extract_dir, zip_out)
+    try:
+        job_result = run_zip_job(job)
+    except ZipJobError as e:
+        for message in e.messages:
+            print(f"Error: {message}")
+        return 2
 
-        # Save mappings (useful if you want to undo locally later)
-        if args.mappings_out and not args.dry_run:
-            save_mappings(args.mappings_out, result.mappings)
-
-        # Summary
-        print(f"Planned: {len(ops)}")
-        print(f"Renamed: {len(result.renamed)}")
-        print(f"Skipped: {len(result.skipped)}")
-        print(f"Errors: {len(result.errors)}")
-        if result.errors:
-            return 1
-
-    return 0
+    _print_summary(job_result)
+    if args.stats:
+        print(job_result.metrics.format())
+    if args.stats_json:
+        write_json(args.stats_json, "zip_job", job_result.metrics)
+    return 1 if job_result.result.errors else 0
 
 
 if __name__ == "__main__":